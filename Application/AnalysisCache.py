@@ -0,0 +1,128 @@
+import os, json, hashlib
+import pandas as pd
+
+
+# On disk cache of the per session aggregates analyze.py builds, so a run only parses the rows appended since
+# the last one. For every results file it keeps (in <results>/cache/<file>.json + .pkl):
+#   the file's identity (device, inode), size and mtime when it was last read,
+#   the byte offset it was read up to (always the end of a complete line),
+#   the header length and a hash of the bytes just before that offset,
+#   and the reduced partials (e.g. analyze.metricPartials) of everything up to there.
+# The next run parses offset..end and merges those partials into the cached ones with the reduce function.
+# If the file was rewritten (new inode, shorter, different header, different bytes before the offset, or a new
+# mtime without growing, e.g. a shard merge or upgradeHeader) the cache for that file is dropped and the whole
+# file read again.
+
+CACHE_VERSION = 1
+TAIL_BYTES = 4096
+
+
+class analysisCache:
+    def __init__(self, folder):
+        self.folder = folder
+        # What the last update of each file did: "cached", "appended" or "rebuilt", and the bytes parsed
+        self.lastRun = {}
+
+    # Partials for the whole file, parsing only what the cache doesn't have yet.
+    # parse(start, end) gives the partials of the rows in that byte range, reduce([partials, ...]) combines them.
+    def update(self, location, kind, parse, reduce):
+        name = os.path.basename(location)
+        stateFile, partialFile = self._paths(name)
+        info = os.stat(location)
+        headerLength = _headerLength(location)
+
+        state, cached = self._load(stateFile, partialFile)
+        reason = self._invalid(state, location, info, headerLength, kind)
+        if reason is not None:
+            if state is not None:
+                print("[Analysis Cache] " + name + " " + reason + ", reading it again")
+            state, cached = None, None
+        start = state["offset"] if state is not None else headerLength
+        end = _lineEnd(location, start, info.st_size)
+
+        if state is not None and end == start:
+            self.lastRun[name] = ("cached", 0)
+            return cached
+        partials = parse(start, end)
+        if cached is not None:
+            partials = reduce([cached, partials])
+        self.lastRun[name] = ("appended" if state is not None else "rebuilt", end - start)
+
+        self._save(stateFile, partialFile, partials, {
+            "version": CACHE_VERSION, "kind": kind, "location": os.path.abspath(location),
+            "device": info.st_dev, "inode": info.st_ino, "size": info.st_size, "mtime_ns": info.st_mtime_ns,
+            "offset": end, "headerLength": headerLength, "tail": _tailHash(location, end),
+        })
+        return partials
+
+    def clear(self):
+        if not os.path.isdir(self.folder):
+            return
+        for name in os.listdir(self.folder):
+            if name.endswith((".json", ".pkl")):
+                os.remove(os.path.join(self.folder, name))
+
+    # Why the cached state can't be carried on from, None if it can
+    def _invalid(self, state, location, info, headerLength, kind):
+        if state is None:
+            return "is not cached"
+        if state.get("version") != CACHE_VERSION or state.get("kind") != kind:
+            return "was cached by another version"
+        if (state["device"], state["inode"]) != (info.st_dev, info.st_ino):
+            return "was replaced"
+        if info.st_size < state["offset"] or headerLength != state["headerLength"]:
+            return "was rewritten"
+        if info.st_size == state["size"] and info.st_mtime_ns != state["mtime_ns"]:
+            return "was modified in place"
+        if _tailHash(location, state["offset"]) != state["tail"]:
+            return "was rewritten"
+        return None
+
+    def _paths(self, name):
+        return os.path.join(self.folder, name + ".json"), os.path.join(self.folder, name + ".pkl")
+
+    def _load(self, stateFile, partialFile):
+        try:
+            with open(stateFile, "r", encoding="utf8") as f:
+                state = json.load(f)
+            return state, pd.read_pickle(partialFile)
+        except (OSError, ValueError, EOFError):
+            return None, None
+        except Exception as e:
+            print("[Analysis Cache] Could not read " + partialFile + ": " + str(e))
+            return None, None
+
+    # Partials first, then the state pointing at them, so a crash in between only costs a reread
+    def _save(self, stateFile, partialFile, partials, state):
+        os.makedirs(self.folder, exist_ok=True)
+        partials.to_pickle(partialFile + ".tmp")
+        os.replace(partialFile + ".tmp", partialFile)
+        with open(stateFile + ".tmp", "w", encoding="utf8") as f:
+            json.dump(state, f)
+        os.replace(stateFile + ".tmp", stateFile)
+
+
+def _headerLength(location):
+    with open(location, "rb") as f:
+        return len(f.readline())
+
+
+# End of the last complete line, rows the writer is still in the middle of are left for next time
+def _lineEnd(location, start, size):
+    with open(location, "rb") as f:
+        position = size
+        while position > start:
+            step = min(65536, position - start)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+    return start
+
+
+def _tailHash(location, offset):
+    with open(location, "rb") as f:
+        f.seek(max(0, offset - TAIL_BYTES))
+        return hashlib.sha1(f.read(offset - max(0, offset - TAIL_BYTES))).hexdigest()
@@ -0,0 +1,113 @@
+import os, copy, pickle, socket, threading, time
+
+
+# Session checkpoints for crash recovery.
+# While the tasks run, a snapshot of the task counters and the dataCollection state (IDs, metrics engine,
+# response statistics) is taken every CHECKPOINT_INTERVAL_MS. Taking it only copies a few small objects on
+# the GUI thread, pickling and writing happen on a background thread. "Resume Session" in the OCS rebuilds
+# the tasks with the saved settings and puts the counters back, so the session carries on under its ID.
+# Boxes that were on the conveyors or in the bins at the time are not restored, the tasks start empty again.
+# Neither are the errors still waiting for a correction (error, defectsMissed) or their response timers, they
+# went with those boxes and start at 0. The totals (injected errors, corrections, boxes done) carry on.
+
+CHECKPOINT_INTERVAL_MS = 5000
+CHECKPOINT_VERSION = 1
+
+# Task attributes saved per task
+TASK_FIELDS = {
+    "sorting": ("fulfilledBoxes", "totalError", "successfulCorrections"),
+    "packaging": ("totalError", "fulfilledPackages", "successfulCorrections"),
+    "inspection": ("totalInspected", "totalError", "successfulCorrections"),
+}
+
+
+# One file per machine, so stations sharing a Results folder don't overwrite each other's checkpoint
+def checkpointPath(resultsDir):
+    host = "".join(c if c.isalnum() or c == "-" else "-" for c in socket.gethostname()) or "host"
+    return os.path.join(resultsDir, "checkpoint_" + host + ".pkl")
+
+
+def taskState(task, name):
+    return {field: copy.copy(getattr(task, field)) for field in TASK_FIELDS[name] if hasattr(task, field)}
+
+
+def restoreTask(task, name, state):
+    for field in TASK_FIELDS[name]:
+        if field in state:
+            setattr(task, field, copy.copy(state[field]))
+
+
+# Returns the saved state, or None if there is no usable checkpoint
+def loadCheckpoint(location):
+    try:
+        with open(location, "rb") as f:
+            state = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print("[Checkpoint] Could not read " + location + ": " + str(e))
+        return None
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        print("[Checkpoint] " + location + " is from a different version, ignoring it")
+        return None
+    return state
+
+
+class checkpointWriter:
+    def __init__(self, location):
+        self.location = location
+        self._lock = threading.Lock()
+        self._pending = None
+        self._busy = False
+        # Bumped by clear() so a write already in flight doesn't bring the file back
+        self._generation = 0
+
+        self.checkpointsWritten = 0
+        self.lastWriteLatency = 0.0
+
+    # Called on the GUI thread with a state that is no longer shared with anything live.
+    # Only the newest state matters, if a write is still going the next one just replaces what is waiting.
+    def save(self, state):
+        state["version"] = CHECKPOINT_VERSION
+        state["savedAt"] = time.time()
+        with self._lock:
+            self._pending = (state, self._generation)
+            if self._busy:
+                return
+            self._busy = True
+        threading.Thread(target=self._run, name="checkpoint", daemon=True).start()
+
+    # The session ended normally, nothing to resume
+    def clear(self):
+        with self._lock:
+            self._pending = None
+            self._generation += 1
+            try:
+                os.remove(self.location)
+            except OSError:
+                pass
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._busy = False
+                    return
+                state, generation = self._pending
+                self._pending = None
+
+            start = time.perf_counter()
+            tmp = self.location + ".tmp"
+            try:
+                data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                with self._lock:
+                    if generation == self._generation:
+                        os.replace(tmp, self.location)
+                        self.checkpointsWritten += 1
+                    else:
+                        os.remove(tmp)
+            except Exception as e:
+                print("[Checkpoint] Failed to write checkpoint: " + str(e))
+            self.lastWriteLatency = time.perf_counter() - start
@@ -0,0 +1,294 @@
+import os, socket, struct, threading, time, argparse, statistics
+import pandas as pd
+
+from Timebase import stamp
+
+
+# Clock synchronisation with external recorders (physiological signals etc.) running next to the tasks.
+# The recorder answers small UDP probes with its own clock, NTP style:
+#   t1 = our stamp when the probe is sent       t2 = recorder clock when it arrives
+#   t3 = recorder clock when the reply is sent  t4 = our stamp when the reply arrives
+#   offset = ((t2 - t1) + (t3 - t4)) / 2        round trip = (t4 - t1) - (t3 - t2)
+# Every few seconds a burst of probes is sent and only the one with the shortest round trip is kept,
+# the others waited in a queue somewhere. At the end of the session a line is fitted through those
+# points, so the offset can drift over the session:
+#   recorder_ns = stamp + offset_ns + drift * (stamp - reference_ns)
+# One row per session goes to Results/clocksync.csv, together with the session's time anchor, so the
+# wall clock Timestamps in the results files can be mapped onto the recorder's clock on export.
+
+DEFAULT_ADDRESS = ("127.0.0.1", 47800)
+CLOCKSYNC_COLUMNS = [
+    "Timestamp", "session_id", "participant_id", "recorder",
+    "reference_ns", "offset_ns", "drift_ppm", "samples", "rtt_ns", "residual_ns",
+    "anchor_wall", "anchor_mono_ns",
+]
+
+# Probe: magic, sequence number, t1. Reply: magic, sequence number, t1, t2, t3.
+MAGIC = b"CSYN"
+PROBE = struct.Struct("!4sIq")
+REPLY = struct.Struct("!4sIqqq")
+
+
+#--------------------------------
+# Stand-in recorder
+#--------------------------------
+# Answers probes on localhost like a recorder would. offset_ms/drift_ppm make its clock differ from ours
+# so the estimation can be checked against known values.
+class recorderServer:
+    def __init__(self, address=DEFAULT_ADDRESS, offset_ms=0.0, drift_ppm=0.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.address = self.sock.getsockname()
+        self.offset_ns = int(offset_ms * 1e6)
+        self.drift = drift_ppm / 1e6
+        self.start_ns = time.perf_counter_ns()
+        self.answered = 0
+        self.thread = None
+        self._running = False
+
+    def clock(self):
+        now = time.perf_counter_ns()
+        return now + self.offset_ns + int(self.drift * (now - self.start_ns))
+
+    def serve(self):
+        self._running = True
+        while self._running:
+            try:
+                data, sender = self.sock.recvfrom(64)
+            except OSError:
+                return
+            t2 = self.clock()
+            if len(data) != PROBE.size:
+                continue
+            magic, seq, t1 = PROBE.unpack(data)
+            if magic != MAGIC:
+                continue
+            try:
+                self.sock.sendto(REPLY.pack(MAGIC, seq, t1, t2, self.clock()), sender)
+                self.answered += 1
+            except OSError:
+                return
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve, name="recorderServer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.sock.close()
+        if self.thread is not None:
+            self.thread.join(1.0)
+
+
+#--------------------------------
+# Client
+#--------------------------------
+class clockSync:
+    def __init__(self, address=DEFAULT_ADDRESS, burstSize=16, timeout=0.05):
+        self.address = address
+        self.burstSize = burstSize
+        self.timeout = timeout
+        self.sock = None
+        self.seq = 0
+        # (local stamp at the middle of the round trip, offset ns, round trip ns), one per burst
+        self.points = []
+        self.lost = 0
+        # Whether the last burst got any reply
+        self.replied = False
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._finalBurst = False
+        # Bumped by reset(), a burst that was still going then doesn't add to the next session
+        self._generation = 0
+        self.thread = None
+
+    def _socket(self):
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.settimeout(self.timeout)
+        return self.sock
+
+    # One round trip, (t1, t2, t3, t4) or None if the reply didn't come back in time
+    def probe(self):
+        sock = self._socket()
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        t1 = stamp()
+        try:
+            sock.sendto(PROBE.pack(MAGIC, self.seq, t1), self.address)
+            while True:
+                data = sock.recv(64)
+                t4 = stamp()
+                if len(data) != REPLY.size:
+                    continue
+                magic, seq, r1, t2, t3 = REPLY.unpack(data)
+                # Late replies to earlier probes are skipped
+                if magic == MAGIC and seq == self.seq and r1 == t1:
+                    return t1, t2, t3, t4
+        except OSError:
+            self.lost += 1
+            return None
+
+    # Sends a burst of probes and keeps the one with the shortest round trip
+    def burst(self):
+        generation = self._generation
+        best = None
+        for _ in range(self.burstSize):
+            sample = self.probe()
+            if sample is None:
+                continue
+            t1, t2, t3, t4 = sample
+            rtt = (t4 - t1) - (t3 - t2)
+            if best is None or rtt < best[2]:
+                best = ((t1 + t4) // 2, ((t2 - t1) + (t3 - t4)) / 2, rtt)
+        self.replied = best is not None
+        if best is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self.points.append(best)
+        return best
+
+    # Bursts every interval seconds on a background thread until stop()
+    def start(self, interval=2.0):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        # Its own event, so a thread that outlived stop() can't be started up again by this one
+        self._stop = threading.Event()
+        self._finalBurst = False
+        self.thread = threading.Thread(target=self._run, args=(interval, self._stop), name="clockSync", daemon=True)
+        self.thread.start()
+
+    def _run(self, interval, stopped):
+        while not stopped.is_set():
+            self._tryBurst()
+            stopped.wait(interval)
+        # Not worth the full timeout on every probe if the recorder has stopped answering
+        if self._finalBurst and self.replied:
+            self._tryBurst()
+
+    def _tryBurst(self):
+        try:
+            self.burst()
+        except Exception as e:
+            self.replied = False
+            print("[Clock Sync] Burst failed: " + str(e))
+
+    # finalBurst: one more burst on the sync thread before it ends, so the fit covers the end of the session.
+    # Waits at most timeout seconds, the caller is the GUI thread.
+    def stop(self, finalBurst=False, timeout=2.0):
+        self._finalBurst = finalBurst
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                print("[Clock Sync] Sync thread did not finish in " + str(timeout) + " s, fitting without its last burst")
+            self.thread = None
+
+    # Starts over for the next session
+    def reset(self):
+        with self._lock:
+            self.points = []
+            self._generation += 1
+        self.lost = 0
+        self.replied = False
+
+    def close(self):
+        self.stop()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    # Least squares line through the burst points, None if the recorder never answered
+    def fit(self):
+        with self._lock:
+            points = list(self.points)
+        if not points:
+            return None
+        reference = points[0][0]
+        xs = [float(mid - reference) for mid, _, _ in points]
+        ys = [offset for _, offset, _ in points]
+        meanX = sum(xs) / len(xs)
+        meanY = sum(ys) / len(ys)
+        sxx = sum((x - meanX) ** 2 for x in xs)
+        drift = sum((x - meanX) * (y - meanY) for x, y in zip(xs, ys)) / sxx if sxx > 0 else 0.0
+        offset = meanY - drift * meanX
+        residuals = [y - (offset + drift * x) for x, y in zip(xs, ys)]
+        return {
+            "reference_ns": reference,
+            "offset_ns": offset,
+            "drift_ppm": drift * 1e6,
+            "samples": len(points),
+            "rtt_ns": statistics.median(rtt for _, _, rtt in points),
+            "residual_ns": statistics.pstdev(residuals) if len(residuals) > 1 else 0.0,
+        }
+
+
+# Local stamp -> recorder clock
+def toRecorder(ns, fit):
+    return ns + fit["offset_ns"] + fit["drift_ppm"] / 1e6 * (ns - fit["reference_ns"])
+
+
+# clocksync.csv row for a fit, anchor is the Timebase.timeAnchor the session's rows were written with
+def clockSyncRow(sessionID, participantID, recorder, fit, anchor, timestamp=None):
+    return (
+        timestamp or stamp(), sessionID, participantID, recorder,
+        fit["reference_ns"], round(fit["offset_ns"]), fit["drift_ppm"], fit["samples"],
+        round(fit["rtt_ns"]), round(fit["residual_ns"]),
+        anchor.wall.isoformat(), anchor.mono_ns,
+    )
+
+
+def loadClockSync(clockFile, session_id=None):
+    if not os.path.exists(clockFile):
+        return pd.DataFrame(columns=CLOCKSYNC_COLUMNS)
+    df = pd.read_csv(clockFile, dtype={"session_id": str, "participant_id": str, "recorder": str})
+    if session_id is not None:
+        df = df[df["session_id"] == session_id]
+    return df
+
+
+# Adds recorder_ns (the row's time on the recorder's clock) to results rows with a datetime Timestamp.
+# Sessions without a clocksync row (or clock=None) are left empty. If a session was synced more than once the last fit is used.
+def applyClockSync(df, clock):
+    recorder = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    if clock is not None and len(clock):
+        fits = clock.drop_duplicates("session_id", keep="last").set_index("session_id")
+        for sessionID, rows in df.groupby("session_id", observed=True).groups.items():
+            if sessionID not in fits.index:
+                continue
+            fit = fits.loc[sessionID]
+            # Undo the anchor to get the stamps back, then move them onto the recorder's clock
+            since = (df.loc[rows, "Timestamp"] - pd.Timestamp(fit["anchor_wall"])) / pd.Timedelta(1, "ns")
+            mono = since + int(fit["anchor_mono_ns"])
+            corrected = mono + float(fit["offset_ns"]) + float(fit["drift_ppm"]) / 1e6 * (mono - int(fit["reference_ns"]))
+            recorder.loc[rows] = corrected.round().astype("int64").values
+    df["recorder_ns"] = recorder
+    return df
+
+
+if __name__ == "__main__":
+    # python ClockSync.py serve [--offset-ms 12.5 --drift-ppm 40]   stand-in recorder
+    # python ClockSync.py probe [--seconds 10]                       prints the fit against a running recorder
+    parser = argparse.ArgumentParser(description="Clock sync with an external recorder over UDP")
+    parser.add_argument("mode", choices=("serve", "probe"))
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0])
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument("--offset-ms", type=float, default=0.0)
+    parser.add_argument("--drift-ppm", type=float, default=0.0)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        server = recorderServer((args.host, args.port), args.offset_ms, args.drift_ppm)
+        print("[Clock Sync] Recorder listening on " + str(server.address))
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        client = clockSync((args.host, args.port))
+        client.start(interval=0.5)
+        time.sleep(args.seconds)
+        client.close()
+        print(client.fit())
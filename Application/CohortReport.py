@@ -0,0 +1,245 @@
+import os, sys, html, argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+# Reports are rendered off screen, no Qt needed (or wanted in the worker processes)
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+import pandas as pd
+
+import SessionIndex
+from SessionSummary import loadSummaries
+from ResultsStore import resultsStore
+
+
+# Study level reports.
+#   python CohortReport.py [--store Results/results.db] [--conditions conditions.csv] [--jobs 8] [--out Results/reports]
+# writes, under the reports folder:
+#   index.html                       every participant and condition, plus the cohort table
+#   participants/<P>.html + PNGs     that participant's sessions: summary table, metrics over the session
+#   conditions/<condition>.html      participants compared within a condition
+# Tables come from the per session summaries (summary.csv or the store's summaries table), the time series from
+# the metric rows, read per participant through the session index (or the store). Every participant and every
+# condition is rendered by its own worker process.
+#
+# conditions.csv maps sessions or participants to a condition: columns session_id or participant_id, and condition.
+# Without it everything is one condition, "all".
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+
+TASK_TYPES = ["Sorting Task", "Packaging Task", "Inspection Task"]
+# (metric_type, y label) plotted over the session for every participant
+SERIES = [("Throughput", "box / s"), ("User Accuracy", "%"), ("Actual Error Rate", "%"), ("Average Response Time", "s")]
+# (summary column, label) compared across participants in a condition
+COMPARED = [("throughput", "Throughput (box / s)"), ("error_rate", "Error rate (%)"),
+            ("accuracy", "Accuracy (%)"), ("resp_mean", "Mean response time (s)")]
+TABLE_COLUMNS = ["session_id", "task_type", "duration_s", "boxes_processed", "injected_errors", "corrections",
+                 "throughput", "error_rate", "accuracy", "resp_count", "resp_mean", "resp_p50", "resp_p90"]
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; font-size: 0.9em; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 0.25em 0.6em; text-align: right; }}
+th {{ background: #f0f0f0; }}
+img {{ max-width: 100%; margin-bottom: 1em; }}
+</style></head>
+<body>
+<h1>{title}</h1>
+{body}
+</body></html>
+"""
+
+
+#--------------------------------
+# Inputs
+#--------------------------------
+def loadCohort(resultsDir, store=None):
+    if store is not None:
+        store = resultsStore(store)
+        try:
+            summaries = store.summaries()
+        finally:
+            store.close()
+    else:
+        summaries = loadSummaries(os.path.join(resultsDir, "summary.csv"))
+    return summaries.sort_values(["participant_id", "session_id", "task_type"]).reset_index(drop=True)
+
+
+# Adds a condition column from the mapping file, sessions take precedence over participants
+def assignConditions(summaries, conditionFile=None):
+    summaries = summaries.copy()
+    summaries["condition"] = "all"
+    if conditionFile is None:
+        return summaries
+    mapping = pd.read_csv(conditionFile, dtype=str)
+    for key in ("participant_id", "session_id"):
+        if key in mapping.columns:
+            byKey = mapping.dropna(subset=[key]).set_index(key)["condition"]
+            matched = summaries[key].map(byKey)
+            summaries["condition"] = matched.fillna(summaries["condition"])
+    return summaries
+
+
+def _participantMetrics(source, participantID):
+    kind, location = source
+    if kind == "store":
+        store = resultsStore(location)
+        try:
+            return store.get_participant(participantID)
+        finally:
+            store.close()
+    metrics = SessionIndex.load_participant(location, participantID, dtype={"session_id": str, "participant_id": str})
+    metrics["Timestamp"] = pd.to_datetime(metrics["Timestamp"], format="ISO8601", errors="coerce")
+    return metrics
+
+
+#--------------------------------
+# Rendering (worker processes)
+#--------------------------------
+def _slug(name):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(name)) or "_"
+
+
+def _save(fig, folder, name):
+    fig.tight_layout()
+    fig.savefig(os.path.join(folder, name), dpi=100)
+    return name
+
+
+def _table(df, columns=None):
+    columns = [c for c in (columns or df.columns) if c in df.columns]
+    return df[columns].to_html(index=False, float_format=lambda v: format(v, ".3g"), na_rep="", border=0)
+
+
+# One participant: their session table and every metric over each session, one line per session
+def renderParticipant(job):
+    participantID, summaries, source, folder = job
+    os.makedirs(folder, exist_ok=True)
+    slug = _slug(participantID)
+    metrics = _participantMetrics(source, participantID)
+
+    images = []
+    for metricType, unit in SERIES:
+        rows = metrics[metrics["metric_type"] == metricType]
+        if rows.empty:
+            continue
+        tasks = [t for t in TASK_TYPES if t in set(rows["task_type"])]
+        fig = Figure(figsize=(4.5 * len(tasks), 3.2))
+        for position, taskType in enumerate(tasks):
+            axes = fig.add_subplot(1, len(tasks), position + 1)
+            for sessionID, series in rows[rows["task_type"] == taskType].groupby("session_id"):
+                seconds = (series["Timestamp"] - series["Timestamp"].iloc[0]).dt.total_seconds()
+                axes.plot(seconds, pd.to_numeric(series["value"], errors="coerce"), label=sessionID, linewidth=1)
+            axes.set_title(metricType + " | " + taskType, fontsize=9)
+            axes.set_xlabel("s since first sample", fontsize=8)
+            axes.set_ylabel(unit, fontsize=8)
+            axes.tick_params(labelsize=7)
+            axes.legend(fontsize=7)
+        images.append(_save(fig, folder, slug + "_" + _slug(metricType) + ".png"))
+
+    body = "<p>Condition: " + html.escape(", ".join(sorted(set(summaries["condition"])))) + "</p>"
+    body += "<h2>Sessions</h2>" + _table(summaries, TABLE_COLUMNS)
+    body += "".join('<img src="' + image + '">' for image in images)
+    page = slug + ".html"
+    with open(os.path.join(folder, page), "w", encoding="utf-8") as f:
+        f.write(PAGE.format(title="Participant " + html.escape(str(participantID)), body=body))
+    return participantID, page
+
+
+# One condition: per participant means, and the spread across participants per task
+def renderCondition(job):
+    condition, summaries, folder = job
+    os.makedirs(folder, exist_ok=True)
+    slug = _slug(condition)
+    columns = [c for c, _ in COMPARED if c in summaries.columns]
+    byParticipant = summaries.groupby(["participant_id", "task_type"])[columns + ["duration_s"]].mean().reset_index()
+    byParticipant.insert(2, "sessions", summaries.groupby(["participant_id", "task_type"])["session_id"].nunique().values)
+
+    tasks = [t for t in TASK_TYPES if t in set(summaries["task_type"])]
+    fig = Figure(figsize=(4 * len(COMPARED), 3.5))
+    for position, (column, label) in enumerate(COMPARED):
+        axes = fig.add_subplot(1, len(COMPARED), position + 1)
+        data = [byParticipant.loc[byParticipant["task_type"] == t, column].dropna() for t in tasks]
+        axes.boxplot(data, showmeans=True)
+        for x, values in enumerate(data, start=1):
+            axes.scatter([x] * len(values), values, s=10, alpha=0.6)
+        axes.set_xticks(range(1, len(tasks) + 1))
+        axes.set_xticklabels([t.replace(" Task", "") for t in tasks], fontsize=8)
+        axes.set_title(label, fontsize=9)
+        axes.tick_params(labelsize=7)
+    image = _save(fig, folder, slug + ".png")
+
+    body = "<p>" + str(summaries["participant_id"].nunique()) + " participants, " + str(summaries["session_id"].nunique()) + " sessions</p>"
+    body += '<img src="' + image + '">'
+    body += "<h2>Per participant (mean over sessions)</h2>" + _table(byParticipant)
+    page = slug + ".html"
+    with open(os.path.join(folder, page), "w", encoding="utf-8") as f:
+        f.write(PAGE.format(title="Condition " + html.escape(str(condition)), body=body))
+    return condition, page
+
+
+#--------------------------------
+# Report
+#--------------------------------
+def buildReport(resultsDir=RESULTS_DIR, outDir=None, store=None, conditionFile=None, jobs=None, participants=None):
+    outDir = outDir or os.path.join(resultsDir, "reports")
+    summaries = assignConditions(loadCohort(resultsDir, store), conditionFile)
+    if participants is not None:
+        summaries = summaries[summaries["participant_id"].isin(participants)]
+    if summaries.empty:
+        print("[Cohort Report] No session summaries to report on")
+        return None
+
+    source = ("store", store) if store is not None else ("csv", os.path.join(resultsDir, "metrics.csv"))
+    participantDir = os.path.join(outDir, "participants")
+    conditionDir = os.path.join(outDir, "conditions")
+    participantJobs = [(pid, rows, source, participantDir) for pid, rows in summaries.groupby("participant_id")]
+    conditionJobs = [(condition, rows, conditionDir) for condition, rows in summaries.groupby("condition")]
+
+    pages = {"participants": [], "conditions": []}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        participantPages = [pool.submit(renderParticipant, job) for job in participantJobs]
+        conditionPages = [pool.submit(renderCondition, job) for job in conditionJobs]
+        for future in participantPages:
+            try:
+                pages["participants"].append(future.result())
+            except Exception as e:
+                print("[Cohort Report] Participant report failed: " + str(e))
+        for future in conditionPages:
+            try:
+                pages["conditions"].append(future.result())
+            except Exception as e:
+                print("[Cohort Report] Condition report failed: " + str(e))
+
+    cohort = summaries.groupby(["condition", "task_type"]).agg(
+        participants=("participant_id", "nunique"), sessions=("session_id", "nunique"),
+        throughput=("throughput", "mean"), error_rate=("error_rate", "mean"),
+        accuracy=("accuracy", "mean"), resp_mean=("resp_mean", "mean")).reset_index()
+    cohort.to_csv(os.path.join(outDir, "cohort.csv"), index=False)
+
+    body = "<h2>Conditions</h2><ul>" + "".join(
+        '<li><a href="conditions/' + page + '">' + html.escape(str(name)) + "</a></li>" for name, page in pages["conditions"]) + "</ul>"
+    body += "<h2>Cohort</h2>" + _table(cohort)
+    body += "<h2>Participants</h2><ul>" + "".join(
+        '<li><a href="participants/' + page + '">' + html.escape(str(name)) + "</a></li>" for name, page in pages["participants"]) + "</ul>"
+    index = os.path.join(outDir, "index.html")
+    with open(index, "w", encoding="utf-8") as f:
+        f.write(PAGE.format(title="Cohort report", body=body))
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per participant and per condition HTML/PNG reports")
+    parser.add_argument("--results", default=RESULTS_DIR)
+    parser.add_argument("--store", help="read from this results.db instead of the CSV files")
+    parser.add_argument("--conditions", help="CSV mapping session_id or participant_id to condition")
+    parser.add_argument("--participant", action="append", help="only these participants (repeatable)")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--out", help="report folder (default: <results>/reports)")
+    args = parser.parse_args()
+
+    index = buildReport(args.results, args.out, args.store, args.conditions, args.jobs, args.participant)
+    if index is not None:
+        print("Report written to " + index)
@@ -1,169 +1,341 @@
-import sys, os, datetime
+import sys, os, threading, shutil, copy
 import pandas as pd
 
+from ResultsWriter import resultsWriter
+from ResultsStore import resultsStore
+import ParquetArchive
+import Shards
+import SessionIndex
+from StreamingStats import streamingStats
+from IDLedger import idLedger
+from MetricsEngine import metricsEngine
+from DeltaEncoding import metricDeltaFilter
+from EventRecords import RECORD_COLUMNS, ACTIVITY_CODES, taskEvent, eventCode
+from SessionSummary import SUMMARY_COLUMNS, summaryRow
+from Timebase import stamp, timeAnchor
+import ClockSync
+from ClockSync import CLOCKSYNC_COLUMNS, clockSyncRow
+from TraceRecorder import traceRecorder
+import EventBus
+from EventBus import eventBus
+
+# Also write every row into Results/results.db (SQLite, indexed by session/participant/task/time)
+RESULTS_STORE_ENABLED = False
+# Convert each session into Results/archive (partitioned parquet) once it is stopped. Needs pyarrow.
+PARQUET_ARCHIVE_ENABLED = False
+
+# Every process/session writes its own files under Results/shards, for several stations sharing one Results folder.
+# 'python Shards.py' merges finished shards into metrics.csv / events.csv.
+SHARDED_RESULTS_ENABLED = False
+
+# Estimate the offset/drift to an external recorder (ClockSync.py) during every session and write it to
+# Results/clocksync.csv. The recorder has to answer on CLOCK_SYNC_ADDRESS.
+CLOCK_SYNC_ENABLED = False
+CLOCK_SYNC_ADDRESS = ClockSync.DEFAULT_ADDRESS
+CLOCK_SYNC_RECORDER = "recorder"
+CLOCK_SYNC_INTERVAL_S = 2.0
+# How long Stop waits for the last burst
+CLOCK_SYNC_FINAL_WAIT_S = 0.3
+
+# Also log every box processed / error injected / correction / response time and the session clock to events.csv
+# (event_type "activity" and "session"), so EventReplay.py can recompute the metrics with other windows or definitions.
+ACTIVITY_LOG_ENABLED = True
+
+# Record the position and state of every moving item on every tick to Results/traces/<session>.trace (TraceRecorder.py)
+TRACE_ENABLED = False
+
+# Let a synthetic participant (SyntheticOperator.py) make the corrections in the live task windows, e.g. "average".
+# A SyntheticOperator.PROFILES name, a JSON profile file or None for a human.
+SYNTHETIC_OPERATOR = None
+
+METRIC_COLUMNS = ["Timestamp", "session_id", "participant_id", "metric_type", "task_type", "value", "unit"]
+# Typed event fields (EventRecords.taskEvent) follow the original six columns
+EVENT_COLUMNS = ["Timestamp", "session_id", "participant_id", "event_type", "task_type", "details"] + RECORD_COLUMNS
+
+# (task key, task_type written to the metric file, key in the retrieveMetrics output)
+TASKS = [
+    ("sorting", "Sorting Task", "sortingTask"),
+    ("packaging", "Packaging Task", "packagingTask"),
+    ("inspection", "Inspection Task", "inspectionTask"),
+]
+# Sliding windows (s) written next to the cumulative metrics
+METRIC_WINDOWS = (10, 60)
+
+# Change-only periodic metrics: a row is written when its value moves by more than DELTA_EPSILON,
+# plus a keyframe every DELTA_KEYFRAME_S. DeltaEncoding.expandMetricSeries rebuilds the full series.
+# The epsilon matches the 2 decimal places the OCS shows.
+DELTA_ENCODING_ENABLED = False
+DELTA_EPSILON = 0.01
+DELTA_KEYFRAME_S = 30.0
 
 
 class dataCollection:
-    def __init__(self):
-        self.metricFile = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results\\metrics.csv")
-        self.eventFile = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results\\events.csv")
+    def __init__(self, resultsDir=None, useResultsStore=RESULTS_STORE_ENABLED, deltaEncoding=DELTA_ENCODING_ENABLED, sharded=SHARDED_RESULTS_ENABLED, clockSync=CLOCK_SYNC_ENABLED, trace=TRACE_ENABLED, activityLog=ACTIVITY_LOG_ENABLED):
+        if resultsDir is None:
+            resultsDir = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+        os.makedirs(resultsDir, exist_ok=True)
+        self.resultsDir = resultsDir
+        self.sharded = sharded
+        # Where this process writes. With sharding on these move to the session's shard in getPreviousIDs.
+        self.metricFile = os.path.join(resultsDir, "metrics.csv")
+        self.eventFile = os.path.join(resultsDir, "events.csv")
+        self.summaryFile = os.path.join(resultsDir, "summary.csv")
+        self.clockFile = os.path.join(resultsDir, "clocksync.csv")
+        self.shardDir = None
+        self.idLedger = idLedger(os.path.join(resultsDir, "ids.json"), self.eventFile,
+                                 (lambda: Shards.latestShardSession(resultsDir)) if sharded else None)
 
         self.currentSessionID = ""
         self.currentParticipantID = ""
 
+        # Rows carry monotonic stamps, this pairs them with the wall clock. Renewed when a new session starts.
+        self.timeAnchor = timeAnchor()
+        self.reanchor = False
+
+        # All rows go through the background writer so file IO never happens on the GUI thread
+        self.writer = resultsWriter()
+        self.writer.timeAnchor = self.timeAnchor
+
         # Check for files existing
         self.createMetricFile()
         self.createEventFile()
+        self.createSummaryFile()
+        self.createClockSyncFile()
         self.getPreviousIDs()
 
-
-
-        # I'm not going to fuck around with signals, lovingly, but you can't make me
-        self.iTaskRef = None
-        self.pTaskRef = None
-        self.sTaskRef = None
-
-        self.iResponse = []
-        self.pResponse = []
-        self.sResponse = []
+        # Optional SQLite backend, fed from the writer thread after each CSV batch
+        self.resultsStore = None
+        if useResultsStore:
+            self.enableResultsStore()
+
+        # Tasks that have announced themselves on the bus and not stopped yet
+        self.activeTasks = set()
+        # summary.csv rows of the last stopped session, as dicts
+        self.lastSummary = []
+
+        # Response times (ms) per task, constant memory however long the session runs
+        self.responseStats = {
+            "sorting": streamingStats(),
+            "packaging": streamingStats(),
+            "inspection": streamingStats(),
+        }
 
         self.averageRSorting = 0
         self.averageRInspect = 0
         self.averageRPackage = 0
 
-        self.internalTimer = 0
+        # Counts task events as they happen, all rates come from its pause-aware clock
+        self.metricsEngine = metricsEngine(METRIC_WINDOWS)
+
+        # None writes every periodic row
+        self.deltaFilter = metricDeltaFilter(DELTA_EPSILON, DELTA_KEYFRAME_S) if deltaEncoding else None
+
+        # Offset/drift to the external recorder, measured on its own thread while a session runs
+        self.clockSync = ClockSync.clockSync(CLOCK_SYNC_ADDRESS) if clockSync else None
+
+        # Per tick kinematics, the task windows are attached to it by windowRender
+        self.tracer = traceRecorder() if trace else None
+
+        # The tasks publish what happens on the bus instead of calling in here.
+        # Metrics are pumped on the GUI thread by retrieveMetrics (the engine and the stats are not thread safe),
+        # event records go to the writer from their own thread.
+        # The metrics queue is unbounded (maxQueue=0): it is only pumped every collection interval, and a dropped
+        # message would be a box, error or correction missing from the counts for good.
+        self.bus = eventBus()
+        self.bus.subscribe("metrics", self.onTaskMessages, maxQueue=0, threaded=False,
+                           topics=(EventBus.TASK_STARTED, EventBus.TASK_STOPPED, EventBus.BOX_PROCESSED,
+                                   EventBus.ERROR_INJECTED, EventBus.CORRECTION, EventBus.RESPONSE_TIME))
+        self.bus.subscribe("eventLog", self.onEventRecords, topics=(EventBus.TASK_EVENT,))
+        self.activityLog = activityLog
+        if activityLog:
+            self.bus.subscribe("activityLog", self.onActivity,
+                               topics=(EventBus.TASK_STARTED, EventBus.TASK_STOPPED, EventBus.BOX_PROCESSED,
+                                       EventBus.ERROR_INJECTED, EventBus.CORRECTION, EventBus.RESPONSE_TIME,
+                                       EventBus.DISTRACTION))
+
+    #--------------------------------
+    # Bus subscribers
+    #--------------------------------
+    def onTaskMessages(self, messages):
+        for message in messages:
+            match(message.topic):
+                case EventBus.BOX_PROCESSED:
+                    self.metricsEngine.recordProcessed(message.task, message.time / 1e9)
+                case EventBus.ERROR_INJECTED:
+                    self.metricsEngine.recordError(message.task, message.time / 1e9)
+                case EventBus.CORRECTION:
+                    self.metricsEngine.recordCorrection(message.task, message.time / 1e9)
+                case EventBus.RESPONSE_TIME:
+                    self.updateResponseTime(message.task, message.value, message.time)
+                case EventBus.TASK_STARTED:
+                    self.activeTasks.add(message.task)
+                    self.metricsEngine.resetTask(message.task)
+                case EventBus.TASK_STOPPED:
+                    self.activeTasks.discard(message.task)
+
+    def onEventRecords(self, messages):
+        for message in messages:
+            self.writeEvent(message.value)
+
+    # Raw activity rows, stamped with the time the task published them
+    def onActivity(self, messages):
+        for message in messages:
+            record = taskEvent(ACTIVITY_CODES[(message.task, message.topic)],
+                               actualBin=message.value if message.topic == EventBus.DISTRACTION else None,
+                               responseMs=message.value if message.topic == EventBus.RESPONSE_TIME else None)
+            record.timestamp = message.time
+            self.writeEvent(record)
+
+    #--------------------------------
+    # Session clock
+    #--------------------------------
+    def startSession(self):
+        if self.reanchor:
+            # Everything from the last session was flushed on Stop, so it has been converted with the old anchor
+            self.timeAnchor = timeAnchor()
+            self.writer.timeAnchor = self.timeAnchor
+            self.reanchor = False
+        if self.clockSync is not None:
+            # Keeps running through pauses, the recorder's clock doesn't stop either
+            self.clockSync.start(CLOCK_SYNC_INTERVAL_S)
+        if self.tracer is not None and not self.tracer.isOpen():
+            self.tracer.open(os.path.join(self.resultsDir, "traces", self.currentSessionID + ".trace"), {
+                "session_id": self.currentSessionID,
+                "participant_id": self.currentParticipantID,
+                "anchor_wall": self.timeAnchor.wall.isoformat(),
+                "anchor_mono_ns": self.timeAnchor.mono_ns,
+            })
+        if self.activityLog and not self.metricsEngine.clock.running:
+            self.writeEvent(taskEvent(eventCode.SESSION_RUNNING))
+        self.metricsEngine.clock.start()
+
+    def pauseSession(self):
+        if self.activityLog and self.metricsEngine.clock.running:
+            self.writeEvent(taskEvent(eventCode.SESSION_PAUSED))
+        self.metricsEngine.clock.pause()
+
+    # Last rows of a session, called on Stop before the writes are flushed
+    def finishSession(self):
+        self.bus.pump()
+        if self.deltaFilter is not None:
+            # Closing keyframe for every series so a reader knows where the session ended
+            timestamp = stamp()
+            for taskType, metricType, value, unit in self.deltaFilter.closingKeyframes():
+                self.writeDictionary(self.createMetricDict(metricType, taskType, value, unit, timestamp), "metric")
+            self.deltaFilter.reset()
+        self.writeSummary()
+        self.writeClockSync()
+
+    # Rolls the session up into one summary.csv row per task that ran
+    def writeSummary(self):
+        timestamp = stamp()
+        rows = []
+        for task, taskType, key in TASKS:
+            if task not in self.activeTasks and task not in self.metricsEngine.tasks:
+                continue
+            row = summaryRow(self.currentSessionID, self.currentParticipantID, taskType,
+                             self.metricsEngine.snapshot(task), self.responseSummary(task), timestamp)
+            self.writer.write(self.summaryFile, row)
+            rows.append(dict(zip(SUMMARY_COLUMNS, row)))
+        # Kept for the OCS so it doesn't have to read the file back
+        self.lastSummary = rows
+        return rows
+
+    # Fits the clock sync points of the session into one clocksync.csv row
+    def writeClockSync(self):
+        if self.clockSync is None:
+            return None
+        # One last burst so the fit covers the end of the session, on the sync thread and bounded so Stop doesn't hang
+        self.clockSync.stop(finalBurst=True, timeout=CLOCK_SYNC_FINAL_WAIT_S)
+        fit = self.clockSync.fit()
+        self.clockSync.reset()
+        if fit is None:
+            print("[Data Collection] No reply from the recorder at " + str(CLOCK_SYNC_ADDRESS) + ", session " + self.currentSessionID + " is not synced")
+            return None
+        self.writer.write(self.clockFile, clockSyncRow(self.currentSessionID, self.currentParticipantID, CLOCK_SYNC_RECORDER, fit, self.timeAnchor))
+        return fit
+
+    # Clears counters and the clock so the next session starts from zero
+    def endSession(self):
+        # Anything still waiting belongs to the session that just ended
+        self.bus.pump()
+        self.metricsEngine.reset()
+        self.reanchor = True
+        if self.tracer is not None:
+            self.tracer.close()
+        if self.sharded:
+            self.flushWrites()
+            self.closeShard()
+        for stats in self.responseStats:
+            self.responseStats[stats] = streamingStats()
+        self.averageRSorting = 0
+        self.averageRInspect = 0
+        self.averageRPackage = 0
 
-    
+    def updateResponseTime(self, task, response, timestamp=None):
+        stats = self.responseStats[task]
+        stats.add(response)
 
-    def setSortingTask(self,task):
-        self.sTaskRef = task
-    
-    def setPackagingTask(self,task):
-        self.pTaskRef = task
-    
-    def setInspectionTask(self,task):
-        self.iTaskRef = task
-
-    def updateResponseTime(self, task, response):
         match(task):
             case "sorting":
-                self.sResponse.append(response)
-                self.averageRSorting = self.getAverageFromArray(self.sResponse) / 1000
-                self.writeDictionary(self.createMetricDict("Average Response Time", "Sorting Task", self.averageRSorting, "s"),"metric")
-
-            case "inspection": 
-                self.iResponse.append(response)
-                self.averageRInspection = self.getAverageFromArray(self.iResponse) / 1000
-                self.writeDictionary(self.createMetricDict("Average Response Time", "Inspection Task", self.averageRInspection, "s"),"metric")
+                taskType = "Sorting Task"
+                self.averageRSorting = stats.mean / 1000
+            case "inspection":
+                taskType = "Inspection Task"
+                self.averageRInspect = stats.mean / 1000
             case "packaging":
-                self.pResponse.append(response)
-                self.averageRPackage= self.getAverageFromArray(self.pResponse) / 1000
-                self.writeDictionary(self.createMetricDict("Average Response Time", "Packaging Task", self.averageRPackage, "s"),"metric")
+                taskType = "Packaging Task"
+                self.averageRPackage = stats.mean / 1000
+
+        self.writeDictionary(self.createMetricDict("Average Response Time", taskType, stats.mean / 1000, "s", timestamp),"metric")
+        self.writeDictionary(self.createMetricDict("Response Time P50", taskType, stats.quantile(0.5) / 1000, "s", timestamp),"metric")
+        self.writeDictionary(self.createMetricDict("Response Time P90", taskType, stats.quantile(0.9) / 1000, "s", timestamp),"metric")
+        self.writeDictionary(self.createMetricDict("Response Time P99", taskType, stats.quantile(0.99) / 1000, "s", timestamp),"metric")
 
-    def getAverageFromArray(self, array):
-        total = 0
-        length = len(array)
-        for i in array:
-            total += i 
-        
-        return total / length
+    # Response time distribution for a task in seconds: count, mean, std, min, max, p50, p90, p99
+    def responseSummary(self, task):
+        return self.responseStats[task].summary(1 / 1000)
 
 
 
     def retrieveMetrics(self):
-        self.internalTimer += 1
-        sMetrics = None
-        iMetrics = None
-        pMetrics = None
-        if self.sTaskRef is not None:
-            sMetrics = self.sTaskRef.returnData()
-            print(sMetrics)
-            if sMetrics[1] != 0 and sMetrics[2] != 0:
-                sErrorRate = sMetrics[2] / sMetrics[1] * 100
-            else:
-                sErrorRate = 0
-
-            if sMetrics[1] != 0:    
-                sThroughput = sMetrics[1] / self.internalTimer
-            else: 
-                sThroughput = 0
-
-            if sMetrics[0] != 0:
-                if sMetrics[3] != 0:
-                    sAccuracy = sMetrics[3] / sMetrics[0]  * 100
-                else:
-                    sAccuracy = 0
-            else:
-                sAccuracy = 100
-            # Throughput, Error rate, User Accuracy, Corrections
-            sMetrics = [sThroughput, sErrorRate, sAccuracy, sMetrics[3], self.averageRSorting]
-
-            self.writeDictionary(self.createMetricDict("Throughput", "Sorting Task", sThroughput, "box / s"),"metric")
-            self.writeDictionary(self.createMetricDict("Actual Error Rate", "Sorting Task", sErrorRate, "%"),"metric")
-            self.writeDictionary(self.createMetricDict("User Accuracy", "Sorting Task", sAccuracy, "%"),"metric")
-            self.writeDictionary(self.createMetricDict("Corrections", "Sorting Task", sMetrics[3], "box"),"metric")
-
-
-        if self.pTaskRef is not None:
-            pMetrics = self.pTaskRef.returnData()
-            print(pMetrics)
-
-            if pMetrics[1] != 0:
-                pThroughput = pMetrics[1] / self.internalTimer
-            else: 
-                pThroughput = 0 
-
-            if pMetrics[2] != 0 and pMetrics[1] != 0:
-                pErrorRate = pMetrics[2] / pMetrics[1] * 100
-            else:
-                pErrorRate = 0
-            
-            if pMetrics[0] != 0:
-                if pMetrics[3] != 0:
-                    pAccuracy = pMetrics[3] / pMetrics[0]  * 100
-                else:
-                    pAccuracy = 0
-            else: 
-                pAccuracy = 100    
-            # Throughput, Error rate, User Accuracy, Corrections
-            pMetrics = [pThroughput, pErrorRate, pAccuracy, pMetrics[3], self.averageRPackage]
-
-            self.writeDictionary(self.createMetricDict("Throughput", "Packaging Task", pThroughput, "box / s"),"metric")
-            self.writeDictionary(self.createMetricDict("Actual Error Rate", "Packaging Task", pErrorRate, "%"),"metric")
-            self.writeDictionary(self.createMetricDict("User Accuracy", "Packaging Task", pAccuracy, "%"),"metric")
-            self.writeDictionary(self.createMetricDict("Corrections", "Packaging Task", pMetrics[3], "box"),"metric")
-
-        if self.iTaskRef is not None:
-            iMetrics = self.iTaskRef.returnData()
-            print(iMetrics)
-            
-            if iMetrics[1] != 0:
-                iThroughput = iMetrics[1] / self.internalTimer
-            else: 
-                iThroughput = 0
-            
-            if iMetrics[2] != 0 and iMetrics[1] != 0:
-                iErrorRate = iMetrics[2] / iMetrics[1] * 100
-            else: 
-                iErrorRate = 0
-            
-            if iMetrics[0] != 0:
-                if iMetrics[3] != 0:
-                    iAccuracy = iMetrics[3] / iMetrics[0]  * 100
-                else: 
-                    iAccuracy = 0
-            else:
-                iAccuracy = 100
-
-            # Throughput, Error rate, User Accuracy, Corrections
-            iMetrics = [iThroughput, iErrorRate, iAccuracy, iMetrics[3], self.averageRSorting]
-
-            self.writeDictionary(self.createMetricDict("Throughput", "Inspection Task", iThroughput, "box / s"),"metric")
-            self.writeDictionary(self.createMetricDict("Actual Error Rate", "Inspection Task", iErrorRate, "%"),"metric")
-            self.writeDictionary(self.createMetricDict("User Accuracy", "Inspection Task", iAccuracy, "%"),"metric")
-            self.writeDictionary(self.createMetricDict("Corrections", "Inspection Task", iMetrics[3], "box"),"metric")
-
-        return {"sortingTask": sMetrics, "packagingTask": pMetrics, "inspectionTask": iMetrics}
+        self.bus.pump("metrics")
+
+        # One stamp for the whole sample, every row of it is for the same moment
+        timestamp = stamp()
+        output = {}
+        averages = {"sorting": self.averageRSorting, "packaging": self.averageRPackage, "inspection": self.averageRInspect}
+
+        for task, taskType, key in TASKS:
+            if task not in self.activeTasks:
+                output[key] = None
+                continue
+
+            snap = self.metricsEngine.snapshot(task)
+            resp = self.responseSummary(task)
+
+            # Throughput, Error rate, User Accuracy, Corrections, Avg Response, Response P50, P90, P99
+            output[key] = [snap["throughput"], snap["errorRate"], snap["legacyAccuracy"], snap["corrected"], averages[task], resp["p50"], resp["p90"], resp["p99"]]
+
+            self.writePeriodicMetric("Throughput", taskType, snap["throughput"], "box / s", timestamp)
+            self.writePeriodicMetric("Actual Error Rate", taskType, snap["errorRate"], "%", timestamp)
+            self.writePeriodicMetric("User Accuracy", taskType, snap["legacyAccuracy"], "%", timestamp)
+            self.writePeriodicMetric("Corrections", taskType, snap["corrected"], "box", timestamp)
+
+            for window, values in snap["windows"].items():
+                suffix = " (" + str(window) + "s)"
+                self.writePeriodicMetric("Throughput" + suffix, taskType, values["throughput"], "box / s", timestamp)
+                self.writePeriodicMetric("Actual Error Rate" + suffix, taskType, values["errorRate"], "%", timestamp)
+                self.writePeriodicMetric("User Accuracy" + suffix, taskType, values["accuracy"], "%", timestamp)
+
+        return output
+
+    # Periodic (sampled) metric rows, these go through the delta filter when it is on
+    def writePeriodicMetric(self, metricType, taskType, value, unit, timestamp=None):
+        timestamp = timestamp or stamp()
+        if self.deltaFilter is not None and not self.deltaFilter.shouldEmit(taskType, metricType, value, unit, timestamp / 1e9):
+            return
+        self.writeDictionary(self.createMetricDict(metricType, taskType, value, unit, timestamp), "metric")
 
     # Enforced the existence of files if they do not exist
     def createMetricFile(self):
@@ -171,50 +343,68 @@ class dataCollection:
         if os.path.exists(self.metricFile):
             return
         # Set up headers.
-        df = pd.DataFrame.from_dict({
-            "Timestamp": [], 
-            "session_id": [],
-            "participant_id": [],
-            "metric_type": [],
-            "task_type": [],
-            "value": [],
-            "unit": []
-        })
-        
+        df = pd.DataFrame(columns=METRIC_COLUMNS)
+
         df.to_csv(self.metricFile, header=True, index=False)
 
     def createEventFile(self):
-        # Already exists, don't waste time.
+        # Already exists, don't waste time. Older files just need the newer columns added to the header.
         if os.path.exists(self.eventFile):
+            upgradeHeader(self.eventFile, EVENT_COLUMNS)
             return
         # Set up headers.
-        df = pd.DataFrame.from_dict({"Timestamp": [], 
-            "session_id": [],
-            "participant_id": [],
-            "event_type": [],
-            "task_type": [],
-            "details": [],
-        })
-        
+        df = pd.DataFrame(columns=EVENT_COLUMNS)
+
         df.to_csv(self.eventFile, header=True, index=False)
+
+    def createSummaryFile(self):
+        if os.path.exists(self.summaryFile):
+            upgradeHeader(self.summaryFile, SUMMARY_COLUMNS)
+            return
+        pd.DataFrame(columns=SUMMARY_COLUMNS).to_csv(self.summaryFile, header=True, index=False)
+
+    def createClockSyncFile(self):
+        if os.path.exists(self.clockFile):
+            return
+        pd.DataFrame(columns=CLOCKSYNC_COLUMNS).to_csv(self.clockFile, header=True, index=False)
     
-    # Gets last participant and session ID from metric file, if any
-        # No real reason for metric file in particular, either file works. 
+    # Allocates the next session ID (and carries over the last participant ID) from the ID ledger
+        # The ledger recovers from the tail of the event file by itself, no full read of the file needed
     def getPreviousIDs(self):
-        df = pd.read_csv(self.eventFile, usecols=['session_id','participant_id'], encoding="utf8")
-
-        # Make sure we have more than one line, aka we either don't have a prior ID or file is new
-        if df["session_id"].count() >= 1:
-            self.currentSessionID = df["session_id"].tail(1).values[0]
-            self.currentParticipantID = df["participant_id"].tail(1).values[0]
+        self.currentSessionID, self.currentParticipantID = self.idLedger.allocateSession()
+        self.openSessionFiles()
+
+    # Makes sure the files for the current session exist and are known to the writer
+    def openSessionFiles(self):
+        if self.sharded:
+            self.openShard()
+        self.writer.registerFile(self.metricFile, METRIC_COLUMNS, indexed=True)
+        self.writer.registerFile(self.eventFile, EVENT_COLUMNS, indexed=True)
+        self.writer.registerFile(self.summaryFile, SUMMARY_COLUMNS)
+        self.writer.registerFile(self.clockFile, CLOCKSYNC_COLUMNS)
+
+    # Points the results files at a fresh shard for the current session
+    def openShard(self):
+        self.closeShard()
+        self.shardDir = Shards.shardDirectory(self.resultsDir, self.currentSessionID)
+        os.makedirs(self.shardDir, exist_ok=True)
+        self.metricFile = os.path.join(self.shardDir, "metrics.csv")
+        self.eventFile = os.path.join(self.shardDir, "events.csv")
+        self.summaryFile = os.path.join(self.shardDir, "summary.csv")
+        self.clockFile = os.path.join(self.shardDir, "clocksync.csv")
+        self.createMetricFile()
+        self.createEventFile()
+        self.createSummaryFile()
+        self.createClockSyncFile()
 
-            # Once we have these, we sort of already know that we want to increase them, new session at least. 
-            self.newSessionID()
+    # Marks the current shard as finished so it can be merged. Rows must already be flushed.
+    def closeShard(self):
+        if self.shardDir is not None:
+            Shards.markComplete(self.shardDir)
+            self.shardDir = None
 
-        else:
-            # First IDs
-            self.currentSessionID = "S001"
-            self.currentParticipantID = "P001"
+    def mergeShards(self, includeIncomplete=False):
+        return Shards.mergeShards(self.resultsDir, {"metrics.csv": METRIC_COLUMNS, "events.csv": EVENT_COLUMNS, "summary.csv": SUMMARY_COLUMNS, "clocksync.csv": CLOCKSYNC_COLUMNS}, includeIncomplete)
 
 
     # Updates Session ID
@@ -224,11 +414,13 @@ class dataCollection:
                 self.currentSessionID = "S" + str(int(s) + 1).zfill(3)
 
     def setNewParticipantID(self, newIDNum):
-        self.currentParticipantID = "S" + str(int(newIDNum) + 1).zfill(3)
+        self.currentParticipantID = "P" + str(int(newIDNum) + 1).zfill(3)
+        self.idLedger.setParticipant(self.currentParticipantID)
                 
-    def createMetricDict(self, metricType, taskType, value, unit):
+    # timestamp is a Timebase stamp, the writer turns it into wall time
+    def createMetricDict(self, metricType, taskType, value, unit, timestamp=None):
         metDict = {
-            "Timestamp": [datetime.datetime.now()],
+            "Timestamp": [timestamp or stamp()],
             "session_id": [self.currentSessionID],
             "participant_id": [self.currentParticipantID],
             "metric_type": [metricType],
@@ -240,7 +432,7 @@ class dataCollection:
 
     def createEventDict(self, eventType, task, details):
         evenDict = {
-            "Timestamp": [datetime.datetime.now()],
+            "Timestamp": [stamp()],
             "session_id": [self.currentSessionID],
             "participant_id": [self.currentParticipantID],
             "event_type": [eventType],
@@ -252,18 +444,139 @@ class dataCollection:
 
 
     # Handles all writes to files
+        # Rows are handed to the background writer, the actual append happens off the GUI thread
     def writeDictionary(self, dictionary, dataType):
         # Selects appropriate file
-        location = ""
         if dataType == "metric":
             location = self.metricFile
         elif dataType == "event":
             location = self.eventFile
         else:
             print("[Data Collection] DataType is invalid or spelt wrong, either 'metric' or 'event'")
+            return
+
+        # Columns the dictionary doesn't have are left empty
+        length = len(next(iter(dictionary.values())))
+        for row in zip(*[dictionary.get(c, [None] * length) for c in self.writer.columns[location]]):
+            self.writer.write(location, row)
+
+    # Typed events (EventRecords.taskEvent). The record itself is queued and only turned into a row on the writer thread.
+    def writeEvent(self, record):
+        record.sessionID = self.currentSessionID
+        record.participantID = self.currentParticipantID
+        self.writer.write(self.eventFile, record)
+
+    # Blocks until everything published so far is on disk
+    def flushWrites(self):
+        self.bus.pump()
+        self.bus.flush()
+        self.writer.flush()
+
+    # Per subscriber queue depth, delivered and dropped messages
+    def busStats(self):
+        return self.bus.stats()
+
+    # One session's rows, read through the byte offset index instead of parsing the whole file
+    def load_session(self, session_id, dataType="metric"):
+        self.flushWrites()
+        location = self.metricFile if dataType == "metric" else self.eventFile
+        return SessionIndex.load_session(location, session_id, parse_dates=["Timestamp"])
+
+    #--------------------------------
+    # Checkpoints (see Checkpoint.py)
+    #--------------------------------
+    # Copy of everything needed to carry the session on after a crash, nothing in it is shared with live objects
+    def checkpointState(self):
+        self.bus.pump("metrics")
+        return {
+            "sessionID": self.currentSessionID,
+            "participantID": self.currentParticipantID,
+            "metrics": self.metricsEngine.state(),
+            "responseStats": copy.deepcopy(self.responseStats),
+            "averages": (self.averageRSorting, self.averageRPackage, self.averageRInspect),
+        }
+
+    # Puts a checkpoint back. The tasks must already have been created (and their TASK_STARTED pumped)
+    # so they don't reset the restored counters.
+    def restoreCheckpoint(self, state):
+        self.bus.pump()
+        self.currentSessionID = state["sessionID"]
+        self.currentParticipantID = state["participantID"]
+        self.openSessionFiles()
+
+        self.metricsEngine.restore(state["metrics"])
+        self.responseStats = copy.deepcopy(state["responseStats"])
+        self.averageRSorting, self.averageRPackage, self.averageRInspect = state["averages"]
+        if self.deltaFilter is not None:
+            self.deltaFilter.reset()
+
+    # Queue depth, flush latency, dropped rows etc.
+    def writerStats(self):
+        return self.writer.stats()
+
+    def close(self):
+        if self.clockSync is not None:
+            self.clockSync.close()
+        if self.tracer is not None:
+            self.tracer.close()
+        self.bus.close()
+        self.writer.close()
+        self.closeShard()
+        if self.resultsStore is not None:
+            self.resultsStore.close()
+
+    def enableResultsStore(self, path=None):
+        if self.resultsStore is not None:
+            return
+        if path is None:
+            path = os.path.join(self.resultsDir, "results.db")
+        self.resultsStore = resultsStore(path)
+        # Keyed by file name, the files themselves move from shard to shard
+        tables = {"metrics.csv": "metrics", "events.csv": "events", "summary.csv": "summaries"}
+        def sink(location, rows):
+            table = tables.get(os.path.basename(location))
+            if table is not None:
+                self.resultsStore.insertRows(table, rows)
+        self.writer.addSink(sink)
+
+    # Archives a finished session to parquet on a background thread. Rows must already be flushed.
+    def archiveSession(self, sessionID):
+        if not PARQUET_ARCHIVE_ENABLED:
+            return
+        if not ParquetArchive.parquetAvailable():
+            print("[Data Collection] pyarrow not installed, session " + str(sessionID) + " not archived")
+            return
 
-        df = pd.DataFrame.from_dict(dictionary)
-        df.to_csv(location, mode="a", header=False, index = False)
+        # Taken now, a sharded collector points these at the next session's shard as soon as that one starts
+        metricFile, eventFile, clockFile = self.metricFile, self.eventFile, self.clockFile
+
+        def run():
+            try:
+                ParquetArchive.exportResults(metricFile, eventFile, os.path.join(self.resultsDir, "archive"), sessions=[sessionID],
+                                             clockFile=clockFile)
+            except Exception as e:
+                print("[Data Collection] Failed to archive session " + str(sessionID) + ": " + str(e))
+
+        threading.Thread(target=run, name="parquetArchive", daemon=True).start()
+
+# Rewrites the header line of an older results file whose columns are a prefix of the current ones.
+# Old rows are left as they are, readers see the new columns as empty for them.
+def upgradeHeader(location, columns):
+    with open(location, "r", encoding="utf8") as f:
+        current = f.readline().strip().split(",")
+    if current == columns:
+        return
+    if columns[:len(current)] != current:
+        print("[Data Collection] Unexpected header in " + location + ", leaving it alone")
+        return
+
+    print("[Data Collection] Adding " + ", ".join(columns[len(current):]) + " to " + location)
+    tmp = location + ".tmp"
+    with open(location, "rb") as src, open(tmp, "wb") as dst:
+        src.readline()
+        dst.write((",".join(columns) + os.linesep).encode("utf8"))
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp, location)
 
 if __name__ == "__main__":
     fuck = dataCollection()
@@ -0,0 +1,87 @@
+import time
+import pandas as pd
+
+
+# Change-only encoding for the periodic metric rows.
+# A row is only written when its value moved more than epsilon since the last written row for the
+# same (task, metric), or when keyframeInterval seconds have passed since that last row. The
+# keyframes bound how far back a reader has to look and show the series is still alive.
+# The file schema does not change: suppressed rows are simply missing and expandMetricSeries
+# fills them back in.
+
+class metricDeltaFilter:
+    def __init__(self, epsilon=1e-6, keyframeInterval=30.0, epsilons=None):
+        self.epsilon = epsilon
+        self.keyframeInterval = keyframeInterval
+        # Per metric_type overrides, e.g. {"Throughput": 0.01}
+        self.epsilons = dict(epsilons or {})
+
+        # key -> (value written, time written)
+        self._written = {}
+        # key -> latest row seen, written or not, for the closing keyframe
+        self._latest = {}
+
+        self.rowsSeen = 0
+        self.rowsSuppressed = 0
+
+    def reset(self):
+        self._written = {}
+        self._latest = {}
+
+    # Returns True if the row should be written
+    def shouldEmit(self, taskType, metricType, value, unit=None, now=None):
+        if now is None:
+            now = time.monotonic()
+        key = (taskType, metricType)
+        self.rowsSeen += 1
+        self._latest[key] = (value, unit)
+
+        last = self._written.get(key)
+        if last is not None:
+            lastValue, lastTime = last
+            epsilon = self.epsilons.get(metricType, self.epsilon)
+            if abs(value - lastValue) <= epsilon and now - lastTime < self.keyframeInterval:
+                self.rowsSuppressed += 1
+                return False
+
+        self._written[key] = (value, now)
+        return True
+
+    # Latest (taskType, metricType, value, unit) of every series. Written once at the end of a session
+    # so the reconstructed series runs right up to the stop.
+    def closingKeyframes(self):
+        return [(key[0], key[1], value, unit) for key, (value, unit) in self._latest.items()]
+
+
+# Rebuilds the full series from a change-only metrics frame.
+# Every (session, participant, task, metric, unit) series is put on a regular grid of 'interval' between its
+# first and last row and forward filled, giving back one row per interval like the un-encoded file.
+def expandMetricSeries(df, interval="1s", metricTypes=None):
+    if df.empty:
+        return df
+    df = df.copy()
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    if metricTypes is not None:
+        df = df[df["metric_type"].isin(metricTypes)]
+
+    keys = ["session_id", "participant_id", "task_type", "metric_type", "unit"]
+    expanded = (
+        df.dropna(subset=["Timestamp"])
+        .sort_values("Timestamp")
+        .set_index("Timestamp")
+        .groupby(keys, sort=False, observed=True)["value"]
+        .resample(interval)
+        .last()
+        .groupby(level=keys, sort=False, observed=True)
+        .ffill()
+        .reset_index()
+    )
+    return expanded[["Timestamp", "session_id", "participant_id", "metric_type", "task_type", "value", "unit"]]
+
+
+def loadExpandedMetrics(metricFile, interval="1s", session_id=None):
+    df = pd.read_csv(metricFile)
+    if session_id is not None:
+        df = df[df["session_id"] == session_id]
+    return expandMetricSeries(df, interval)
@@ -0,0 +1,233 @@
+import os, sys, json, glob, argparse, time
+import numpy as np
+import pandas as pd
+
+
+# Monte Carlo of the error injection, to see what a condition really injects before anyone sits down to it.
+# Every task decides an error with causeError():
+#   errorRate + uniform(-0.05, 0.05) >= uniform(0, 1)
+# so near 0 (and 1) the jitter can't be balanced out and the rate comes out higher (lower) than set, and the
+# number of errors in a block of boxes is spread around the mean. The same draws are done here with NumPy,
+# chunk by chunk, along with what each task does with an error:
+#   sorting     the box goes to another bin (SortingTask.advBoxQueue), with 3 colours either other bin at 50/50
+#   packaging   one item more or less (PackagingTask.decideNegative)
+#   inspection  the result is flipped (inspectionTask.performInspection), sizes uniform(6, 14), accepted 8..sizeRange
+# Settings go through the same steps as a scenario loaded into the OCS: the slider range, the combo boxes, then
+# windowRender's _normalize (percentages above 1 are divided by 100, so 1% means 100%).
+#   python ErrorCalibration.py [--scenario Scenarios/Baseline_Dual_Task.json ...] [--trials 10000000] [--block 20]
+
+SCENARIOS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Scenarios")
+JITTER = 0.05
+CHUNK = 1 << 20
+
+# OCS limits a scenario's values are put through (ocs_ui SliderRow ranges and combo box options)
+ERROR_SLIDER = (5, 15)
+SIZE_SLIDER = (8, 12)
+COLOURS = (2, 3)
+PACKAGE_SIZES = (6, 5, 4)
+# What the OCS columns show before a scenario is loaded, kept when the scenario's value isn't an option
+COLUMN_DEFAULTS = {
+    "sortingTask": {"errorRate": 10, "numColours": 2},
+    "packagingTask": {"errorRate": 9, "packageNum": 6},
+    "inspectionTask": {"errorRate": 5, "sizeRange": 10},
+}
+
+SORT_COLOURS = ("red", "blue", "green")
+
+
+#--------------------------------
+# Settings
+#--------------------------------
+# windowRender._normalize: a percentage, or already a fraction if it is 1 or less
+def normalizeErrorRate(value):
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return rate / 100.0 if rate > 1.0 else rate
+
+
+def _clamp(value, limits):
+    return min(max(int(value), limits[0]), limits[1])
+
+
+# A scenario file's tasks as the task classes get them: {task: {"active", "errorRate" (fraction), "speed", ...}}
+# "distractions" is what windowRender passes on: ["light", "sound"] for sorting, [light, sound] flags otherwise
+def scenarioSettings(data, throughOCS=True):
+    settings = {}
+    for task, defaults in COLUMN_DEFAULTS.items():
+        raw = dict(defaults, **data.get(task, {}))
+        rate = _clamp(raw["errorRate"], ERROR_SLIDER) if throughOCS else raw["errorRate"]
+        entry = {"active": bool(raw.get("active", False)), "errorRate": normalizeErrorRate(rate), "speed": int(raw.get("speed", 8000))}
+        flags = list(raw.get("distraction", [False, False]))
+        if task == "sortingTask":
+            colours = int(raw["numColours"]) if not throughOCS or int(raw["numColours"]) in COLOURS else defaults["numColours"]
+            entry["numColours"] = max(2, colours)
+            entry["distractions"] = [name for name, on in zip(("light", "sound"), flags) if on]
+        elif task == "packagingTask":
+            items = int(raw["packageNum"]) if not throughOCS or int(raw["packageNum"]) in PACKAGE_SIZES else defaults["packageNum"]
+            entry["packageNum"] = max(4, items)
+            entry["distractions"] = flags
+        else:
+            size = _clamp(raw["sizeRange"], SIZE_SLIDER) if throughOCS else int(raw["sizeRange"])
+            entry["sizeRange"] = max(8, size)
+            entry["distractions"] = flags
+        settings[task] = entry
+    return settings
+
+
+#--------------------------------
+# Injection
+#--------------------------------
+# causeError() for n boxes at once
+def causeErrors(rate, n, rng):
+    return rate + rng.uniform(-JITTER, JITTER, n) >= rng.uniform(0.0, 1.0, n)
+
+
+# The exact probability causeError() returns True: the mean over the jitter of min(max(rate + j, 0), 1)
+def exactRate(rate, jitter=JITTER):
+    # Integral of min(max(s, 0), 1) from -inf to x
+    def integral(x):
+        if x <= 0:
+            return 0.0
+        if x <= 1:
+            return x * x / 2
+        return 0.5 + (x - 1)
+    return (integral(rate + jitter) - integral(rate - jitter)) / (2 * jitter)
+
+
+# Sorting: colour codes (SORT_COLOURS), the bin each went to and which were errors
+def simulateSorting(rate, numColours, n, rng):
+    colours = rng.integers(0, 3 if numColours == 3 else 2, n)
+    errors = causeErrors(rate, n, rng)
+    coin = rng.uniform(0.0, 1.0, n) >= 0.5
+    if numColours == 3:
+        # red -> blue/green, blue -> red/green, green -> blue/red, 'coin' picks the first
+        first = np.array([1, 0, 1])[colours]
+        second = np.array([2, 2, 0])[colours]
+        wrong = np.where(coin, first, second)
+    else:
+        wrong = 1 - colours
+    return colours, np.where(errors, wrong, colours), errors
+
+
+# Packaging: items put in each box and which were errors
+def simulatePackaging(rate, itemCount, n, rng):
+    errors = causeErrors(rate, n, rng)
+    offset = np.where(rng.uniform(0.0, 1.0, n) > 0.5, 1, -1)
+    return np.where(errors, itemCount + offset, itemCount), errors
+
+
+# Inspection: item sizes, the correct and the shown result, which were errors
+def simulateInspection(rate, sizeRange, n, rng):
+    sizes = rng.uniform(6.0, 14.0, n)
+    correct = (sizes >= 8.0) & (sizes <= sizeRange)
+    errors = causeErrors(rate, n, rng)
+    return sizes, correct, correct ^ errors, errors
+
+
+#--------------------------------
+# Calibration
+#--------------------------------
+# Effective rate, errors per block of 'block' boxes and what the errors were, over 'trials' boxes
+def calibrateTask(task, settings, trials=10_000_000, block=20, seed=None):
+    rng = np.random.default_rng(seed)
+    rate = settings["errorRate"]
+    chunk = max(block, CHUNK // block * block)
+    remaining = trials // block * block
+    errorCount = 0
+    perBlock = []
+    detail = {}
+
+    def add(name, count):
+        detail[name] = detail.get(name, 0) + int(count)
+
+    while remaining > 0:
+        n = min(chunk, remaining)
+        remaining -= n
+        if task == "sortingTask":
+            colours, bins, errors = simulateSorting(rate, settings["numColours"], n, rng)
+            pairs = np.bincount(colours[errors] * 3 + bins[errors], minlength=9)
+            for code in np.flatnonzero(pairs):
+                add(SORT_COLOURS[code // 3] + "_to_" + SORT_COLOURS[code % 3], pairs[code])
+        elif task == "packagingTask":
+            items, errors = simulatePackaging(rate, settings["packageNum"], n, rng)
+            add("one_more", np.count_nonzero(errors & (items > settings["packageNum"])))
+            add("one_less", np.count_nonzero(errors & (items < settings["packageNum"])))
+        else:
+            sizes, correct, shown, errors = simulateInspection(rate, settings["sizeRange"], n, rng)
+            add("false_accept", np.count_nonzero(errors & shown))
+            add("false_reject", np.count_nonzero(errors & ~shown))
+        errorCount += int(np.count_nonzero(errors))
+        perBlock.append(errors.reshape(-1, block).sum(axis=1, dtype="int32"))
+
+    boxes = trials // block * block
+    perBlock = np.concatenate(perBlock) if perBlock else np.zeros(0, dtype="int32")
+    effective = errorCount / boxes if boxes else 0.0
+    row = {
+        "task": task, "nominal_rate": rate, "exact_rate": exactRate(rate),
+        "effective_rate": effective, "std_error": np.sqrt(effective * (1 - effective) / boxes) if boxes else 0.0,
+        "trials": boxes, "block": block,
+        "block_mean": perBlock.mean() if len(perBlock) else 0.0, "block_std": perBlock.std() if len(perBlock) else 0.0,
+        # What a plain binomial with the nominal rate would give, for comparison
+        "binomial_std": np.sqrt(block * rate * (1 - rate)),
+    }
+    for q in (5, 50, 95):
+        row["block_p" + str(q)] = float(np.percentile(perBlock, q)) if len(perBlock) else 0.0
+    row["block_zero_share"] = float(np.mean(perBlock == 0)) if len(perBlock) else 0.0
+    for name, count in sorted(detail.items()):
+        row["share_" + name] = count / errorCount if errorCount else 0.0
+    # Distribution of errors per block: count -> share of blocks
+    row["block_distribution"] = np.bincount(perBlock, minlength=block + 1) / max(len(perBlock), 1)
+    return row
+
+
+# One row per active task of a scenario file
+def calibrateScenario(location, trials=10_000_000, block=20, seed=None, throughOCS=True):
+    with open(location, "r", encoding="utf8") as f:
+        settings = scenarioSettings(json.load(f), throughOCS)
+    rows = []
+    for position, (task, entry) in enumerate(settings.items()):
+        if not entry["active"]:
+            continue
+        row = calibrateTask(task, entry, trials, block, None if seed is None else seed + position)
+        row["scenario"] = os.path.basename(location)
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Effective error rates of the injection model, per scenario")
+    parser.add_argument("--scenario", action="append", help="scenario file (repeatable, default: every file in Scenarios)")
+    parser.add_argument("--trials", type=int, default=10_000_000, help="boxes simulated per task")
+    parser.add_argument("--block", type=int, default=20, help="boxes per block for the per block distribution")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--raw", action="store_true", help="use the file's values as they are, not through the OCS limits")
+    parser.add_argument("--out", help="write the table here (CSV) as well")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or sorted(glob.glob(os.path.join(SCENARIOS_DIR, "*.json")))
+    rows = []
+    start = time.perf_counter()
+    for location in scenarios:
+        rows.extend(calibrateScenario(location, args.trials, args.block, args.seed, not args.raw))
+    elapsed = time.perf_counter() - start
+    table = pd.DataFrame(rows)
+    if table.empty:
+        print("[Error Calibration] No active tasks in " + ", ".join(scenarios))
+        sys.exit(0)
+    distributions = table.pop("block_distribution")
+    table = table[["scenario"] + [c for c in table.columns if c != "scenario"]]
+    shares = [c for c in table.columns if c.startswith("share_")]
+    with pd.option_context("display.max_columns", None, "display.width", 250, "display.float_format", "{:.4f}".format):
+        print(table.drop(columns=shares).to_string(index=False))
+    print()
+    for row, distribution in zip(table.itertuples(index=False), distributions):
+        name = row.scenario + " " + row.task
+        kinds = {c[len("share_"):]: round(getattr(row, c), 4) for c in shares if pd.notna(getattr(row, c))}
+        blocks = {count: round(float(share), 4) for count, share in enumerate(distribution) if share >= 0.0005}
+        print(name + " errors: " + str(kinds))
+        print(name + " errors per block of " + str(args.block) + ": " + str(blocks))
+    print("\n" + str(int(table["trials"].sum())) + " trials in " + str(round(elapsed, 2)) + " s")
+    if args.out:
+        table.to_csv(args.out, index=False)
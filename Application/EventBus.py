@@ -0,0 +1,206 @@
+import threading, queue
+
+from Timebase import stamp
+
+
+# In-process publish/subscribe bus between the tasks and everything that consumes what they do.
+# The tasks only ever call publish(), which never blocks: every subscriber has its own bounded queue
+# and a message that does not fit is dropped for that subscriber (and counted) rather than holding up
+# a conveyor tick. Subscribers get their messages in batches, either
+#   - threaded: on their own thread as soon as messages arrive, or
+#   - pumped:   on whichever thread calls pump(), e.g. the OCS collection timer on the GUI thread,
+#               for consumers that are not thread safe.
+# New sinks subscribe here, the task code does not change.
+
+# Topics
+TASK_STARTED = "task_started"       # value: None
+TASK_STOPPED = "task_stopped"       # value: None
+BOX_PROCESSED = "box_processed"     # value: None
+ERROR_INJECTED = "error_injected"   # value: None
+CORRECTION = "correction"           # value: None
+RESPONSE_TIME = "response_time"     # value: response time in ms
+DISTRACTION = "distraction"         # value: "flash" or "beep"
+TASK_EVENT = "task_event"           # value: EventRecords.taskEvent
+
+
+class busMessage:
+    __slots__ = ("topic", "task", "value", "time")
+
+    def __init__(self, topic, task, value):
+        self.topic = topic
+        self.task = task
+        self.value = value
+        # When it was published, as a Timebase stamp (monotonic ns)
+        self.time = stamp()
+
+
+class subscriber:
+    def __init__(self, name, callback, topics, maxQueue, batchSize, threaded):
+        self.name = name
+        self.callback = callback
+        self.topics = None if topics is None else frozenset(topics)
+        self.batchSize = batchSize
+        self.threaded = threaded
+        self.queue = queue.Queue(maxsize=maxQueue)
+
+        self.delivered = 0
+        self.dropped = 0
+        self.failures = 0
+        self.maxQueueDepth = 0
+
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(target=self._run, name="bus-" + name, daemon=True)
+            self.thread.start()
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    # Called from publish(), never waits
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                print("[Event Bus] " + self.name + " is not keeping up, dropped " + str(self.dropped) + " messages so far")
+            return
+        depth = self.queue.qsize()
+        if depth > self.maxQueueDepth:
+            self.maxQueueDepth = depth
+
+    # Hands everything queued so far to the callback, batchSize messages at a time
+    def drain(self):
+        while True:
+            batch = []
+            while len(batch) < self.batchSize:
+                try:
+                    message = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None or isinstance(message, threading.Event):
+                    # Control messages only mean anything to the subscriber thread
+                    continue
+                batch.append(message)
+            if not batch:
+                return
+            self._deliver(batch)
+
+    def _deliver(self, batch):
+        try:
+            self.callback(batch)
+        except Exception as e:
+            self.failures += 1
+            print("[Event Bus] Subscriber " + self.name + " failed: " + str(e))
+        self.delivered += len(batch)
+
+    #--------------------------------
+    # Subscriber thread
+    #--------------------------------
+    def _run(self):
+        while True:
+            message = self.queue.get()
+            batch = []
+            while True:
+                # Control messages: None stops the thread, an Event is a flush marker
+                if message is None:
+                    if batch:
+                        self._deliver(batch)
+                    return
+                if isinstance(message, threading.Event):
+                    if batch:
+                        self._deliver(batch)
+                        batch = []
+                    message.set()
+                else:
+                    batch.append(message)
+
+                if len(batch) >= self.batchSize:
+                    break
+                try:
+                    message = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._deliver(batch)
+
+
+class eventBus:
+    def __init__(self):
+        self.subscribers = {}
+        self._closed = False
+
+    # callback(messages) gets a list of busMessage. topics=None subscribes to everything.
+    # maxQueue=0 never drops, for a subscriber that can't lose anything and is sure to be pumped.
+    def subscribe(self, name, callback, topics=None, maxQueue=10000, batchSize=256, threaded=True):
+        if name in self.subscribers:
+            raise ValueError("Subscriber '" + name + "' already exists")
+        sub = subscriber(name, callback, topics, maxQueue, batchSize, threaded)
+        self.subscribers[name] = sub
+        return sub
+
+    def unsubscribe(self, name, timeout=5.0):
+        sub = self.subscribers.pop(name, None)
+        if sub is not None:
+            self._stop(sub, timeout)
+
+    def publish(self, topic, task=None, value=None):
+        if self._closed:
+            return
+        message = busMessage(topic, task, value)
+        for sub in tuple(self.subscribers.values()):
+            if sub.wants(topic):
+                sub.offer(message)
+
+    # Delivers what is waiting for the pumped subscribers (or just the one named) on the calling thread
+    def pump(self, name=None):
+        for sub in tuple(self.subscribers.values()):
+            if not sub.threaded and (name is None or sub.name == name):
+                sub.drain()
+
+    # Blocks until the threaded subscribers have handled everything published before this call
+    def flush(self, timeout=5.0):
+        markers = []
+        for sub in tuple(self.subscribers.values()):
+            if sub.threaded and sub.thread.is_alive():
+                done = threading.Event()
+                try:
+                    sub.queue.put(done, timeout=timeout)
+                except queue.Full:
+                    print("[Event Bus] Could not queue flush for " + sub.name)
+                    continue
+                markers.append((sub, done))
+        for sub, done in markers:
+            if not done.wait(timeout):
+                print("[Event Bus] Flush of " + sub.name + " timed out")
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self.pump()
+        self._closed = True
+        for sub in tuple(self.subscribers.values()):
+            self._stop(sub, timeout)
+
+    def _stop(self, sub, timeout):
+        if not sub.threaded:
+            sub.drain()
+            return
+        try:
+            sub.queue.put(None, timeout=timeout)
+        except queue.Full:
+            print("[Event Bus] Could not stop " + sub.name)
+            return
+        sub.thread.join(timeout)
+
+    def stats(self):
+        return {
+            sub.name: {
+                "queueDepth": sub.queue.qsize(),
+                "maxQueueDepth": sub.maxQueueDepth,
+                "delivered": sub.delivered,
+                "dropped": sub.dropped,
+                "failures": sub.failures,
+            }
+            for sub in self.subscribers.values()
+        }
@@ -0,0 +1,150 @@
+from enum import Enum
+
+from Timebase import stamp
+import EventBus
+
+
+# Typed event records.
+# Every event carries an eventCode plus explicit fields instead of meaning packed into one string.
+# The old 'details' string is still produced when the row is written so existing analyses keep working,
+# but filtering should use the event_code column (a plain column compare) rather than parsing details.
+
+class eventCode(Enum):
+    # Sorting
+    SORT_MISSORTED = 1              # expected_bin = box colour, actual_bin = bin it went into
+    SORT_CORRECTED = 2              # expected_bin = bin it was moved to, actual_bin = bin it was in
+    SORT_NO_ERROR_IN_BIN = 3        # actual_bin = bin the user picked
+    SORT_WOULD_CREATE_ERROR = 4     # expected_bin = bin the user picked as correct, actual_bin = bin picked as wrong
+
+    # Packaging
+    PACK_MISCOUNTED = 10            # item_count = items put in, expected_count = items required
+    PACK_CORRECTED = 11             # item_count = items before the correction
+    PACK_NO_ERROR = 12              # actual_bin = "plus" / "minus"
+
+    # Inspection
+    INSPECT_MISJUDGED = 20          # size, expected_bin = correct outcome, actual_bin = outcome given
+    INSPECT_CORRECTED = 21          # actual_bin = bin the item was taken from
+    INSPECT_NO_ERROR = 22           # actual_bin = bin the user picked
+
+    # Activity: every bus message the metrics are counted from, so EventReplay.py can rebuild them later
+    SORT_TASK_STARTED = 40
+    SORT_TASK_STOPPED = 41
+    SORT_BOX_PROCESSED = 42
+    SORT_ERROR_INJECTED = 43
+    SORT_ERROR_CORRECTED = 44
+    SORT_RESPONSE = 45              # response_ms
+    PACK_TASK_STARTED = 50
+    PACK_TASK_STOPPED = 51
+    PACK_BOX_PROCESSED = 52
+    PACK_ERROR_INJECTED = 53
+    PACK_ERROR_CORRECTED = 54
+    PACK_RESPONSE = 55              # response_ms
+    INSPECT_TASK_STARTED = 60
+    INSPECT_TASK_STOPPED = 61
+    INSPECT_BOX_PROCESSED = 62
+    INSPECT_ERROR_INJECTED = 63
+    INSPECT_ERROR_CORRECTED = 64
+    INSPECT_RESPONSE = 65           # response_ms
+    # Distractions, actual_bin = "flash" / "beep"
+    SORT_DISTRACTION = 46
+    PACK_DISTRACTION = 56
+    INSPECT_DISTRACTION = 66
+
+    # Session clock, the metrics leave paused time out
+    SESSION_RUNNING = 70
+    SESSION_PAUSED = 71
+
+
+# code -> (event_type, task_type) as written in the file
+EVENT_META = {
+    eventCode.SORT_MISSORTED: ("task_error", "sorting_task"),
+    eventCode.SORT_CORRECTED: ("user_input", "sorting_task"),
+    eventCode.SORT_NO_ERROR_IN_BIN: ("user_input", "sorting_task"),
+    eventCode.SORT_WOULD_CREATE_ERROR: ("user_input", "sorting_task"),
+    eventCode.PACK_MISCOUNTED: ("task_error", "packaging_task"),
+    eventCode.PACK_CORRECTED: ("user_input", "packaging_task"),
+    eventCode.PACK_NO_ERROR: ("user_input", "packaging_task"),
+    eventCode.INSPECT_MISJUDGED: ("task_error", "inspection_task"),
+    eventCode.INSPECT_CORRECTED: ("user_input", "inspection_task"),
+    eventCode.INSPECT_NO_ERROR: ("user_input", "inspection_task"),
+    eventCode.SESSION_RUNNING: ("session", "session"),
+    eventCode.SESSION_PAUSED: ("session", "session"),
+}
+
+# (task, EventBus topic) -> activity code
+ACTIVITY_CODES = {}
+for _prefix, _task in (("SORT", "sorting"), ("PACK", "packaging"), ("INSPECT", "inspection")):
+    for _suffix, _topic in (("TASK_STARTED", EventBus.TASK_STARTED), ("TASK_STOPPED", EventBus.TASK_STOPPED),
+                            ("BOX_PROCESSED", EventBus.BOX_PROCESSED), ("ERROR_INJECTED", EventBus.ERROR_INJECTED),
+                            ("ERROR_CORRECTED", EventBus.CORRECTION), ("RESPONSE", EventBus.RESPONSE_TIME),
+                            ("DISTRACTION", EventBus.DISTRACTION)):
+        ACTIVITY_CODES[(_task, _topic)] = eventCode[_prefix + "_" + _suffix]
+        EVENT_META[eventCode[_prefix + "_" + _suffix]] = ("activity", _task + "_task")
+
+# Columns added to events.csv after 'details'
+RECORD_COLUMNS = ["event_code", "expected_bin", "actual_bin", "item_count", "expected_count", "size", "response_ms"]
+
+
+class taskEvent:
+    __slots__ = ("timestamp", "sessionID", "participantID", "code",
+                 "expectedBin", "actualBin", "itemCount", "expectedCount", "size", "responseMs")
+
+    def __init__(self, code, expectedBin=None, actualBin=None, itemCount=None, expectedCount=None, size=None, responseMs=None):
+        # Timebase stamp, turned into wall time when the row is written
+        self.timestamp = stamp()
+        self.sessionID = None
+        self.participantID = None
+        self.code = code
+        self.expectedBin = expectedBin
+        self.actualBin = actualBin
+        self.itemCount = itemCount
+        self.expectedCount = expectedCount
+        self.size = size
+        self.responseMs = responseMs
+
+    @property
+    def eventType(self):
+        return EVENT_META[self.code][0]
+
+    @property
+    def taskType(self):
+        return EVENT_META[self.code][1]
+
+    # The free text the events file has always had, built only when the row is written
+    def details(self):
+        match self.code:
+            case eventCode.SORT_MISSORTED:
+                return self.expectedBin + "_box_sorted_into_" + self.actualBin + "_bin"
+            case eventCode.SORT_CORRECTED:
+                return "user_successfully_corrected_" + self.expectedBin + "_item_in_" + self.actualBin + "bin"
+            case eventCode.SORT_NO_ERROR_IN_BIN:
+                return "user_attepted_correction_when_no_error_exists_in_" + self.actualBin + "_bin"
+            case eventCode.SORT_WOULD_CREATE_ERROR:
+                return "user_attempted_to_create_a_sorting_error_in_" + self.expectedBin + "bin"
+            case eventCode.PACK_MISCOUNTED:
+                if self.itemCount > self.expectedCount:
+                    return "box_filled_with_more_items_than_required"
+                return "box_filled_with_less_items_then_required"
+            case eventCode.PACK_CORRECTED:
+                if self.itemCount < self.expectedCount:
+                    return "box_corrected_by_adding_item"
+                return "box_corrected_by_removing_item"
+            case eventCode.PACK_NO_ERROR:
+                return "attempted_to_correct_a_nonexistent_error"
+            case eventCode.INSPECT_MISJUDGED:
+                if self.actualBin == "accepted":
+                    return "inspection_passed_invalid_item"
+                return "inspection_failed_valid_item"
+            case eventCode.INSPECT_CORRECTED:
+                return "corrected_box_from_" + self.actualBin + "_bin"
+            case eventCode.INSPECT_NO_ERROR:
+                return "attempted_to_correct_non_existent_error"
+            case eventCode.SORT_DISTRACTION | eventCode.PACK_DISTRACTION | eventCode.INSPECT_DISTRACTION:
+                return "distraction_" + self.actualBin
+        return ""
+
+    # Tuple in events.csv column order
+    def asRow(self):
+        eventType, taskType = EVENT_META[self.code]
+        return (self.timestamp, self.sessionID, self.participantID, eventType, taskType, self.details(),
+                self.code.name, self.expectedBin, self.actualBin, self.itemCount, self.expectedCount, self.size, self.responseMs)
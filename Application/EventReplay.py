@@ -0,0 +1,279 @@
+import os, sys, argparse, bisect, math
+import numpy as np
+import pandas as pd
+
+from analyze import readChunks, EVENT_DTYPES
+from StreamingStats import p2Quantile
+
+
+# Metrics recomputed from the event log.
+# With the activity log on (DataCollection.ACTIVITY_LOG_ENABLED) events.csv has a row for every box processed,
+# error injected, correction and response time, plus when the session clock ran and paused. From those the
+# metrics can be rebuilt for any sampling interval, window or definition, without rerunning anyone:
+#   python EventReplay.py --window 30 --window 120 --interval 0.5 --out replayed.csv
+# Everything works on NumPy arrays of (active) times, one searchsorted per metric and window.
+# The output has the metrics.csv columns, so replayed and recorded rows can be compared directly.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+REPLAY_EVENT_TYPES = ("activity", "session")
+
+TASK_TYPES = {"SORT": "Sorting Task", "PACK": "Packaging Task", "INSPECT": "Inspection Task"}
+QUANTILES = (0.5, 0.9, 0.99)
+METRIC_COLUMNS = ["Timestamp", "session_id", "participant_id", "metric_type", "task_type", "value", "unit"]
+
+
+def _ratio(numerator, denominator, empty=0.0):
+    numerator = np.asarray(numerator, dtype="float64")
+    denominator = np.asarray(denominator, dtype="float64")
+    out = np.full(numerator.shape, empty)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+# MetricsEngine.legacyAccuracy over arrays
+def legacyAccuracy(outstanding, corrected):
+    accuracy = _ratio(corrected, outstanding) * 100
+    return np.where(outstanding == 0, 100.0, accuracy)
+
+
+# Metric definitions: name -> (unit, function of the counts at every sample).
+# The counts are arrays: processed, injected, corrected, span (active seconds they were counted over).
+CUMULATIVE_DEFINITIONS = {
+    "Throughput": ("box / s", lambda c: _ratio(c["processed"], c["span"])),
+    "Actual Error Rate": ("%", lambda c: _ratio(c["injected"], c["processed"]) * 100),
+    "User Accuracy": ("%", lambda c: legacyAccuracy(c["injected"] - c["corrected"], c["corrected"])),
+    "Corrections": ("box", lambda c: c["corrected"].astype("float64")),
+}
+# Written once per window with " (<window>s)" after the name
+WINDOW_DEFINITIONS = {
+    "Throughput": ("box / s", lambda c: _ratio(c["processed"], c["span"])),
+    "Actual Error Rate": ("%", lambda c: _ratio(c["injected"], c["processed"]) * 100),
+    "User Accuracy": ("%", lambda c: np.minimum(100.0, _ratio(c["corrected"], c["injected"], empty=1.0) * 100)),
+}
+
+
+#--------------------------------
+# Loading
+#--------------------------------
+# The activity and session rows of events.csv, Timestamp parsed
+def loadActivity(eventFile=None, sessions=None, participants=None, chunksize=500000):
+    eventFile = eventFile or os.path.join(RESULTS_DIR, "events.csv")
+    columns = ["Timestamp", "session_id", "participant_id", "event_type", "event_code", "response_ms"]
+    chunks = []
+    for chunk in readChunks(eventFile, EVENT_DTYPES, chunksize, sessions, participants, usecols=columns):
+        chunk = chunk[chunk["event_type"].isin(REPLAY_EVENT_TYPES)]
+        if len(chunk):
+            chunks.append(chunk.astype({"session_id": str, "participant_id": str, "event_code": str}))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+#--------------------------------
+# Session clock
+#--------------------------------
+# Running intervals (start, end) in ns from the SESSION_RUNNING/PAUSED rows. A run that never got its pause
+# (the app crashed) ends at the last row before the next run, the last run at the last row of the session.
+def runIntervals(t, codes):
+    clock = np.flatnonzero((codes == "SESSION_RUNNING") | (codes == "SESSION_PAUSED"))
+    starts, ends = [], []
+    running = None
+    for row in clock.tolist():
+        if codes[row] == "SESSION_RUNNING":
+            if running is not None:
+                starts.append(running)
+                ends.append(t[row - 1])
+            running = t[row]
+        elif running is not None:
+            starts.append(running)
+            ends.append(t[row])
+            running = None
+    if running is not None:
+        starts.append(running)
+        ends.append(t[-1])
+    return np.array(starts, dtype="int64"), np.array(ends, dtype="int64")
+
+
+# Wall time (ns) -> active seconds, paused time left out. Anything before a run is put at the end of the previous one.
+def activeSeconds(t, starts, ends):
+    if len(starts) == 0:
+        return np.zeros(len(t))
+    lengths = ends - starts
+    before = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    run = np.searchsorted(starts, t, side="right") - 1
+    inside = np.clip(t - starts[np.maximum(run, 0)], 0, lengths[np.maximum(run, 0)])
+    return np.where(run < 0, 0, before[np.maximum(run, 0)] + inside) / 1e9
+
+
+# Active seconds -> wall time (ns), for putting samples back on the clock
+def wallTime(active, starts, ends):
+    lengths = ends - starts
+    total = np.cumsum(lengths)
+    run = np.minimum(np.searchsorted(total, active * 1e9, side="left"), len(starts) - 1)
+    before = total[run] - lengths[run]
+    return (starts[run] + (active * 1e9 - before)).astype("int64")
+
+
+#--------------------------------
+# Replay
+#--------------------------------
+def _countUpTo(times, at):
+    return np.searchsorted(times, at, side="right")
+
+
+# Counts from the task's latest TASK_STARTED row ('since', -1 if none yet), the engine starts the task from zero there.
+# 'rows' are the events' row numbers and 'times' their active times, both in log order.
+# With a cutoff only the events in [cutoff, at], the engine counts the ones at the cutoff too.
+def _countSinceStart(rows, times, since, at, cutoff=None):
+    first = np.searchsorted(rows, since, side="right")
+    if cutoff is not None:
+        first = np.maximum(first, np.searchsorted(times, cutoff, side="left"))
+    return np.maximum(_countUpTo(times, at) - first, 0)
+
+
+# Quantiles of the first n values for every n (index 0 is 0), numpy's default linear interpolation.
+# One pass keeping the values seen so far sorted, instead of a sort per n.
+# Only for exactQuantiles, the app writes the P-squared estimate (streamingQuantiles).
+def expandingQuantiles(values, quantiles):
+    ordered = []
+    out = {q: [0.0] for q in quantiles}
+    for value in values.tolist():
+        bisect.insort(ordered, value)
+        last = len(ordered) - 1
+        for q in quantiles:
+            h = last * q
+            lo = math.floor(h)
+            hi = min(lo + 1, last)
+            out[q].append(ordered[lo] + (h - lo) * (ordered[hi] - ordered[lo]))
+    return {q: np.array(series) for q, series in out.items()}
+
+
+# The P-squared estimate after each of the first n values (index 0 is 0), fed in the same order as
+# DataCollection.updateResponseTime feeds its streamingStats, so it gives the values the app wrote.
+def streamingQuantiles(values, quantiles):
+    estimators = {q: p2Quantile(q) for q in quantiles}
+    out = {q: [0.0] for q in quantiles}
+    for value in values.tolist():
+        for q, estimator in estimators.items():
+            estimator.add(value)
+            out[q].append(estimator.value())
+    return {q: np.array(series) for q, series in out.items()}
+
+
+# Metric rows for one session. 'at' are the sample times (datetimes) to evaluate at, otherwise one every
+# 'interval' active seconds. windows/definitions default to the ones the app writes.
+# A task that was started again counts from its latest TASK_STARTED, like MetricsEngine.resetTask. Response times
+# span the whole session like the app's, their quantiles are the app's P-squared estimate unless exactQuantiles.
+def replaySession(events, interval=1.0, windows=(10, 60), at=None, definitions=None, windowDefinitions=None, quantiles=QUANTILES, exactQuantiles=False):
+    definitions = CUMULATIVE_DEFINITIONS if definitions is None else definitions
+    windowDefinitions = WINDOW_DEFINITIONS if windowDefinitions is None else windowDefinitions
+
+    events = events.sort_values("Timestamp", kind="stable")
+    t = events["Timestamp"].to_numpy(dtype="datetime64[ns]").astype("int64")
+    codes = events["event_code"].to_numpy()
+    starts, ends = runIntervals(t, codes)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    active = activeSeconds(t, starts, ends)
+
+    if at is None:
+        total = (ends - starts).sum() / 1e9
+        samples = np.arange(interval, total + interval / 2, interval)
+        sampleTimes = wallTime(samples, starts, ends)
+    else:
+        sampleTimes = pd.to_datetime(pd.Series(at)).to_numpy(dtype="datetime64[ns]").astype("int64")
+        samples = activeSeconds(sampleTimes, starts, ends)
+
+    sessionID = events["session_id"].iloc[0]
+    participantID = events["participant_id"].iloc[-1]
+    # One (metric, task, unit) label and one array of values per series, put into a frame in one go at the end
+    labels = []
+    values = []
+
+    def emit(metricType, taskType, series, unit):
+        labels.append((metricType, taskType, unit))
+        values.append(series)
+
+    for prefix, taskType in TASK_TYPES.items():
+        startRows = np.flatnonzero(codes == prefix + "_TASK_STARTED")
+        if not len(startRows):
+            continue
+        # Row of the latest start at every sample
+        latest = np.searchsorted(t[startRows], sampleTimes, side="right") - 1
+        since = np.where(latest < 0, -1, startRows[np.maximum(latest, 0)])
+        rows = {name: np.flatnonzero(codes == prefix + suffix)
+                for name, suffix in (("processed", "_BOX_PROCESSED"), ("injected", "_ERROR_INJECTED"), ("corrected", "_ERROR_CORRECTED"))}
+
+        counts = {name: _countSinceStart(r, active[r], since, samples) for name, r in rows.items()}
+        counts["span"] = samples
+        for name, (unit, definition) in definitions.items():
+            emit(name, taskType, definition(counts), unit)
+
+        for window in windows:
+            cutoff = samples - window
+            counts = {name: _countSinceStart(r, active[r], since, samples, cutoff) for name, r in rows.items()}
+            counts["span"] = np.minimum(window, samples)
+            for name, (unit, definition) in windowDefinitions.items():
+                emit(name + " (" + str(window) + "s)", taskType, definition(counts), unit)
+
+        # Response times (ms in the log, s in the metrics), mean and quantiles of everything up to the sample.
+        # With exactQuantiles the P50 of a recorded session can be off from the written one by up to about a second
+        # early on, the estimate needs a few hundred responses to settle.
+        isResponse = codes == prefix + "_RESPONSE"
+        responses = events["response_ms"].to_numpy(dtype="float64")[isResponse]
+        if len(responses):
+            seen = _countUpTo(active[isResponse], samples)
+            cumulative = np.concatenate(([0.0], np.cumsum(responses)))
+            emit("Average Response Time", taskType, _ratio(cumulative[seen], seen) / 1000, "s")
+            byCount = (expandingQuantiles if exactQuantiles else streamingQuantiles)(responses, quantiles)
+            for q in quantiles:
+                emit("Response Time P" + str(round(q * 100)), taskType, byCount[q][seen] / 1000, "s")
+
+    if not labels:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    series = np.repeat(np.arange(len(labels)), len(sampleTimes))
+    columns = {}
+    for position, column in enumerate(("metric_type", "task_type", "unit")):
+        names = [label[position] for label in labels]
+        categories = list(dict.fromkeys(names))
+        codes = np.array([categories.index(name) for name in names])
+        columns[column] = pd.Categorical.from_codes(codes[series], categories)
+    return pd.DataFrame({
+        "Timestamp": np.tile(sampleTimes, len(labels)).astype("datetime64[ns]"),
+        "session_id": sessionID,
+        "participant_id": participantID,
+        "metric_type": columns["metric_type"],
+        "task_type": columns["task_type"],
+        "value": np.concatenate(values),
+        "unit": columns["unit"],
+    }, columns=METRIC_COLUMNS)
+
+
+# Every session in the event log
+def replayStudy(eventFile=None, sessions=None, participants=None, **options):
+    activity = loadActivity(eventFile, sessions, participants)
+    frames = [replaySession(events, **options) for _, events in activity.groupby("session_id", sort=True)]
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the metrics from the activity rows in events.csv")
+    parser.add_argument("--events", default=os.path.join(RESULTS_DIR, "events.csv"))
+    parser.add_argument("--session", action="append", help="only these sessions (repeatable)")
+    parser.add_argument("--participant", action="append", help="only these participants (repeatable)")
+    parser.add_argument("--interval", type=float, default=1.0, help="active seconds between samples")
+    parser.add_argument("--window", type=float, action="append", help="sliding window in seconds (repeatable, default 10 and 60)")
+    parser.add_argument("--exact-quantiles", action="store_true", help="exact response time quantiles instead of the app's streaming estimate")
+    parser.add_argument("--out", help="write the rows here (CSV) instead of printing them")
+    args = parser.parse_args()
+
+    windows = tuple(int(w) if w.is_integer() else w for w in args.window) if args.window else (10, 60)
+    replayed = replayStudy(args.events, args.session, args.participant, interval=args.interval, windows=windows, exactQuantiles=args.exact_quantiles)
+    if args.out:
+        replayed.to_csv(args.out, index=False)
+        print("Wrote " + str(len(replayed)) + " rows for " + str(replayed["session_id"].nunique()) + " sessions to " + args.out)
+    else:
+        print(replayed.to_string(index=False))
@@ -0,0 +1,250 @@
+import os, sys, json, glob, argparse, itertools, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from ErrorCalibration import SCENARIOS_DIR, scenarioSettings
+from DataCollection import TASKS, METRIC_COLUMNS, EVENT_COLUMNS
+from SessionSummary import SUMMARY_COLUMNS
+from ClockSync import CLOCKSYNC_COLUMNS
+import Shards
+
+
+# Experiment matrix: every combination of a set of conditions, each run headless (SimulationCore.runSession) for a
+# fixed simulated time, spread over worker processes.
+#   python ExperimentRunner.py --grid grid.json [--jobs 8] [--results Results/experiments/grid]
+#   python ExperimentRunner.py --scenario Baseline_Dual_Task.json --speed 8000 4000 1000 --operator perfect average
+# A grid file has a list of values per factor (a single value counts as a list of one), a factor left out keeps
+# the scenario's value:
+#   {"scenarios": ["Baseline_Dual_Task.json"], "speed": [8000, 4000, 1000], "errorRate": [5, 10, 15],
+#    "numColours": [2, 3], "packageNum": [4, 5, 6], "sizeRange": [8, 10, 12],
+#    "distraction": ["None", "Sound + Light"], "operator": ["perfect", "average", "none"],
+#    "replicates": 3, "duration": 600, "seed": 1}
+# or a list of conditions instead of the product: {"runs": [{"scenario": "...", "speed": 1000, ...}, ...]}
+# speed, errorRate and distraction are set on every task of the scenario, the others on their own task. Values go
+# through the OCS limits like a scenario loaded into the OCS, --raw uses them as they are. operator is a
+# SyntheticOperator profile, "none" leaves the corrections undone.
+#
+# Every run gets its own seed (seed + run number - 1) and writes its session to its own shard (Shards.py) in the
+# experiment's results folder, so the workers never write to the same file. When all runs are done the shards are
+# merged into that folder's metrics.csv / events.csv / summary.csv, next to
+#   runs.csv        one row per run and task: condition, seed, session, the session summary and the operator's counts
+#   conditions.csv  session_id -> condition, for 'python CohortReport.py --results <folder> --conditions <folder>/conditions.csv'
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+EXPERIMENTS_DIR = "experiments"
+DEFAULT_DURATION = 600.0
+
+TASK_KEYS = ("sortingTask", "packagingTask", "inspectionTask")
+# Grid factor -> the scenario tasks it is set on
+FACTORS = {
+    "speed": TASK_KEYS,
+    "errorRate": TASK_KEYS,
+    "distraction": TASK_KEYS,
+    "numColours": ("sortingTask",),
+    "packageNum": ("packagingTask",),
+    "sizeRange": ("inspectionTask",),
+}
+# ocs_ui DISTRACTION_OPTIONS, [light, sound] (ocs_ui itself needs Qt)
+DISTRACTIONS = {
+    "None": [False, False],
+    "Sound": [False, True],
+    "Light": [True, False],
+    "Sound + Light": [True, True],
+}
+TASK_NAMES = {taskType: key for key, taskType, _ in TASKS}
+SUMMARY_FIELDS = [c for c in SUMMARY_COLUMNS if c not in ("Timestamp", "session_id", "participant_id")]
+RUN_COLUMNS = ["run", "condition", "scenario", "replicate", "seed"] + list(FACTORS) + ["operator", "session_id", "participant_id", "wall_s"]
+
+
+#--------------------------------
+# Conditions
+#--------------------------------
+def scenarioPath(name):
+    return os.path.abspath(name if os.path.exists(name) else os.path.join(SCENARIOS_DIR, name))
+
+
+def _values(value):
+    return value if isinstance(value, list) else [value]
+
+
+# Grid -> list of conditions, {"scenario": path, factor: value, ..., "operator": profile or None}
+def expandConditions(grid):
+    if "runs" in grid:
+        conditions = [dict(run) for run in grid["runs"]]
+    else:
+        values = {"scenario": _values(grid.get("scenarios") or sorted(glob.glob(os.path.join(SCENARIOS_DIR, "*.json"))))}
+        for factor in list(FACTORS) + ["operator"]:
+            if factor in grid:
+                values[factor] = _values(grid[factor])
+        names = list(values)
+        conditions = [dict(zip(names, combination)) for combination in itertools.product(*(values[n] for n in names))]
+
+    for condition in conditions:
+        condition["scenario"] = scenarioPath(condition["scenario"])
+        if condition.get("operator") in (None, "none"):
+            condition["operator"] = None
+    return conditions
+
+
+def conditionLabel(condition):
+    parts = [os.path.splitext(os.path.basename(condition["scenario"]))[0]]
+    for factor in FACTORS:
+        if factor in condition:
+            parts.append(factor + "=" + str(condition[factor]))
+    if "operator" in condition:
+        operator = condition["operator"]
+        parts.append("operator=" + ("none" if operator is None else operator if isinstance(operator, str) else "custom"))
+    return " ".join(parts)
+
+
+# A scenario file's data with the condition's values put in, before scenarioSettings
+def applyCondition(data, condition):
+    data = json.loads(json.dumps(data))
+    for factor, tasks in FACTORS.items():
+        if factor not in condition:
+            continue
+        value = condition[factor]
+        if factor == "distraction":
+            value = DISTRACTIONS[value] if isinstance(value, str) else list(value)
+        for task in tasks:
+            data.setdefault(task, {})[factor] = value
+    return data
+
+
+def planRuns(grid, resultsDir, replicates=1, seed=0, duration=DEFAULT_DURATION, raw=False):
+    plan = []
+    for condition in expandConditions(grid):
+        for replicate in range(replicates):
+            plan.append({
+                "run": len(plan) + 1,
+                "condition": condition,
+                "label": conditionLabel(condition),
+                "replicate": replicate + 1,
+                "seed": seed + len(plan),
+                "duration": duration,
+                "raw": raw,
+                "resultsDir": resultsDir,
+            })
+    return plan
+
+
+#--------------------------------
+# Runs
+#--------------------------------
+# One run, in a worker process. Returns its rows for runs.csv.
+def runCondition(job):
+    from SimulationCore import runSession
+
+    condition = job["condition"]
+    with open(condition["scenario"], "r", encoding="utf8") as f:
+        settings = scenarioSettings(applyCondition(json.load(f), condition), not job["raw"])
+
+    started = time.perf_counter()
+    result = runSession(settings, job["duration"], job["resultsDir"], job["seed"], operator=condition.get("operator"), collectionOptions={"sharded": True})
+    wall = time.perf_counter() - started
+    if result is None:
+        return []
+
+    operator = condition.get("operator")
+    base = {
+        "run": job["run"],
+        "condition": job["label"],
+        "scenario": os.path.basename(condition["scenario"]),
+        "replicate": job["replicate"],
+        "seed": job["seed"],
+        "operator": "none" if operator is None else operator if isinstance(operator, str) else "custom",
+        "session_id": result["session_id"],
+        "participant_id": result["participant_id"],
+        "wall_s": round(wall, 3),
+    }
+    for factor in FACTORS:
+        base[factor] = condition.get(factor)
+
+    rows = []
+    for summary in result["summary"]:
+        row = dict(base)
+        row.update({field: summary.get(field) for field in SUMMARY_FIELDS})
+        row.update(result["operators"].get(TASK_NAMES.get(summary["task_type"]), {}))
+        rows.append(row)
+    return rows
+
+
+def _appendTable(path, df):
+    if os.path.exists(path):
+        df = pd.concat([pd.read_csv(path), df], ignore_index=True)
+    df.to_csv(path, index=False)
+
+
+def runExperiment(grid, resultsDir, jobs=None, replicates=None, seed=None, duration=None, raw=False):
+    replicates = replicates or int(grid.get("replicates", 1))
+    seed = seed if seed is not None else int(grid.get("seed", 0))
+    duration = duration or float(grid.get("duration", DEFAULT_DURATION))
+    resultsDir = os.path.abspath(resultsDir)
+    os.makedirs(resultsDir, exist_ok=True)
+
+    plan = planRuns(grid, resultsDir, replicates, seed, duration, raw)
+    print("[Experiment Runner] " + str(len(plan)) + " runs of " + str(duration) + " s to " + resultsDir)
+
+    rows = []
+    done = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(runCondition, job): job for job in plan}
+        for future in as_completed(futures):
+            job = futures[future]
+            done += 1
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print("[Experiment Runner] Run " + str(job["run"]) + " (" + job["label"] + ") failed: " + str(e))
+                continue
+            print("  " + str(done) + "/" + str(len(plan)) + "  run " + str(job["run"]) + ": " + job["label"])
+
+    merged = Shards.mergeShards(resultsDir, {"metrics.csv": METRIC_COLUMNS, "events.csv": EVENT_COLUMNS, "summary.csv": SUMMARY_COLUMNS, "clocksync.csv": CLOCKSYNC_COLUMNS})
+    print("[Experiment Runner] Merged " + str(len(merged["shards"])) + " shards: " + str(merged["metrics.csv"]) + " metric rows, " + str(merged["events.csv"]) + " event rows")
+
+    if not rows:
+        return pd.DataFrame(columns=RUN_COLUMNS)
+    runs = pd.DataFrame(rows)
+    runs = runs[RUN_COLUMNS + [c for c in runs.columns if c not in RUN_COLUMNS]].sort_values(["run", "task_type"], ignore_index=True)
+    _appendTable(os.path.join(resultsDir, "runs.csv"), runs)
+    _appendTable(os.path.join(resultsDir, "conditions.csv"), runs[["session_id", "condition"]].drop_duplicates())
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every combination of a set of conditions headless, in parallel")
+    parser.add_argument("--grid", help="JSON file with the factors (see the top of ExperimentRunner.py)")
+    parser.add_argument("--scenario", nargs="+", help="scenario files (default: the grid's, or all in Scenarios)")
+    parser.add_argument("--speed", type=int, nargs="+", help="ms per box, ocs_ui SPEED_OPTIONS: 8000 4000 1000")
+    parser.add_argument("--error-rate", type=int, nargs="+", help="error rates in %%")
+    parser.add_argument("--colours", type=int, nargs="+", help="sorting numColours")
+    parser.add_argument("--package-num", type=int, nargs="+", help="packaging items per box")
+    parser.add_argument("--size-range", type=int, nargs="+", help="inspection sizeRange")
+    parser.add_argument("--distraction", nargs="+", choices=list(DISTRACTIONS))
+    parser.add_argument("--operator", nargs="+", help="SyntheticOperator profiles, 'none' for no corrections")
+    parser.add_argument("--replicates", type=int, help="runs per condition")
+    parser.add_argument("--duration", type=float, help="simulated seconds per run (default: 600)")
+    parser.add_argument("--seed", type=int, help="seed of the first run")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--results", help="results folder (default: Results/experiments/<grid name or time>)")
+    parser.add_argument("--raw", action="store_true", help="use the values as they are, not through the OCS limits")
+    args = parser.parse_args()
+
+    grid = {}
+    if args.grid:
+        with open(args.grid, "r", encoding="utf8") as f:
+            grid = json.load(f)
+    for key, value in (("scenarios", args.scenario), ("speed", args.speed), ("errorRate", args.error_rate),
+                       ("numColours", args.colours), ("packageNum", args.package_num), ("sizeRange", args.size_range),
+                       ("distraction", args.distraction), ("operator", args.operator)):
+        if value is not None:
+            grid.pop("runs", None)
+            grid[key] = value
+
+    name = os.path.splitext(os.path.basename(args.grid))[0] if args.grid else time.strftime("%Y%m%d_%H%M%S")
+    resultsDir = args.results or os.path.join(RESULTS_DIR, EXPERIMENTS_DIR, name)
+    runs = runExperiment(grid, resultsDir, args.jobs, args.replicates, args.seed, args.duration, args.raw)
+    if len(runs):
+        table = runs.groupby(["condition", "task_type"])[["boxes_processed", "throughput", "error_rate", "accuracy", "corrections"]].mean()
+        print(table.round(3).to_string())
@@ -0,0 +1,145 @@
+import os, csv, json, time, socket
+
+
+# Keeps the last handed out session/participant IDs in a small sidecar file (Results/ids.json)
+# so starting or stopping a session never has to read the whole events file.
+# If the ledger is missing, unreadable or behind the events file (e.g. restored from an older
+# copy) it is rebuilt from the last row of events.csv, found by seeking back from the end.
+# Reads and updates happen under a lock file, so two instances sharing the Results folder never get the same ID.
+
+class idLedger:
+    def __init__(self, ledgerFile, eventFile, latestSession=None):
+        self.ledgerFile = ledgerFile
+        self.eventFile = eventFile
+        self.lockFile = ledgerFile + ".lock"
+        # Optional callable giving the newest session written somewhere other than eventFile (e.g. shards)
+        self.latestSession = latestSession
+
+    # Reserves the next session ID. Returns (sessionID, participantID)
+    def allocateSession(self):
+        with fileLock(self.lockFile):
+            state = self.load()
+
+            lastSession = state.get("lastSessionID")
+            if lastSession is None:
+                sessionID = "S001"
+            else:
+                sessionID = "S" + str(idNumber(lastSession) + 1).zfill(3)
+            participantID = state.get("lastParticipantID") or "P001"
+
+            self.save(sessionID, participantID)
+        return sessionID, participantID
+
+    def setParticipant(self, participantID):
+        with fileLock(self.lockFile):
+            state = self.load()
+            self.save(state.get("lastSessionID"), participantID)
+
+    def load(self):
+        state = {}
+        try:
+            with open(self.ledgerFile, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            print("[ID Ledger] No usable ledger, recovering from the end of the event log")
+
+        # The event log always wins if it has seen a later session than the ledger
+        tail = readLastRow(self.eventFile)
+        if tail is not None:
+            session, participant = tail.get("session_id"), tail.get("participant_id")
+            if session and idNumber(session) > idNumber(state.get("lastSessionID")):
+                state = {"lastSessionID": session, "lastParticipantID": participant}
+
+        if self.latestSession is not None:
+            session = self.latestSession()
+            if session and idNumber(session) > idNumber(state.get("lastSessionID")):
+                state = {"lastSessionID": session, "lastParticipantID": state.get("lastParticipantID")}
+
+        return state
+
+    def save(self, sessionID, participantID):
+        tmp = self.ledgerFile + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"lastSessionID": sessionID, "lastParticipantID": participantID}, f)
+        os.replace(tmp, self.ledgerFile)
+
+
+# Cross process lock: whoever manages to create the lock file holds it. Works on local and network drives.
+# A lock file older than staleAfter seconds is assumed to be left over from a crashed process and removed.
+class fileLock:
+    def __init__(self, path, timeout=10.0, staleAfter=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.staleAfter = staleAfter
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.staleAfter:
+                        print("[ID Ledger] Removing stale lock " + self.path)
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    # Released between the open and the check, just try again
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Could not lock " + self.path)
+                time.sleep(0.02)
+                continue
+
+            with os.fdopen(fd, "w") as f:
+                f.write(socket.gethostname() + " " + str(os.getpid()))
+            return self
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
+
+
+# "S012" -> 12, anything unparsable -> 0
+def idNumber(ID):
+    if not ID:
+        return 0
+    digits = "".join(c for c in str(ID) if c.isdigit())
+    return int(digits) if digits else 0
+
+
+# Returns the last data row of a CSV as a dict keyed by the header, or None if there are no rows.
+# Only the first line and the last few KB of the file are read.
+def readLastRow(location, blockSize=4096):
+    if not os.path.exists(location):
+        return None
+
+    with open(location, "rb") as f:
+        header = f.readline()
+        headerEnd = f.tell()
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end <= headerEnd:
+            return None
+
+        # Read backwards until we hold at least one full line after the header
+        data = b""
+        position = end
+        while position > headerEnd:
+            step = min(blockSize, position - headerEnd)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            if data.rstrip(b"\r\n").count(b"\n") >= 1:
+                break
+
+    lines = [line for line in data.splitlines() if line.strip()]
+    if not lines:
+        return None
+
+    columns = next(csv.reader([header.decode("utf-8-sig").strip()]))
+    values = next(csv.reader([lines[-1].decode("utf-8", errors="replace")]))
+    return dict(zip(columns, values))
@@ -0,0 +1,201 @@
+import bisect
+from collections import deque
+
+from Timebase import stamp
+
+
+# Session clock on the monotonic high resolution counter that leaves paused time out.
+# elapsed() is "seconds the tasks have actually been running", which is what throughput is per.
+# Times are Timebase stamps in seconds, so a simulation's virtual clock drives it as well.
+class sessionClock:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._accumulated = 0.0
+        self._runningSince = None
+
+    # Carries on from a checkpoint, paused, with 'elapsed' seconds already run
+    def restore(self, elapsed):
+        self._accumulated = elapsed
+        self._runningSince = None
+
+    def start(self):
+        if self._runningSince is None:
+            self._runningSince = _now()
+
+    def pause(self):
+        if self._runningSince is not None:
+            self._accumulated += _now() - self._runningSince
+            self._runningSince = None
+
+    @property
+    def running(self):
+        return self._runningSince is not None
+
+    def elapsed(self):
+        if self._runningSince is None:
+            return self._accumulated
+        return self._accumulated + _now() - self._runningSince
+
+    # Active time at stamp time t (s), for events that are counted after they happened.
+    # Anything from before the current run is put at the end of the previous run.
+    def elapsedAt(self, t):
+        if self._runningSince is not None and t >= self._runningSince:
+            return self._accumulated + t - self._runningSince
+        return self._accumulated
+
+
+def _now():
+    return stamp() / 1e9
+
+
+# Counts for one task. Every event also keeps its (active) time so sliding windows can be counted,
+# anything older than the longest window is dropped.
+class taskCounters:
+    def __init__(self, horizon):
+        self.horizon = horizon
+        self.processed = 0
+        self.injected = 0
+        self.corrected = 0
+        self.processedTimes = deque()
+        self.injectedTimes = deque()
+        self.correctedTimes = deque()
+
+    def prune(self, now):
+        cutoff = now - self.horizon
+        for times in (self.processedTimes, self.injectedTimes, self.correctedTimes):
+            while times and times[0] < cutoff:
+                times.popleft()
+
+
+# Incremental metrics for all tasks. The tasks report what happened as it happens (box processed,
+# error injected, error corrected) and snapshot() turns the counts into rates without looking at the tasks.
+class metricsEngine:
+    def __init__(self, windows=(10, 60)):
+        self.windows = tuple(sorted(windows))
+        self.clock = sessionClock()
+        self.tasks = {}
+
+    def reset(self):
+        self.clock.reset()
+        self.tasks = {}
+
+    def resetTask(self, task):
+        self.tasks[task] = taskCounters(self.windows[-1] if self.windows else 0)
+
+    def _counters(self, task):
+        if task not in self.tasks:
+            self.resetTask(task)
+        return self.tasks[task]
+
+    #--------------------------------
+    # Checkpoints
+    #--------------------------------
+    # Plain copy of the counters and the active time, safe to pickle on another thread
+    def state(self):
+        return {
+            "elapsed": self.clock.elapsed(),
+            "tasks": {
+                task: {
+                    "processed": counters.processed,
+                    "injected": counters.injected,
+                    "corrected": counters.corrected,
+                    "processedTimes": list(counters.processedTimes),
+                    "injectedTimes": list(counters.injectedTimes),
+                    "correctedTimes": list(counters.correctedTimes),
+                }
+                for task, counters in self.tasks.items()
+            },
+        }
+
+    def restore(self, state):
+        self.reset()
+        self.clock.restore(state["elapsed"])
+        for task, saved in state["tasks"].items():
+            counters = self._counters(task)
+            counters.processed = saved["processed"]
+            counters.injected = saved["injected"]
+            counters.corrected = saved["corrected"]
+            counters.processedTimes = deque(saved["processedTimes"])
+            counters.injectedTimes = deque(saved["injectedTimes"])
+            counters.correctedTimes = deque(saved["correctedTimes"])
+
+    #--------------------------------
+    # Event hooks, 'at' is the stamp time (s) it happened if it is being counted later
+    #--------------------------------
+    def recordProcessed(self, task, at=None):
+        counters = self._counters(task)
+        counters.processed += 1
+        counters.processedTimes.append(self._time(at))
+
+    def recordError(self, task, at=None):
+        counters = self._counters(task)
+        counters.injected += 1
+        counters.injectedTimes.append(self._time(at))
+
+    def recordCorrection(self, task, at=None):
+        counters = self._counters(task)
+        counters.corrected += 1
+        counters.correctedTimes.append(self._time(at))
+
+    def _time(self, at):
+        if at is None:
+            return self.clock.elapsed()
+        return self.clock.elapsedAt(at)
+
+    #--------------------------------
+    # Metrics
+    #--------------------------------
+    def snapshot(self, task):
+        counters = self._counters(task)
+        now = self.clock.elapsed()
+        counters.prune(now)
+
+        out = {
+            "elapsed": now,
+            "processed": counters.processed,
+            "injected": counters.injected,
+            "corrected": counters.corrected,
+            "outstanding": counters.injected - counters.corrected,
+            "throughput": counters.processed / now if now > 0 else 0,
+            "errorRate": counters.injected / counters.processed * 100 if counters.processed != 0 else 0,
+            "accuracy": correctedShare(counters.injected, counters.corrected),
+            "legacyAccuracy": legacyAccuracy(counters.injected - counters.corrected, counters.corrected),
+            "windows": {},
+        }
+
+        for window in self.windows:
+            # Early in the session the window can't be longer than the time we have been running
+            span = min(window, now)
+            cutoff = now - window
+            processed = _countSince(counters.processedTimes, cutoff)
+            injected = _countSince(counters.injectedTimes, cutoff)
+            corrected = _countSince(counters.correctedTimes, cutoff)
+            out["windows"][window] = {
+                "throughput": processed / span if span > 0 else 0,
+                "errorRate": injected / processed * 100 if processed != 0 else 0,
+                # Share of the errors injected in the window that were corrected in the window
+                "accuracy": correctedShare(injected, corrected),
+            }
+        return out
+
+
+# Share of the injected errors that were corrected, 0..100, and 100 when nothing was injected
+def correctedShare(injected, corrected):
+    return min(100, corrected / injected * 100) if injected != 0 else 100
+
+
+# Same definition retrieveMetrics has always written for "User Accuracy", kept so old and new rows compare:
+# corrections relative to the errors still outstanding, 100 when nothing is outstanding. Not bounded (3 corrected
+# with 1 outstanding is 300), so summaries use correctedShare and keep this as legacy_accuracy.
+def legacyAccuracy(outstanding, corrected):
+    if outstanding != 0:
+        if corrected != 0:
+            return corrected / outstanding * 100
+        return 0
+    return 100
+
+
+def _countSince(times, cutoff):
+    return len(times) - bisect.bisect_left(times, cutoff)
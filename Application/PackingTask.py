@@ -1,145 +1,44 @@
-import random, math
+import math
 
-from PyQt5.QtCore import QTimer, QRect, Qt
-from PyQt5.QtGui import QBrush, QColor, QPen, QRadialGradient
-from PyQt5.QtWidgets import QSizePolicy, QVBoxLayout, QHBoxLayout, QFrame, QGraphicsView, QGraphicsScene, QGraphicsRectItem, QLabel, QPushButton, QGraphicsTextItem, QGraphicsEllipseItem
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import QSizePolicy, QVBoxLayout, QHBoxLayout, QGraphicsView, QGraphicsScene, QGraphicsRectItem, QLabel, QPushButton, QGraphicsEllipseItem
 
 import pygame
-import os 
-import sys 
+import os
+import sys
 
-from Task import Task
-from DataCollection import dataCollection
+from SimulationCore import packagingSim
+from TaskRender import qtClock, taskRenderWindow
 
-class PackagingTask(Task):
-    def __init__(self, errorRateVal, speed, itemCount, distractions,resolutionW,resolutionH,dataCollector):
-        self._errorRate = errorRateVal
-        self._speed = speed
 
-        self.beeperEnabled = distractions[1]
-        self.flashLightEnabled = distractions[0]
+# The task logic is SimulationCore.packagingSim, this adds the window and the beep.
+# clock=None runs on QTimers, a SimulationCore.virtualClock steps it (and the window) on simulated time.
+class PackagingTask(packagingSim):
+    def __init__(self, errorRateVal, speed, itemCount, distractions, resolutionW, resolutionH, dataCollector, clock=None, rng=None):
+        super().__init__(errorRateVal, speed, itemCount, distractions, resolutionW, resolutionH, dataCollector, clock or qtClock(), rng)
 
-        self.boxList = []
-
-        self.programState = 0
-        self.previousState = 0
-
-        # Sorting Task Specific
-        self.error = 0
-        self.totalError = 0
-        self.fulfilledPackages = 0
-        self.successfulCorrections = 0
-        self.responseTimer = 0
-        self.itemCount = itemCount
-
-        self.dataCollector = dataCollector
-        self.dataCollector.setPackagingTask(self)
-
-
-        self.renderWindow = packagingTaskWindow(resolutionW,resolutionH,self, self.itemCount, self.flashLightEnabled)
-        self.renderWindow.speed = self._speed
+        self.renderWindow = packagingTaskWindow(self.window, self.flashLightEnabled)
 
         # Plays a beep, cool right?
         if self.beeperEnabled:
             pygame.mixer.init()
             self.player = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Sounds\\beep.wav"))
-        
-        if self.flashLightEnabled or self.beeperEnabled:
-            self.distractionTimer = QTimer()
-            self.distractionTimer.timeout.connect(self.doDistraction)
-
-
-    # Commit exampole
-
-    def createNewBox(self):
-        self.renderWindow.animState = 0
-        self.renderWindow.renderNewBox()
-
-    def doDistraction(self):
-        if random.uniform(0.0,1.0) > 0.75:
-            if self.beeperEnabled:
-                self.player.play()
-            if self.flashLightEnabled:
-                self.renderWindow.distractionFlash()
-                QTimer.singleShot(500, self.renderWindow.distractionFlash)
-
-
-    def returnData(self):
-        return [self.error, self.fulfilledPackages, self.totalError, self.successfulCorrections]
-
-    def recordResponseTime(self):
-        self.dataCollector.updateResponseTime("packaging", self.responseTimer)
-        self.responseTimer = 0
-                
-
-    def advBoxQueue(self):
-        # Checks for an error
-        boxNum = self.itemCount
-        if self.causeError():
-            self.error += 1
-            self.totalError += 1
-            self.renderWindow.recordingResponseTime = True
-            boxNum = boxNum + self.decideNegative()
-            if boxNum > self.itemCount:
-                issue = "more_items_than_required"
-            if boxNum < self.itemCount:
-                issue = "less_items_then_required"
-            self.dataCollector.writeDictionary(self.dataCollector.createEventDict("task_error", "packaging_task", "box_filled_with_" + issue), "event")
-        self.boxList.append(boxNum)
-
-        self.renderWindow.animState = 1
-            
-
-    def startTask(self):
-
-        for i in range(1):
-            self.createNewBox()
-
-        self.renderWindow.startStuff(self._speed)
-        if self.distractionTimer is not None:
-            self.distractionTimer.start(500)
-
-    def decideNegative(self):
-        if random.uniform(0.0,1.0) > 0.5:
-            return 1
-        else:   
-            return -1
 
-    def popBox(self):
-        self.boxList.pop(0)
+    def playBeep(self):
+        self.player.play()
 
-    def pause(self):
-        self.renderWindow.animTimer.stop()
-        if self.distractionTimer is not None:
-            self.distractionTimer.stop()
 
-    def resume(self):
-        self.renderWindow.startStuff(self._speed)
-        if self.distractionTimer is not None:
-            self.distractionTimer.start(500)
-
-
-
-
-    def causeError(self):
-        # Does this work? Does this make sense, I'll never tell~
-        error = self._errorRate + random.uniform(-0.05, 0.05) >= random.uniform(0.0,1.0)
-        if error:
-            return True
-        else:
-            return False
-
-
-class packagingTaskWindow(QFrame):
-    def __init__(self, minWidth, minHeight, taskParent, itemCount, flashLight):
-        super().__init__()
+class packagingTaskWindow(taskRenderWindow):
+    def __init__(self, core, flashLight):
+        super().__init__(core)
 
         self.setObjectName("packagingTask")
         self.setStyleSheet("""QFrame { border: 1px solid #d0d0d0; border-radius: 5px; background: #fafafa;}
         QLabel { font-size: 4vmin;}
         QPushButton { padding: 4px 8px;}""")
 
-        self.setMinimumSize(minWidth, minHeight)
+        self.setMinimumSize(core.minWidth, core.minHeight)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
 
         root = QVBoxLayout(self)
@@ -150,40 +49,30 @@ class packagingTaskWindow(QFrame):
         ## RENDER LOGIC ##
         ##################
 
-        self.minHeight = minHeight
-        self.minWidth = minWidth
-        self.taskParent = taskParent
-
-        # Uses for Sizing. Everything is sized in terms of the proportion of the current minHeight (or set height)
+        # Uses for Sizing. Everything is sized in terms of the proportion of the current minHeight (or set height),
+        # the sizes come from the core (SimulationCore._conveyorGeometry)
         # We currently do not dynamically resize the graphic components because it's hard and not really worth
         # doing. Will implement in polish stage if required.
-        self.sceneHeight = int(minHeight / 2)
-        self.sceneWidth = minWidth
+        self.boxHeight = core.boxHeight
 
         self.scene = QGraphicsScene(self)
         self.scene.setBackgroundBrush(QBrush(QColor(105, 105, 105)))
-        self.scene.setSceneRect(0,0, self.sceneWidth ,int(minHeight / 2))
+        self.scene.setSceneRect(0,0, core.sceneWidth, core.sceneHeight)
 
-        # Scale 'constants' for the conveyor and height
-        self.conveyorHeight = int(self.sceneHeight / 4)
-        self.conveyorTopLocation = int(self.sceneHeight / 2 + self.sceneHeight / 6)
-        self.boxHeight = int(self.conveyorHeight / 2)
-
-        conveyor = QGraphicsRectItem(0, self.conveyorTopLocation, self.sceneWidth, self.conveyorHeight)
+        conveyor = QGraphicsRectItem(0, core.conveyorTopLocation, core.sceneWidth, core.conveyorHeight)
         conveyor.setBrush(QBrush(QColor(155, 155, 155)))
         conveyor.setZValue(1)
         self.scene.addItem(conveyor)
 
-        centreScreenBox = int(self.sceneWidth /2 - self.boxHeight/2) - + self.boxHeight * 1.15 / 16
-        arm = QGraphicsEllipseItem(0,0, self.boxHeight/1.25, self.boxHeight/1.25)
-        arm.setX(centreScreenBox + self.boxHeight/4)
+        arm = QGraphicsEllipseItem(0,0, core.boxHeight/1.25, core.boxHeight/1.25)
+        arm.setX(core.centreScreenBox + core.boxHeight/4)
         arm.setBrush(QBrush(QColor(0, 255, 255)))
-        arm.setY(self.conveyorHeight + self.conveyorHeight)
-        arm2 = QGraphicsRectItem(0,0, self.boxHeight/2, self.boxHeight, arm)
+        arm.setY(core.conveyorHeight + core.conveyorHeight)
+        arm2 = QGraphicsRectItem(0,0, core.boxHeight/2, core.boxHeight, arm)
         arm2.setBrush(QBrush(QColor(0, 255, 255)))
         arm2.setPos(arm.boundingRect().topLeft())
-        arm2.setX(arm2.x() + self.boxHeight/7)
-        arm2.setY(arm2.y() + self.boxHeight/4)
+        arm2.setX(arm2.x() + core.boxHeight/7)
+        arm2.setY(arm2.y() + core.boxHeight/4)
         arm.setZValue(200)
         self.scene.addItem(arm)
 
@@ -192,26 +81,18 @@ class packagingTaskWindow(QFrame):
         ## Flashing Light ##
         ####################
         if flashLight:
-            lightSize = ((self.minHeight / 2) / 4) / 2
+            lightSize = ((core.minHeight / 2) / 4) / 2
             self.lightFlash = QGraphicsEllipseItem(0,0, lightSize * 0.5, lightSize * 0.5)
             self.lightFlash.setBrush(QBrush(QColor(255,234,0)))
-            self.lightFlash.setX( self.sceneWidth - self.sceneWidth / 16)
-            self.lightFlash.setY(self.sceneHeight / 16)
+            self.lightFlash.setX( core.sceneWidth - core.sceneWidth / 16)
+            self.lightFlash.setY(core.sceneHeight / 16)
             self.scene.addItem(self.lightFlash)
             self.lightFlash.setVisible(False)
 
-        # Move to Box varaibles
-        # Target is the target x/y for comparison
-        # add x/y is the same as distToHalfway
-        self.targetX = 0
-        self.targetY = self.conveyorHeight + int(self.boxHeight * 1.15) / 15
-        self.addX = 0
-        self.addY = 0
-
 
         viewport = QGraphicsView(self.scene)
         viewport.setInteractive(False)
-        viewport.setFixedSize(self.sceneWidth,self.sceneHeight)
+        viewport.setFixedSize(core.sceneWidth, core.sceneHeight)
 
         viewport.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         viewport.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
@@ -240,160 +121,23 @@ class packagingTaskWindow(QFrame):
         errorLayout.addWidget(self.minusErrorButton)
         root.addLayout(errorLayout)
 
-
-        # Anim State:
-            # 0 = Move box along line
-            # 1 = Move Arm to box position
-            # 2 = Move Arm to appropriate box
-            # 3 = General interrupt if needed
-        self.animState = 0
-        self.animTimer = QTimer()
-        self.animTimer.timeout.connect(self.doAnimationStep)
-
-        self.filledArray = []
-        self.unfilledArray = []
-
-        self.distToHalfway = 0
-        self.priorState = None
-        self.interrupt = False
-        self.speed = None
-        self.spawnTimer = 0
-
-        self.recordingResponseTime = False
-
-
-    def startStuff(self, speed):
-        self.animTimer.start(50)
-
-        # Calculates the dist per step required to get to the halfway point for the arm
-            # (Width / 2 ) / ( Total Steps )
-                # (Width / 2) / (speed / timestep [50])
-        self.distToHalfway = (self.sceneWidth /2 - self.boxHeight/2)  / (speed / 50)
-        self.speed = speed
-
-    def distractionFlash(self):
-        self.lightFlash.setVisible(not self.lightFlash.isVisible())                    
-    
-    def renderNewBox(self):
-        tempItem = QGraphicsRectItem(0, 0, self.boxHeight, self.boxHeight)
-        tempItem.setY(self.conveyorTopLocation + self.conveyorHeight / 4)
-        tempItem.setBrush(QBrush(QColor("#fffe00")))
-        tempItem.setZValue(500)
-        self.unfilledArray.append(tempItem)
-        self.scene.addItem(tempItem)
-
-    def moveBox(self, disToMovePerMil):
-        
-        if random.uniform(0.0,1.0) > 0.4 + random.uniform(-0.1,0.1) and self.spawnTimer >= self.speed / 2: 
-            self.spawnTimer = 0
-            self.taskParent.createNewBox()
-        else:
-            self.spawnTimer += 50
-
-        for box in self.unfilledArray:
-            box.setX(box.x() + disToMovePerMil)
-    
-        for box in self.filledArray:
-            box.setX(box.x() + disToMovePerMil)
-            if box.x() > self.sceneWidth:
-                self.scene.removeItem(box)
-                self.filledArray.pop(0)
-                self.taskParent.boxList.pop(0)
-
-                # Check if box is error and disable response time, too late bucko
-                index = len(self.taskParent.boxList) - 1
-                if self.taskParent.boxList[index] < self.taskParent.itemCount or self.taskParent.boxList[index] > self.taskParent.itemCount:
-                    self.recordingResponseTime = False
-                    self.taskParent.responseTimer = 0
-
-                self.taskParent.fulfilledPackages += 1
-
-        # Panic create new box
-        if len(self.unfilledArray) <= 0:
-            print("?")
-            self.taskParent.createNewBox()
-
-        # Changes state once the box at the front of the conveyor reaches the halfway point
-        if(self.unfilledArray[0].x() >= self.sceneWidth /2):
-            
-            if not self.interrupt:
-                self.taskParent.advBoxQueue()
-            else:
-                self.animState = 2
-                self.priorState = 1
-
-    def removeItem(self, item):
-        childArray = item.childItems()
-        endIndex = len(childArray) - 1
-        self.scene.removeItem(childArray[endIndex])
-
-    def addItem(self, item):
-        newChildNum  = len(item.childItems())
-        self.addBox(item, newChildNum)
-    
-
     def correctBox(self, action):
-        index = 0
-        errorFound = False
-        for b in self.filledArray:
-            print(self.taskParent.boxList[index])
-            print(str(index))
-            if action == "plus" and self.taskParent.boxList[index] < self.taskParent.itemCount:
-                self.addItem(b)
-                self.taskParent.error -= 1
-                self.taskParent.successfulCorrections += 1
-                self.taskParent.boxList[index] += 1
-                self.recordingResponseTime = False
-                self.taskParent.recordResponseTime()
-                self.taskParent.dataCollector.writeDictionary(self.taskParent.dataCollector.createEventDict("user_input", "packaging_task", "box_corrected_by_adding_item"), "event")
-                errorFound = True
-                break
-            elif action == "minus" and self.taskParent.boxList[index] > self.taskParent.itemCount:
-                self.removeItem(b)
-                self.taskParent.error -= 1
-                self.taskParent.successfulCorrections += 1
-                self.taskParent.boxList[index] -= 1
-                self.recordingResponseTime = False
-                self.taskParent.recordResponseTime()
-                self.taskParent.dataCollector.writeDictionary(self.taskParent.dataCollector.createEventDict("user_input", "packaging_task", "box_corrected_by_removing_item"), "event")
-                errorFound = True
-                break
-
-            index += 1
-        if not errorFound:
-            self.taskParent.dataCollector.writeDictionary(self.taskParent.dataCollector.createEventDict("user_input", "packaging_task", "attempted_to_correct_a_nonexistent_error"), "event")
-
-    
-  
-
-    def doAnimationStep(self):
-        if self.recordingResponseTime:
-            self.taskParent.responseTimer += 50
-
-        match self.animState:
-            case 0:
-                self.moveBox(self.distToHalfway)
-            case 1: 
-                self.fillBox()
-  
+        self.core.correctBox(action)
+
+    # The items drawn in a box follow its count
+    def itemChanged(self, item):
+        graphic = self.graphics.get(item)
+        if graphic is None:
+            return
+        while len(graphic.childItems()) < item.count:
+            self.addBox(graphic, len(graphic.childItems()))
+        while len(graphic.childItems()) > item.count:
+            childArray = graphic.childItems()
+            endIndex = len(childArray) - 1
+            self.scene.removeItem(childArray[endIndex])
+
     def addBox(self, item, position):
         insideBox = QGraphicsRectItem(0,0, self.boxHeight / 6, self.boxHeight / 6, item)
         insideBox.setPos(item.boundingRect().topLeft())
         insideBox.setX(insideBox.x() + ((position % 3)) * self.boxHeight / 3 + self.boxHeight/16)
         insideBox.setY(insideBox.y() + (math.floor(position/3)) * self.boxHeight / 3 + self.boxHeight/16)
-    
-    def fillBox(self):
-        if len(self.unfilledArray[0].childItems()) == self.taskParent.boxList[len(self.taskParent.boxList) - 1]:
-            self.filledArray.append(self.unfilledArray[0])
-            self.unfilledArray.pop(0)
-            
-            self.animState = 0
-        else: 
-            self.addBox(self.unfilledArray[0], len(self.unfilledArray[0].childItems()))
-
-
-        
-
-
-
-
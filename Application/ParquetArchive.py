@@ -0,0 +1,129 @@
+import os, sys, json
+import pandas as pd
+
+import ClockSync
+
+# pyarrow is only needed for the archive, the rest of the app runs without it
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# Columnar archive of the results for offline analysis.
+# Archive layout:
+#   <archiveDir>/metrics/participant_id=P001/session_id=S001/<part>.parquet
+#   <archiveDir>/events/participant_id=P001/session_id=S001/<part>.parquet
+#   <archiveDir>/manifest.json   (sessions already archived, per table)
+# Repeated text columns are stored as categoricals so parquet dictionary-encodes them.
+# Events get a recorder_ns column, their time on the external recorder's clock, for sessions that have a
+# row in clocksync.csv (see ClockSync.py). It is empty for the others.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+DEFAULT_ARCHIVE = os.path.join(RESULTS_DIR, "archive")
+
+PARTITION_COLUMNS = ["participant_id", "session_id"]
+CATEGORICAL_COLUMNS = {
+    "metrics": ["metric_type", "task_type", "unit"],
+    "events": ["event_type", "task_type", "event_code", "expected_bin", "actual_bin"],
+}
+
+
+def parquetAvailable():
+    return pyarrow is not None
+
+
+def loadManifest(archiveDir):
+    path = os.path.join(archiveDir, "manifest.json")
+    if not os.path.exists(path):
+        return {"metrics": [], "events": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def saveManifest(archiveDir, manifest):
+    path = os.path.join(archiveDir, "manifest.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _typeChunk(chunk, table):
+    chunk["Timestamp"] = pd.to_datetime(chunk["Timestamp"], errors="coerce")
+    for column in CATEGORICAL_COLUMNS[table]:
+        chunk[column] = chunk[column].astype("category")
+    if table == "metrics":
+        chunk["value"] = pd.to_numeric(chunk["value"], errors="coerce").astype("float64")
+    else:
+        for column in ("item_count", "expected_count", "size", "response_ms"):
+            if column in chunk.columns:
+                chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+    return chunk
+
+
+# Converts one results CSV into the partitioned archive.
+# Only sessions missing from the manifest are converted. 'sessions' limits the run to those IDs,
+# 'exclude' skips IDs (e.g. a session that is still being recorded).
+# 'clock' is the clocksync.csv DataFrame used for recorder_ns on events.
+def exportTable(location, table, archiveDir=DEFAULT_ARCHIVE, sessions=None, exclude=(), chunksize=200000, clock=None):
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required for the parquet archive (pip install pyarrow)")
+    if not os.path.exists(location):
+        return []
+
+    manifest = loadManifest(archiveDir)
+    skip = set(manifest.get(table, [])) | set(exclude)
+    wanted = set(sessions) if sessions is not None else None
+    tableDir = os.path.join(archiveDir, table)
+    os.makedirs(tableDir, exist_ok=True)
+
+    archived = set()
+    for chunk in pd.read_csv(location, chunksize=chunksize, dtype=str, keep_default_na=False):
+        mask = ~chunk["session_id"].isin(skip)
+        if wanted is not None:
+            mask &= chunk["session_id"].isin(wanted)
+        chunk = chunk[mask]
+        if chunk.empty:
+            continue
+
+        chunk = _typeChunk(chunk.copy(), table)
+        if table == "events":
+            chunk = ClockSync.applyClockSync(chunk, clock)
+        chunk.to_parquet(tableDir, engine="pyarrow", partition_cols=PARTITION_COLUMNS, index=False)
+        archived.update(chunk["session_id"].unique())
+
+    if archived:
+        manifest[table] = sorted(set(manifest.get(table, [])) | archived)
+        saveManifest(archiveDir, manifest)
+    return sorted(archived)
+
+
+def exportResults(metricFile=None, eventFile=None, archiveDir=DEFAULT_ARCHIVE, sessions=None, exclude=(), clockFile=None):
+    if metricFile is None:
+        metricFile = os.path.join(RESULTS_DIR, "metrics.csv")
+    if eventFile is None:
+        eventFile = os.path.join(RESULTS_DIR, "events.csv")
+    if clockFile is None:
+        clockFile = os.path.join(RESULTS_DIR, "clocksync.csv")
+    return {
+        "metrics": exportTable(metricFile, "metrics", archiveDir, sessions, exclude),
+        "events": exportTable(eventFile, "events", archiveDir, sessions, exclude, clock=ClockSync.loadClockSync(clockFile)),
+    }
+
+
+# Reads back from the archive. participant_id/session_id prune partitions so only matching files are opened.
+def readArchive(table, archiveDir=DEFAULT_ARCHIVE, participant_id=None, session_id=None, columns=None):
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required for the parquet archive (pip install pyarrow)")
+    filters = []
+    if participant_id is not None:
+        filters.append(("participant_id", "=", participant_id))
+    if session_id is not None:
+        filters.append(("session_id", "=", session_id))
+    return pd.read_parquet(os.path.join(archiveDir, table), engine="pyarrow", columns=columns, filters=filters or None)
+
+
+if __name__ == "__main__":
+    # python ParquetArchive.py [session to exclude, e.g. one still running]
+    print(exportResults(exclude=sys.argv[1:]))
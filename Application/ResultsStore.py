@@ -0,0 +1,212 @@
+import os, sys, sqlite3, threading, datetime
+import pandas as pd
+
+from SessionSummary import SUMMARY_COLUMNS, normalizeAccuracy
+
+
+# Optional SQLite backend for the results.
+# Holds the same rows as metrics.csv / events.csv in one WAL-mode database, indexed so a
+# single session, participant or time range can be pulled out without reading the whole history.
+# The per session rollups (summary.csv) go in the 'summaries' table.
+
+TABLE_COLUMNS = {
+    "metrics": ["Timestamp", "session_id", "participant_id", "metric_type", "task_type", "value", "unit"],
+    "events": ["Timestamp", "session_id", "participant_id", "event_type", "task_type", "details",
+               "event_code", "expected_bin", "actual_bin", "item_count", "expected_count", "size", "response_ms"],
+    "summaries": SUMMARY_COLUMNS,
+}
+
+# Columns added after the first version of the schema, added to older databases on open
+ADDED_COLUMNS = {
+    "events": [("event_code", "TEXT"), ("expected_bin", "TEXT"), ("actual_bin", "TEXT"), ("item_count", "INTEGER"),
+               ("expected_count", "INTEGER"), ("size", "REAL"), ("response_ms", "REAL")],
+    "summaries": [("legacy_accuracy", "REAL")],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    Timestamp TEXT,
+    session_id TEXT,
+    participant_id TEXT,
+    metric_type TEXT,
+    task_type TEXT,
+    value REAL,
+    unit TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    Timestamp TEXT,
+    session_id TEXT,
+    participant_id TEXT,
+    event_type TEXT,
+    task_type TEXT,
+    details TEXT,
+    event_code TEXT,
+    expected_bin TEXT,
+    actual_bin TEXT,
+    item_count INTEGER,
+    expected_count INTEGER,
+    size REAL,
+    response_ms REAL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    Timestamp TEXT,
+    session_id TEXT,
+    participant_id TEXT,
+    task_type TEXT,
+    duration_s REAL,
+    boxes_processed INTEGER,
+    injected_errors INTEGER,
+    corrections INTEGER,
+    throughput REAL,
+    error_rate REAL,
+    accuracy REAL,
+    resp_count INTEGER,
+    resp_mean REAL,
+    resp_std REAL,
+    resp_min REAL,
+    resp_max REAL,
+    resp_p50 REAL,
+    resp_p90 REAL,
+    resp_p99 REAL,
+    legacy_accuracy REAL
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_session ON summaries (session_id, task_type);
+CREATE INDEX IF NOT EXISTS idx_summaries_participant ON summaries (participant_id, task_type);
+CREATE INDEX IF NOT EXISTS idx_metrics_session ON metrics (session_id, task_type, Timestamp);
+CREATE INDEX IF NOT EXISTS idx_metrics_participant ON metrics (participant_id, task_type, Timestamp);
+CREATE INDEX IF NOT EXISTS idx_metrics_time ON metrics (Timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_session ON events (session_id, task_type, Timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_participant ON events (participant_id, task_type, Timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (Timestamp);
+"""
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results", "results.db")
+
+
+class resultsStore:
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        # The writer thread inserts while the GUI or an analysis script reads, so one lock guards the connection
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(" + table + ")")}
+            for column, sqlType in columns:
+                if column not in existing:
+                    self._conn.execute("ALTER TABLE " + table + " ADD COLUMN " + column + " " + sqlType)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_code ON events (event_code, session_id)")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    #--------------------------------
+    # Writing
+    #--------------------------------
+    # rows are tuples in TABLE_COLUMNS order, same as the CSV files
+    def insertRows(self, table, rows):
+        columns = TABLE_COLUMNS[table]
+        sql = "INSERT INTO " + table + " (" + ",".join(columns) + ") VALUES (" + ",".join("?" * len(columns)) + ")"
+        with self._lock:
+            self._conn.executemany(sql, [tuple(_toSQL(v) for v in row) for row in rows])
+            self._conn.commit()
+
+    # Imports the existing CSV files. Sessions already in the store are skipped so running this twice is harmless.
+    def importCSV(self, metricFile=None, eventFile=None, chunksize=100000, summaryFile=None):
+        imported = {}
+        for table, location in (("metrics", metricFile), ("events", eventFile), ("summaries", summaryFile)):
+            if location is None or not os.path.exists(location):
+                continue
+            known = set(self._query("SELECT DISTINCT session_id FROM " + table, [])["session_id"])
+            count = 0
+            for chunk in pd.read_csv(location, chunksize=chunksize, dtype=str, keep_default_na=False):
+                chunk = chunk[~chunk["session_id"].isin(known)]
+                if chunk.empty:
+                    continue
+                chunk = chunk.reindex(columns=TABLE_COLUMNS[table])
+                if table == "metrics":
+                    chunk["value"] = pd.to_numeric(chunk["value"], errors="coerce")
+                elif table == "summaries":
+                    numeric = SUMMARY_COLUMNS[4:]
+                    chunk[numeric] = chunk[numeric].apply(pd.to_numeric, errors="coerce")
+                chunk = chunk.astype(object).where(chunk != "", None)
+                self.insertRows(table, chunk.itertuples(index=False, name=None))
+                count += len(chunk)
+            imported[table] = count
+        return imported
+
+    #--------------------------------
+    # Queries, all return DataFrames
+    #--------------------------------
+    def get_session(self, session_id, table="metrics", task_type=None):
+        sql = "SELECT * FROM " + _table(table) + " WHERE session_id = ?"
+        params = [session_id]
+        if task_type is not None:
+            sql += " AND task_type = ?"
+            params.append(task_type)
+        return self._query(sql + " ORDER BY Timestamp", params)
+
+    def get_participant(self, participant_id, table="metrics", task_type=None):
+        sql = "SELECT * FROM " + _table(table) + " WHERE participant_id = ?"
+        params = [participant_id]
+        if task_type is not None:
+            sql += " AND task_type = ?"
+            params.append(task_type)
+        return self._query(sql + " ORDER BY session_id, Timestamp", params)
+
+    def metrics_between(self, start, end, metric_type=None, task_type=None, session_id=None, participant_id=None):
+        sql = "SELECT * FROM metrics WHERE Timestamp >= ? AND Timestamp < ?"
+        params = [_toSQL(start), _toSQL(end)]
+        for column, value in (("metric_type", metric_type), ("task_type", task_type),
+                              ("session_id", session_id), ("participant_id", participant_id)):
+            if value is not None:
+                sql += " AND " + column + " = ?"
+                params.append(value)
+        return self._query(sql + " ORDER BY Timestamp", params)
+
+    def summaries(self, session_id=None, participant_id=None):
+        sql = "SELECT * FROM summaries WHERE 1 = 1"
+        params = []
+        for column, value in (("session_id", session_id), ("participant_id", participant_id)):
+            if value is not None:
+                sql += " AND " + column + " = ?"
+                params.append(value)
+        return normalizeAccuracy(self._query(sql + " ORDER BY session_id, task_type", params))
+
+    def sessions(self):
+        return self._query("SELECT DISTINCT session_id, participant_id FROM events ORDER BY session_id", [])
+
+    def _query(self, sql, params):
+        with self._lock:
+            df = pd.read_sql_query(sql, self._conn, params=params)
+        if "Timestamp" in df.columns:
+            df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+        return df
+
+
+def _table(table):
+    if table not in TABLE_COLUMNS:
+        raise ValueError("table must be 'metrics', 'events' or 'summaries'")
+    return table
+
+
+# Timestamps are stored as ISO text (same format as the CSVs) so they sort and compare as strings
+def _toSQL(value):
+    if isinstance(value, (datetime.datetime, pd.Timestamp)):
+        return value.isoformat(sep=" ")
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+if __name__ == "__main__":
+    # python ResultsStore.py  ->  imports the existing CSVs into Results/results.db
+    resultsDir = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+    store = resultsStore(os.path.join(resultsDir, "results.db"))
+    print(store.importCSV(os.path.join(resultsDir, "metrics.csv"), os.path.join(resultsDir, "events.csv"),
+                          summaryFile=os.path.join(resultsDir, "summary.csv")))
+    store.close()
@@ -0,0 +1,244 @@
+import threading, queue, time, atexit
+import pandas as pd
+
+from SessionIndex import sessionIndex, splitRuns
+
+
+# Background writer for the results files.
+# Rows are queued from the GUI thread and a dedicated thread batches them per file,
+# appending once a file has batchSize rows waiting or its oldest row is flushInterval seconds old.
+#
+# Backpressure: the queue is bounded to maxQueue rows. When it is full a write waits up to
+# blockTimeout seconds (one animation tick by default) for space, after which the row is dropped
+# and counted in droppedRows. A stalled disk can cost data but can never freeze the conveyors.
+class resultsWriter:
+    def __init__(self, maxQueue=20000, batchSize=256, flushInterval=0.5, blockTimeout=0.05):
+        self.maxQueue = maxQueue
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.blockTimeout = blockTimeout
+
+        # location -> column order for that file
+        self.columns = {}
+        # location -> sessionIndex, for files with a byte offset index kept next to them
+        self.indexes = {}
+        # Extra destinations fed with every batch after it hits the CSV, called on the writer thread
+        self.sinks = []
+        # Timebase.timeAnchor used to turn stamped Timestamp values into wall time as rows are written
+        self.timeAnchor = None
+
+        self._queue = queue.Queue(maxsize=maxQueue)
+        self._pending = {}
+        self._pendingSince = {}
+        self._closed = False
+
+        # Counters
+        self.rowsQueued = 0
+        self.rowsWritten = 0
+        self.batchesWritten = 0
+        self.droppedRows = 0
+        self.writeFailures = 0
+        self.maxQueueDepth = 0
+        self.lastFlushLatency = 0.0
+        self.maxFlushLatency = 0.0
+        self.totalFlushLatency = 0.0
+        self.lastRowAge = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="resultsWriter", daemon=True)
+        self._thread.start()
+
+        # Whatever happens, try to get queued rows on disk before the interpreter goes away
+        atexit.register(self.close)
+
+    # indexed: keep location + ".idx" (SessionIndex) up to date as rows are appended
+    def registerFile(self, location, columns, indexed=False):
+        self.columns[location] = list(columns)
+        if indexed and location not in self.indexes:
+            self.indexes[location] = sessionIndex(location)
+
+    # sink(location, rows) receives each written batch. Anything it raises is logged and ignored.
+    def addSink(self, sink):
+        self.sinks.append(sink)
+
+    # Called from the GUI thread. Returns False if the row had to be dropped.
+    def write(self, location, row):
+        if self._closed:
+            print("[Results Writer] Write after close, row dropped")
+            self.droppedRows += 1
+            return False
+
+        try:
+            self._queue.put((location, row, time.perf_counter()), timeout=self.blockTimeout)
+        except queue.Full:
+            self.droppedRows += 1
+            if self.droppedRows == 1 or self.droppedRows % 1000 == 0:
+                print("[Results Writer] Queue full, dropped " + str(self.droppedRows) + " rows so far")
+            return False
+
+        self.rowsQueued += 1
+        depth = self._queue.qsize()
+        if depth > self.maxQueueDepth:
+            self.maxQueueDepth = depth
+        return True
+
+    # Blocks until everything queued before this call is on disk
+    def flush(self, timeout=5.0):
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        try:
+            self._queue.put((None, done, 0), timeout=timeout)
+        except queue.Full:
+            print("[Results Writer] Could not queue flush request")
+            return
+        if not done.wait(timeout):
+            print("[Results Writer] Flush timed out")
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        try:
+            self._queue.put((None, None, 0), timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queueDepth": self._queue.qsize(),
+            "maxQueueDepth": self.maxQueueDepth,
+            "pendingRows": sum(len(rows) for rows in self._pending.values()),
+            "rowsQueued": self.rowsQueued,
+            "rowsWritten": self.rowsWritten,
+            "batchesWritten": self.batchesWritten,
+            "droppedRows": self.droppedRows,
+            "writeFailures": self.writeFailures,
+            "lastFlushLatency": self.lastFlushLatency,
+            "maxFlushLatency": self.maxFlushLatency,
+            "meanFlushLatency": self.totalFlushLatency / self.batchesWritten if self.batchesWritten else 0.0,
+            "lastRowAge": self.lastRowAge,
+        }
+
+    #--------------------------------
+    # Writer thread
+    #--------------------------------
+    def _run(self):
+        while True:
+            try:
+                location, row, queuedAt = self._queue.get(timeout=self._timeUntilDue())
+            except queue.Empty:
+                self._flushDue()
+                continue
+
+            # Control messages
+            if location is None:
+                self._flushAll()
+                if row is None:
+                    return
+                row.set()
+                continue
+
+            if location not in self._pending:
+                self._pending[location] = []
+                self._pendingSince[location] = queuedAt
+            self._pending[location].append(row)
+
+            if len(self._pending[location]) >= self.batchSize:
+                self._flushFile(location)
+            else:
+                self._flushDue()
+
+    def _timeUntilDue(self):
+        if not self._pendingSince:
+            return self.flushInterval
+        oldest = min(self._pendingSince.values())
+        return max(0.0, oldest + self.flushInterval - time.perf_counter())
+
+    def _flushDue(self):
+        now = time.perf_counter()
+        for location in list(self._pendingSince):
+            if now - self._pendingSince[location] >= self.flushInterval:
+                self._flushFile(location)
+
+    def _flushAll(self):
+        for location in list(self._pending):
+            self._flushFile(location)
+
+    def _flushFile(self, location):
+        rows = self._pending.get(location)
+        if not rows:
+            return
+        queuedAt = self._pendingSince[location]
+
+        start = time.perf_counter()
+        try:
+            # Typed records are turned into rows here rather than on the GUI thread
+            rows = [row.asRow() if hasattr(row, "asRow") else row for row in rows]
+            rows = self._wallTimes(location, rows)
+            if location in self.indexes:
+                self._appendIndexed(location, rows)
+            else:
+                # object dtype keeps each value as given, so ints in a mostly float column are not written as 1.0
+                df = pd.DataFrame(rows, columns=self.columns.get(location), dtype=object)
+                df.to_csv(location, mode="a", header=False, index=False)
+        except Exception as e:
+            # Most likely the file is open elsewhere (Excel locks it on Windows). Keep the rows and retry later.
+            self.writeFailures += 1
+            print("[Results Writer] Failed to write " + str(len(rows)) + " rows to " + location + ": " + str(e))
+            self._pendingSince[location] = time.perf_counter()
+            return
+
+        end = time.perf_counter()
+        del self._pending[location]
+        del self._pendingSince[location]
+
+        self.rowsWritten += len(rows)
+        self.batchesWritten += 1
+        self.lastFlushLatency = end - start
+        self.totalFlushLatency += self.lastFlushLatency
+        if self.lastFlushLatency > self.maxFlushLatency:
+            self.maxFlushLatency = self.lastFlushLatency
+        self.lastRowAge = end - queuedAt
+
+        for sink in self.sinks:
+            try:
+                sink(location, rows)
+            except Exception as e:
+                print("[Results Writer] Sink failed: " + str(e))
+
+    # Monotonic stamps in the Timestamp column -> datetime, using the anchor of the session they came from
+    def _wallTimes(self, location, rows):
+        anchor = self.timeAnchor
+        columns = self.columns.get(location)
+        if anchor is None or not columns or "Timestamp" not in columns:
+            return rows
+        column = columns.index("Timestamp")
+        return [row[:column] + (anchor.toWall(row[column]),) + row[column + 1:] if type(row[column]) is int else row
+                for row in map(tuple, rows)]
+
+    # Same append as above, but every run of rows from one session is formatted separately so its byte range
+    # is known, and the whole batch still goes out in one write
+    def _appendIndexed(self, location, rows):
+        columns = self.columns[location]
+        runs = splitRuns(rows, columns)
+        chunks = [pd.DataFrame(runRows, columns=columns, dtype=object).to_csv(header=False, index=False).encode("utf8")
+                  for session, participant, runRows in runs]
+
+        with open(location, "ab") as f:
+            f.seek(0, 2)
+            start = f.tell()
+            # Rows someone else appended since our last batch get indexed before ours
+            self.indexes[location].prepare(start)
+            f.write(b"".join(chunks))
+
+        entries = []
+        for (session, participant, runRows), chunk in zip(runs, chunks):
+            entries.append((session, participant, start, start + len(chunk)))
+            start += len(chunk)
+        try:
+            self.indexes[location].append(entries)
+        except Exception as e:
+            # The rows are on disk, a broken index is rebuilt from the file the next time it is loaded
+            print("[Results Writer] Failed to update index for " + location + ": " + str(e))
@@ -0,0 +1,188 @@
+import os, io, csv
+import pandas as pd
+
+
+# Byte offset index for the results CSVs.
+# Next to e.g. metrics.csv sits metrics.csv.idx, one line per run of rows the writer appended for the same
+# session and participant:
+#   session_id,participant_id,start,end
+# The first line is "#<header length>" so a rewritten header (see DataCollection.upgradeHeader) is noticed.
+# load_session() seeks to the ranges of one session and parses only those bytes.
+#
+# Rows appended by anything other than the writer (another process, shard merges, older versions) are indexed by
+# scanning from the end of the index to the end of the file the next time the index is used, and by the writer
+# before each of its own appends. If the index does not match the file at all it is rebuilt from scratch.
+
+INDEX_SUFFIX = ".idx"
+
+
+class sessionIndex:
+    def __init__(self, location):
+        self.location = location
+        self.indexFile = location + INDEX_SUFFIX
+        self.entries = None
+        self.headerLength = None
+
+    # (session_id, participant_id, start, end) for every indexed run, brought up to date with the file first.
+    # Only the writer that owns the index persists what it finds, readers keep the catch up in memory
+    # so they never race the writer for the index file.
+    def load(self, persist=False):
+        self.entries, self.headerLength = self._read()
+        if not os.path.exists(self.location):
+            return self.entries
+
+        headerLength = _headerLength(self.location)
+        size = os.path.getsize(self.location)
+        indexedTo = self.entries[-1][3] if self.entries else headerLength
+
+        if self.headerLength != headerLength or indexedTo > size:
+            if self.headerLength is not None:
+                print("[Session Index] " + self.indexFile + " does not match the file, rebuilding")
+            self.entries = []
+            self.headerLength = headerLength
+            indexedTo = headerLength
+            if persist:
+                self._rewrite()
+        if indexedTo < size:
+            runs = _scan(self.location, indexedTo)
+            if persist:
+                self._add(runs)
+            else:
+                self.entries.extend(runs)
+        return self.entries
+
+    # Called by the writer before every append, 'size' being where its rows will start (the end of the file).
+    # Whatever was appended since the last indexed run by anyone else is indexed first, like load() does for readers.
+    def prepare(self, size=None):
+        if self.entries is None:
+            self.load(persist=True)
+        if not os.path.exists(self.location):
+            return
+        if size is None:
+            size = os.path.getsize(self.location)
+        indexedTo = self.entries[-1][3] if self.entries else self.headerLength
+        if self.headerLength != _headerLength(self.location) or indexedTo > size:
+            # Header rewritten or file replaced, load() notices and rebuilds
+            self.load(persist=True)
+        elif indexedTo < size:
+            self._add(_scan(self.location, indexedTo, size))
+
+    # Called by the writer after appending rows. runs: [(session_id, participant_id, start, end)] in file order
+    def append(self, runs):
+        if self.entries is None:
+            self.prepare()
+        self._add(runs)
+
+    def _add(self, runs):
+        if not runs:
+            return
+        with open(self.indexFile, "a", encoding="utf8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerows(runs)
+        self.entries.extend(runs)
+
+    # Merged byte ranges of one session (or participant)
+    def ranges(self, session_id=None, participant_id=None):
+        entries = self.load()
+        out = []
+        for session, participant, start, end in entries:
+            if session_id is not None and session != session_id:
+                continue
+            if participant_id is not None and participant != participant_id:
+                continue
+            if out and out[-1][1] == start:
+                out[-1] = (out[-1][0], end)
+            else:
+                out.append((start, end))
+        return out
+
+    def sessions(self):
+        return list(dict.fromkeys(entry[0] for entry in self.load()))
+
+    def _read(self):
+        entries = []
+        headerLength = None
+        try:
+            with open(self.indexFile, "r", encoding="utf8", newline="") as f:
+                first = f.readline()
+                if first.startswith("#"):
+                    headerLength = int(first[1:])
+                for row in csv.reader(f):
+                    # A half written last line is just ignored, the scan picks those rows up again
+                    if len(row) == 4 and row[3].isdigit():
+                        entries.append((row[0], row[1], int(row[2]), int(row[3])))
+        except (OSError, ValueError):
+            return [], None
+        return entries, headerLength
+
+    def _rewrite(self):
+        tmp = self.indexFile + ".tmp"
+        with open(tmp, "w", encoding="utf8", newline="") as f:
+            f.write("#" + str(self.headerLength) + "\n")
+            csv.writer(f).writerows(self.entries)
+        os.replace(tmp, self.indexFile)
+
+
+# Splits rows (tuples in file column order) into runs of the same session and participant.
+# Returns [(session_id, participant_id, [rows])]
+def splitRuns(rows, columns):
+    sessionColumn = columns.index("session_id")
+    participantColumn = columns.index("participant_id")
+    runs = []
+    for row in rows:
+        key = (str(row[sessionColumn]), str(row[participantColumn]))
+        if runs and runs[-1][:2] == key:
+            runs[-1][2].append(row)
+        else:
+            runs.append((key[0], key[1], [row]))
+    return runs
+
+
+def _headerLength(location):
+    with open(location, "rb") as f:
+        return len(f.readline())
+
+
+# Index entries for the rows from byte 'start' to 'end' (the end of the file if None)
+def _scan(location, start, end=None):
+    with open(location, "rb") as f:
+        columns = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        sessionColumn = columns.index("session_id")
+        participantColumn = columns.index("participant_id")
+
+        f.seek(start)
+        runs = []
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                break
+            lineEnd = position + len(line)
+            values = next(csv.reader([line.decode("utf8", errors="replace")]), [])
+            if len(values) > participantColumn:
+                key = (values[sessionColumn], values[participantColumn])
+                if runs and runs[-1][:2] == key and runs[-1][3] == position:
+                    runs[-1] = (key[0], key[1], runs[-1][2], lineEnd)
+                else:
+                    runs.append((key[0], key[1], position, lineEnd))
+            position = lineEnd
+    return runs
+
+
+def _loadRanges(location, ranges, **kwargs):
+    with open(location, "rb") as f:
+        buffer = io.BytesIO()
+        buffer.write(f.readline())
+        for start, end in ranges:
+            f.seek(start)
+            buffer.write(f.read(end - start))
+    buffer.seek(0)
+    return pd.read_csv(buffer, **kwargs)
+
+
+# Rows of one session, reading only that session's bytes. kwargs go to pandas.read_csv.
+def load_session(location, session_id, **kwargs):
+    return _loadRanges(location, sessionIndex(location).ranges(session_id=session_id), **kwargs)
+
+
+def load_participant(location, participant_id, **kwargs):
+    return _loadRanges(location, sessionIndex(location).ranges(participant_id=participant_id), **kwargs)
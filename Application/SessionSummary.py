@@ -0,0 +1,55 @@
+import pandas as pd
+
+from Timebase import stamp
+
+
+# One row per session and task, written when the session is stopped (Results/summary.csv).
+# Holds the numbers most questions about a session start with, so dashboards and reports can read
+# this small file instead of going through the full metric/event history.
+#   accuracy         share of the injected errors that were corrected, 0..100 (100 if none were injected)
+#   legacy_accuracy  the "User Accuracy" metrics.csv has always had (corrections / errors still outstanding, unbounded)
+# Rows written before legacy_accuracy existed have the legacy number under accuracy, normalizeAccuracy sorts them out.
+
+SUMMARY_COLUMNS = [
+    "Timestamp", "session_id", "participant_id", "task_type",
+    "duration_s", "boxes_processed", "injected_errors", "corrections",
+    "throughput", "error_rate", "accuracy",
+    "resp_count", "resp_mean", "resp_std", "resp_min", "resp_max", "resp_p50", "resp_p90", "resp_p99",
+    "legacy_accuracy",
+]
+
+
+# snapshot: metricsEngine.snapshot(task), response: streamingStats.summary() in seconds
+def summaryRow(sessionID, participantID, taskType, snapshot, response, timestamp=None):
+    return (
+        timestamp or stamp(), sessionID, participantID, taskType,
+        snapshot["elapsed"], snapshot["processed"], snapshot["injected"], snapshot["corrected"],
+        snapshot["throughput"], snapshot["errorRate"], snapshot["accuracy"],
+        response["count"], response["mean"], response["std"], response["min"], response["max"],
+        response["p50"], response["p90"], response["p99"],
+        snapshot["legacyAccuracy"],
+    )
+
+
+# Older rows (no legacy_accuracy): their accuracy moves to legacy_accuracy and accuracy is worked out from the counts
+def normalizeAccuracy(df):
+    df = df.copy()
+    if "legacy_accuracy" not in df.columns:
+        df["legacy_accuracy"] = None
+    df["accuracy"] = pd.to_numeric(df["accuracy"], errors="coerce").astype(float)
+    df["legacy_accuracy"] = pd.to_numeric(df["legacy_accuracy"], errors="coerce").astype(float)
+    old = df["legacy_accuracy"].isna()
+    if old.any():
+        injected = pd.to_numeric(df.loc[old, "injected_errors"], errors="coerce")
+        corrected = pd.to_numeric(df.loc[old, "corrections"], errors="coerce")
+        df.loc[old, "legacy_accuracy"] = df.loc[old, "accuracy"]
+        df.loc[old, "accuracy"] = (corrected / injected * 100).clip(upper=100).where(injected != 0, 100.0)
+    return df
+
+
+def loadSummaries(summaryFile, session_id=None, participant_id=None, task_type=None):
+    df = normalizeAccuracy(pd.read_csv(summaryFile, parse_dates=["Timestamp"]))
+    for column, value in (("session_id", session_id), ("participant_id", participant_id), ("task_type", task_type)):
+        if value is not None:
+            df = df[df[column] == value]
+    return df
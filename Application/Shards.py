@@ -0,0 +1,159 @@
+import os, sys, json, socket, shutil, argparse
+import pandas as pd
+
+from IDLedger import fileLock, idNumber
+
+
+# Per process result shards.
+# With sharding on, every session of every running windowRender.py writes its own metrics.csv / events.csv in
+#   Results/shards/<host>_<pid>_<session>/
+# so several stations can share one Results folder (or network drive) without appending to the same file.
+# A shard is marked complete once its session has ended. mergeShards() appends complete shards to the
+# canonical Results/metrics.csv, events.csv, summary.csv and clocksync.csv and removes them.
+# Before appending a shard the merge writes where every canonical file ended to the shard's "merging" file, and
+# "merged" once all of it is in. A merge that was killed half way is cut back to those ends and done again the
+# next time, one that got as far as "merged" only has the shard left to remove.
+
+SHARD_DIR = "shards"
+COMPLETE_MARKER = "complete"
+MERGING_JOURNAL = "merging"
+MERGED_MARKER = "merged"
+MERGE_LOCK = "merge.lock"
+
+
+def shardName(sessionID):
+    host = "".join(c if c.isalnum() or c == "-" else "-" for c in socket.gethostname()) or "host"
+    return host + "_" + str(os.getpid()) + "_" + sessionID
+
+
+def shardDirectory(resultsDir, sessionID):
+    return os.path.join(resultsDir, SHARD_DIR, shardName(sessionID))
+
+
+def markComplete(shardDir):
+    if os.path.isdir(shardDir):
+        open(os.path.join(shardDir, COMPLETE_MARKER), "w").close()
+
+
+def isComplete(shardDir):
+    return os.path.exists(os.path.join(shardDir, COMPLETE_MARKER))
+
+
+# Session ID of a shard directory, from its name
+def shardSession(name):
+    return name.rsplit("_", 1)[-1]
+
+
+# Shard directories sorted by session. Only directory names are read.
+def listShards(resultsDir):
+    root = os.path.join(resultsDir, SHARD_DIR)
+    if not os.path.isdir(root):
+        return []
+    names = [n for n in os.listdir(root) if os.path.isdir(os.path.join(root, n))]
+    names.sort(key=lambda n: (idNumber(shardSession(n)), n))
+    return [os.path.join(root, n) for n in names]
+
+
+# Highest session ID any shard has been given, or None
+def latestShardSession(resultsDir):
+    shards = listShards(resultsDir)
+    if not shards:
+        return None
+    return shardSession(os.path.basename(shards[-1]))
+
+
+def _headerLength(location):
+    with open(location, "rb") as f:
+        return len(f.readline())
+
+
+# Canonical file -> (size, header length) before a shard is appended to it
+def _writeJournal(shardDir, ends):
+    tmp = os.path.join(shardDir, MERGING_JOURNAL + ".tmp")
+    with open(tmp, "w", encoding="utf8") as f:
+        json.dump(ends, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(shardDir, MERGING_JOURNAL))
+
+
+# Takes the canonical files back to where they ended before an earlier, unfinished merge of this shard
+def _rollBack(shardDir):
+    journal = os.path.join(shardDir, MERGING_JOURNAL)
+    if not os.path.exists(journal):
+        return
+    with open(journal, "r", encoding="utf8") as f:
+        ends = json.load(f)
+    for target, (size, header) in ends.items():
+        if not os.path.exists(target):
+            continue
+        # The header may have been upgraded since, everything after it moved with it
+        size += _headerLength(target) - header
+        if os.path.getsize(target) > size:
+            print("[Shards] Removing rows of an unfinished merge of " + os.path.basename(shardDir) + " from " + target)
+            with open(target, "r+b") as f:
+                f.truncate(size)
+    os.remove(journal)
+
+
+# Appends shards to the canonical files and deletes them.
+# tables maps file name -> columns, e.g. {"metrics.csv": METRIC_COLUMNS, "events.csv": EVENT_COLUMNS}.
+# Shards still being written are skipped unless includeIncomplete is set (for stations that crashed).
+def mergeShards(resultsDir, tables, includeIncomplete=False, chunksize=100000):
+    # Header upgrades live with the rest of the results file handling
+    from DataCollection import upgradeHeader
+
+    merged = {name: 0 for name in tables}
+    mergedShards = []
+    with fileLock(os.path.join(resultsDir, MERGE_LOCK)):
+        for shardDir in listShards(resultsDir):
+            if not includeIncomplete and not isComplete(shardDir):
+                continue
+            # All in already, only the removal didn't finish
+            if os.path.exists(os.path.join(shardDir, MERGED_MARKER)):
+                shutil.rmtree(shardDir, ignore_errors=True)
+                continue
+            _rollBack(shardDir)
+
+            sources = {}
+            for name, columns in tables.items():
+                source = os.path.join(shardDir, name)
+                if not os.path.exists(source):
+                    continue
+                target = os.path.join(resultsDir, name)
+                if os.path.exists(target):
+                    upgradeHeader(target, columns)
+                else:
+                    pd.DataFrame(columns=columns).to_csv(target, header=True, index=False)
+                sources[name] = (source, target)
+            _writeJournal(shardDir, {target: (os.path.getsize(target), _headerLength(target)) for source, target in sources.values()})
+
+            for name, (source, target) in sources.items():
+                columns = tables[name]
+                # Kept as text so values go back out exactly as the shard had them
+                for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False):
+                    chunk.reindex(columns=columns).to_csv(target, mode="a", header=False, index=False)
+                    merged[name] += len(chunk)
+
+            open(os.path.join(shardDir, MERGED_MARKER), "w").close()
+            shutil.rmtree(shardDir, ignore_errors=True)
+            mergedShards.append(os.path.basename(shardDir))
+
+    merged["shards"] = mergedShards
+    return merged
+
+
+if __name__ == "__main__":
+    # python Shards.py [--all]  ->  merges complete shards into Results/metrics.csv and events.csv
+    from DataCollection import METRIC_COLUMNS, EVENT_COLUMNS
+    from SessionSummary import SUMMARY_COLUMNS
+    from ClockSync import CLOCKSYNC_COLUMNS
+
+    parser = argparse.ArgumentParser(description="Merge per process result shards into the canonical results files")
+    parser.add_argument("--results", default=os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results"))
+    parser.add_argument("--all", action="store_true", help="also merge shards that were never marked complete")
+    args = parser.parse_args()
+
+    result = mergeShards(args.results, {"metrics.csv": METRIC_COLUMNS, "events.csv": EVENT_COLUMNS, "summary.csv": SUMMARY_COLUMNS, "clocksync.csv": CLOCKSYNC_COLUMNS}, args.all)
+    print("Merged " + str(len(result["shards"])) + " shards: " + str(result["metrics.csv"]) + " metric rows, "
+          + str(result["events.csv"]) + " event rows")
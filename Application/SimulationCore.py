@@ -0,0 +1,1566 @@
+import json, time, heapq, itertools, random, argparse
+
+import Timebase
+from Task import Task
+from EventRecords import taskEvent, eventCode
+import EventBus
+
+
+# The task state machines without Qt: conveyor motion, spawning, advBoxQueue, error injection and corrections
+# for all three tasks, on plain items (simItem) and on timers from a clock object instead of QTimers.
+#   qtClock (TaskRender.py)  real QTimers, what the task windows run on. The windows only draw the items.
+#   virtualClock             simulated time, stepped as fast as the machine goes or at any rate (rate=1000 is
+#                            1000x real time). Timebase stamps come from it while a simulation runs, so the
+#                            events, metrics and summaries are the same as a live session of that length.
+#   python SimulationCore.py --scenario Scenarios/Baseline_Dual_Task.json --duration 3600 --seed 1
+#
+# Anything the windows show goes through a view (nullView headless): items added/removed/changed, labels,
+# the button state and the flashing light. Random draws come from 'rng' (the random module if None), so a
+# seeded run repeats exactly.
+
+TICK_MS = 50
+DISTRACTION_MS = 500
+# ocs_ui defaults: collection interval and the first resolution in the list
+COLLECTION_INTERVAL_MS = 1000
+RESOLUTION = (2560, 1300)
+
+# Brush colours, 0xAARRGGBB
+BOX_COLOURS = {"red": 0xFFFF0000, "green": 0xFF00FF00, "blue": 0xFF0000FF}
+PACKAGE_COLOUR = 0xFFFFFE00
+ITEM_COLOUR = 0xFFC8C8C8
+PASS_COLOUR = 0xFF00FF00
+FAIL_COLOUR = 0xFFFF0000
+
+
+#--------------------------------
+# Clocks
+#--------------------------------
+class _signal:
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def emit(self):
+        for slot in tuple(self._slots):
+            slot()
+
+
+# The part of QTimer the tasks use: timeout.connect(), start(ms), stop(), isActive()
+class virtualTimer:
+    def __init__(self, clock):
+        self.clock = clock
+        self.timeout = _signal()
+        self._interval = 0
+        self._active = False
+        # Bumped on every start/stop, so ticks that were already queued are skipped
+        self._generation = 0
+
+    def start(self, msec=None):
+        if msec is not None:
+            self._interval = msec
+        self._generation += 1
+        self._active = True
+        self.clock.schedule(max(self._interval, 1), self._fire, self._generation)
+
+    def stop(self):
+        self._generation += 1
+        self._active = False
+
+    def isActive(self):
+        return self._active
+
+    def interval(self):
+        return self._interval
+
+    def _fire(self, generation):
+        if generation != self._generation:
+            return
+        self.clock.schedule(max(self._interval, 1), self._fire, generation)
+        self.timeout.emit()
+
+
+class virtualClock:
+    def __init__(self, start_ns=None):
+        # Starts where the monotonic counter is, so stamps look like the ones a live session writes
+        self.now_ns = time.perf_counter_ns() if start_ns is None else start_ns
+        self._queue = []
+        self._order = itertools.count()
+
+    # For Timebase.useClock()
+    def stamp(self):
+        return self.now_ns
+
+    def timer(self):
+        return virtualTimer(self)
+
+    def singleShot(self, msec, callback):
+        self.schedule(msec, callback)
+
+    # Calls callback(*args) 'msec' from now. Callbacks due at the same time run in the order they were scheduled.
+    def schedule(self, msec, callback, *args):
+        heapq.heappush(self._queue, (self.now_ns + int(msec * 1_000_000), next(self._order), callback, args))
+
+    # Runs everything due in the next 'msec'
+    def advance(self, msec):
+        end = self.now_ns + int(msec * 1_000_000)
+        while self._queue and self._queue[0][0] <= end:
+            due, _, callback, args = heapq.heappop(self._queue)
+            self.now_ns = due
+            callback(*args)
+        self.now_ns = end
+
+    # 'seconds' of simulated time. rate=None goes as fast as it can, otherwise rate x real time.
+    def run(self, seconds, rate=None, stepMs=TICK_MS):
+        end = self.now_ns + int(seconds * 1e9)
+        origin = self.now_ns
+        started = time.perf_counter()
+        while self.now_ns < end:
+            self.advance(min(stepMs, (end - self.now_ns) / 1_000_000))
+            if rate:
+                ahead = (self.now_ns - origin) / 1e9 / rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+#--------------------------------
+# Items and views
+#--------------------------------
+# A box/item on a conveyor, with the x()/y()/setX()/setY() of the QGraphicsRectItem it is drawn as
+class simItem:
+    def __init__(self, width, height, colour):
+        self.width = width
+        self.height = height
+        self.colour = colour
+        # Items packed into it (packaging), the measured size (inspection)
+        self.count = 0
+        self.size = None
+        self.removed = False
+        self._x = 0.0
+        self._y = 0.0
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+    def setX(self, x):
+        self._x = float(x)
+
+    def setY(self, y):
+        self._y = float(y)
+
+    def setPos(self, x, y):
+        self._x = float(x)
+        self._y = float(y)
+
+
+class nullView:
+    def itemAdded(self, item):
+        pass
+
+    def itemRemoved(self, item):
+        pass
+
+    # Colour or count of an item changed
+    def itemChanged(self, item):
+        pass
+
+    def defineLabel(self, label, text, newColour=None):
+        pass
+
+    def setButtonState(self, enabled):
+        pass
+
+    def distractionFlash(self, visible):
+        pass
+
+
+# Scene sizes every task window works out from its minimum size
+class _conveyorGeometry:
+    def __init__(self, minWidth, minHeight):
+        self.minHeight = minHeight
+        self.minWidth = minWidth
+        self.sceneHeight = int(minHeight / 2)
+        self.sceneWidth = minWidth
+        self.conveyorHeight = int(self.sceneHeight / 4)
+        self.conveyorTopLocation = int(self.sceneHeight / 2 + self.sceneHeight / 6)
+        self.boxHeight = int(self.conveyorHeight / 2)
+        # For reference, self.sceneWidth / 2 - self.boxHeight/ 2 is the centre of the screen
+        self.centreScreenBox = int(self.sceneWidth /2 - self.boxHeight/2) - + self.boxHeight * 1.15 / 16
+
+
+#================================
+# Sorting
+#================================
+class sortingSim(Task):
+    def __init__(self, errorRateVal, speed, numColours, distractions, resolutionW, resolutionH, dataCollector, clock, rng=None):
+        self._errorRate = errorRateVal
+        self._speed = speed
+        self.numColours = numColours
+        self.clock = clock
+        self.random = rng or random
+
+        self.beeperEnabled = False
+        self.flashLightEnabled = False
+
+        for i in distractions:
+            if i == 'sound':
+                self.beeperEnabled = True
+            if i == 'light':
+                self.flashLightEnabled = True
+
+        # Everything the task does is published on the data collector's bus
+        self.bus = dataCollector.bus
+        self.bus.publish(EventBus.TASK_STARTED, "sorting")
+
+        self.boxList = []
+
+        self.programState = 0
+        self.previousState = 0
+
+        # Sorting Task Specific
+        self.error = 0
+        self.fulfilledBoxes = 0
+        self.totalError = 0
+        self.successfulCorrections = 0
+        # One for each bin since multiple bins can have an error in them
+            # RED, GREEN, BLUE
+        self.responseTimer = [0,0,0]
+
+        self.errorBox = None
+        self.correctBox = None
+
+        self.window = sortingSimWindow(resolutionW, resolutionH, self, self.numColours, clock)
+        self.window.speed = self._speed
+
+        # Prevents the creation of a kill timer if one exists
+        self.killTimerExists = False
+
+        self.distractionTimer = None
+        if self.flashLightEnabled or self.beeperEnabled:
+            self.distractionTimer = clock.timer()
+            self.distractionTimer.timeout.connect(self.doDistraction)
+
+    # The Qt task plays the beep
+    def playBeep(self):
+        pass
+
+    def doDistraction(self):
+        if self.random.uniform(0.0,1.0) > 0.75:
+            if self.beeperEnabled:
+                self.playBeep()
+                self.bus.publish(EventBus.DISTRACTION, "sorting", "beep")
+            if self.flashLightEnabled:
+                self.window.distractionFlash()
+                self.bus.publish(EventBus.DISTRACTION, "sorting", "flash")
+                self.clock.singleShot(500, self.window.distractionFlash)
+
+    #----------------
+    # Data Collection
+    #----------------
+    def returnData(self):
+        return [self.error, self.fulfilledBoxes, self.totalError, self.successfulCorrections]
+
+    def recordResponseTime(self, colour):
+        self.bus.publish(EventBus.RESPONSE_TIME, "sorting", colour)
+
+    #===================
+    # Task Functionality
+    #-------------------
+    def createNewBox(self):
+        colour = self.getRandomColour()
+        self.boxList.append(colour)
+        self.window.animState = 0
+        self.window.renderNewBox(colour)
+
+    def advBoxQueue(self):
+        boxLocation = self.boxList[0]
+
+        # Checks for an error
+        if self.causeError():
+
+            self.error += 1
+            self.totalError += 1
+            self.bus.publish(EventBus.ERROR_INJECTED, "sorting")
+            match self.boxList[0]:
+                case "red":
+
+                    if self.numColours == 3:
+                        if self.random.uniform(0.0, 1.0) >= 0.5:
+                            boxLocation = 'blue'
+                        else:
+                            boxLocation = 'green'
+                    else:
+                        boxLocation = 'blue'
+
+                case "blue":
+                    if self.numColours == 3:
+                        if self.random.uniform(0.0, 1.0) >= 0.5:
+                            boxLocation = 'red'
+                        else:
+                            boxLocation = 'green'
+                    else:
+                        boxLocation = 'red'
+
+                case "green":
+                    if self.random.uniform(0.0, 1.0) >= 0.5:
+                        boxLocation = 'blue'
+                    else:
+                        boxLocation = 'red'
+            self.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_MISSORTED, expectedBin=self.boxList[0], actualBin=boxLocation))
+        self.window.checkSortBox(boxLocation, self.boxList[0])
+        self.window.animState = 1
+
+    def startTask(self):
+        for i in range(1):
+            self.createNewBox()
+
+        self.window.startStuff(self._speed)
+        if self.distractionTimer is not None:
+            self.distractionTimer.start(DISTRACTION_MS)
+
+    def pause(self):
+        self.window.animTimer.stop()
+        if self.distractionTimer is not None:
+            self.distractionTimer.stop()
+
+    def resume(self):
+        self.window.animTimer.start(TICK_MS)
+        if self.distractionTimer is not None:
+            self.distractionTimer.start(DISTRACTION_MS)
+
+    def popBox(self):
+        self.boxList.pop(0)
+
+    def getRandomColour(self):
+
+        if self.numColours == 3:
+            caseNum = self.random.randint(0, 2)
+        else:
+            caseNum = self.random.randint(0,1)
+
+        match caseNum:
+            case 0:
+                return 'red'
+            case 1:
+                return 'blue'
+            case 2:
+                return 'green'
+            case _:
+                return 'blue'
+
+    def defineErrorBox(self, boxColour):
+        self.errorBox = boxColour
+        self.window.defineLabel("error", boxColour.title(), boxColour)
+
+        if self.correctBox is not None:
+            self.correctionInterrupt()
+
+    def defineCorrectionBox(self, boxColour):
+        self.correctBox = boxColour
+        self.window.defineLabel("corrected", boxColour.title(), boxColour)
+
+        if self.errorBox is not None:
+            self.correctionInterrupt()
+
+    def correctionInterrupt(self):
+        if self.correctBox == self.errorBox:
+            # Error or beep will go here.
+            self.cleanInterruptValues()
+            self.window.defineLabel("warning","A box is not correctly sorted if it is in it's appropriate coloured box. Selections annulled")
+            # Timer that kills itself after a second
+            if not self.killTimerExists:
+                self.clock.singleShot(1500, self.cleanWarning)
+                self.killTimerExists = True
+            return
+
+        if not self.window.interrupt:
+            self.window.errorColour = self.errorBox
+            self.window.correctedColour = self.correctBox
+            self.window.interrupt = True
+
+    def cleanInterruptValues(self):
+        self.errorBox = None
+        self.correctBox = None
+        self.window.defineLabel("error", "", "black")
+        self.window.defineLabel("corrected", "", "black")
+
+    def cleanWarning(self):
+        self.window.defineLabel("warning", "")
+        self.killTimerExists = False
+
+    def causeError(self):
+        # Does this work? Does this make sense, I'll never tell~
+        error = self._errorRate + self.random.uniform(-0.05, 0.05) >= self.random.uniform(0.0,1.0)
+        if error:
+            return True
+        else:
+            return False
+
+
+class sortingSimWindow(_conveyorGeometry):
+    def __init__(self, minWidth, minHeight, taskParent, numColours, clock, view=None):
+        super().__init__(minWidth, minHeight)
+        self.taskParent = taskParent
+        self.numColours = numColours
+        self.view = view or nullView()
+
+        centreScreenBox = self.centreScreenBox
+        # We only use [colour]X values to set targets, so we had an offset here to make sure the box appears in the centre of the box
+        self.redBinX = centreScreenBox + int(centreScreenBox / 2)
+        self.blueBinX = centreScreenBox - int(centreScreenBox / 2)
+        self.redX = int(centreScreenBox + int(centreScreenBox / 2)) + self.boxHeight * 1.15 / 15
+        self.blueX = int(centreScreenBox - int(centreScreenBox / 2))  + self.boxHeight * 1.15 / 15
+        self.greenX = centreScreenBox
+        self.binY = float(int(self.conveyorHeight))
+
+        # Move to Box varaibles
+        # Target is the target x/y for comparison
+        # add x/y is the same as distToHalfway
+        self.targetX = 0
+        self.targetY = self.conveyorHeight + int(self.boxHeight * 1.15) / 15
+        self.addX = 0
+        self.addY = 0
+
+        self.boxArray = []
+        # 'Stored' box, current box that is in the box pos.
+        self.blueSB = None
+        self.blueSBCol = None
+        self.greenSB = None
+        self.greenSBCol = None
+        self.redSB = None
+        self.redSBCol = None
+        self.toDestroyBox = None
+        self.heldBox = None
+
+        # Anim State:
+            # 0 = Move box along line
+            # 1 = Move Arm to box position
+            # 2 = Move Arm to appropriate box
+            # 3 = General interrupt if needed
+        self.animState = 0
+        self.animTimer = clock.timer()
+        self.animTimer.timeout.connect(self.doAnimationStep)
+
+        self.distToHalfway = 0
+        self.priorState = None
+        self.interrupt = False
+        self.errorColour = None
+        self.correctedColour = None
+        self.speed = None
+
+        self.toDeleteBinCol = None
+        self.errorBins = []
+
+        self.recordingResponseTime = False
+
+        # What the window shows, kept here so a headless run can read it too
+        self.labels = {"error": "", "corrected": "", "warning": ""}
+        self.buttonsEnabled = True
+        self.lightOn = False
+
+    def startStuff(self, speed):
+        self.animTimer.start(TICK_MS)
+
+        # Calculates the dist per step required to get to the halfway point for the arm
+            # (Width / 2 ) / ( Total Steps )
+                # (Width / 2) / (speed / timestep [50])
+        self.distToHalfway = (self.sceneWidth /2 - self.boxHeight/2)  / (speed / 50)
+
+    def defineLabel(self, label, text, newColour = None):
+        self.labels[label] = text
+        self.view.defineLabel(label, text, newColour)
+
+    def distractionFlash(self):
+        self.lightOn = not self.lightOn
+        self.view.distractionFlash(self.lightOn)
+
+    def renderNewBox(self, colour):
+        tempItem = simItem(self.boxHeight, self.boxHeight, BOX_COLOURS[colour])
+        tempItem.setY(self.conveyorTopLocation + self.conveyorHeight / 4)
+        self.boxArray.append(tempItem)
+        self.view.itemAdded(tempItem)
+
+    def moveBox(self, disToMovePerMil):
+        for box in self.boxArray:
+            box.setX(box.x() + disToMovePerMil)
+
+        # Changes state once the box at the front of the conveyor reaches the halfway point
+        if(self.boxArray[0].x() >= self.sceneWidth /2 - self.boxHeight/2):
+            if not self.interrupt:
+                self.taskParent.advBoxQueue()
+            else:
+                self.animState = 2
+                self.priorState = 1
+                self.correctBox(self.errorColour, self.correctedColour)
+
+    def doAnimationStep(self):
+        if self.recordingResponseTime:
+            if "green" in self.errorBins:
+                self.taskParent.responseTimer[1] += 50
+            if "blue" in self.errorBins:
+                self.taskParent.responseTimer[2] += 50
+            if "red" in self.errorBins:
+                self.taskParent.responseTimer[0] += 50
+
+        match self.animState:
+            case 0:
+                self.moveBox(self.distToHalfway)
+            case 1:
+                self.moveToTarget()
+            case 2:
+                self.animCorrectBox()
+
+    def setButtonState(self, enabled):
+        self.buttonsEnabled = enabled
+        self.view.setButtonState(enabled)
+
+    def moveToTarget(self):
+        if self.targetX == self.redX and self.heldBox.x() + self.addX > self.targetX  :
+            self.addX = self.targetX - self.heldBox.x()
+        elif self.targetX == self.blueX and self.heldBox.x() + self.addX < self.targetX:
+            self.addX = self.targetX - self.heldBox.x()
+
+
+        if self.heldBox.y() - self.addY < self.targetY:
+            self.addY =  self.heldBox.y() - self.targetY
+
+
+        # Sets the X/Y values to an incremement of their previous state
+        self.heldBox.setX(self.heldBox.x() + self.addX)
+        self.heldBox.setY(self.heldBox.y() - self.addY)
+
+        if self.heldBox.y() <= self.targetY and abs(self.heldBox.x()) >= self.targetX or self.targetX == self.blueX and self.heldBox.y() <= self.targetY and self.heldBox.x() <= self.targetX:
+
+            # If we are not in the interrupt state then move to state 0
+            if not self.interrupt:
+                self.taskParent.createNewBox()
+                self.boxArray.pop(0)
+                self.taskParent.popBox()
+
+            # If we are in the interrupt state and we have no recorded prior state (AKA, the interrupt hasn't finished)
+            elif self.interrupt == True:
+                self.animState = 2
+                self.correctBox(self.errorColour, self.correctedColour)
+                self.priorState = 0
+                self.boxArray.pop(0)
+                self.taskParent.popBox()
+
+            # Remove boxes that are hidden or not needed
+            if self.toDestroyBox is not None:
+                if self.toDeleteBinCol in self.errorBins:
+                    if self.toDeleteBinCol == "green":
+                        self.taskParent.responseTimer[1] = 0
+                    if self.toDeleteBinCol == "red":
+                        self.taskParent.responseTimer[0] = 0
+                    if self.toDeleteBinCol == "blue":
+                        self.taskParent.responseTimer[2] = 0
+
+                    self.errorBins.remove(self.toDeleteBinCol)
+                self.toDestroyBox.removed = True
+                self.view.itemRemoved(self.toDestroyBox)
+                self.toDestroyBox = None
+            self.taskParent.fulfilledBoxes += 1
+            self.taskParent.bus.publish(EventBus.BOX_PROCESSED, "sorting")
+
+    def animCorrectBox(self):
+        if self.errorColour is None or self.correctedColour is None:
+            self.cleanInterruptState()
+            return
+
+        # Encountered some issue with setting and equalting the position of certain box combos, this is a quick fix for this
+        # I'm dead sure its a floating point issue which its why its called that, but if it isnt ah hehe hoho
+        floatingPointErrorSolve = False
+
+        if self.targetX == self.redX and self.heldBox.x() + self.addX > self.targetX or self.targetX == self.greenX and self.errorColour == "blue" and self.heldBox.x() + self.addX > self.targetX:
+            self.addX = self.targetX - self.heldBox.x()
+        elif self.targetX == self.blueX and self.heldBox.x() + self.addX < self.targetX or self.targetX == self.greenX and self.errorColour == "red" and self.heldBox.x() + self.addX < self.targetX:
+            self.addX = self.targetX - self.heldBox.x()
+
+        if int(self.targetX) == int(self.heldBox.x()):
+            floatingPointErrorSolve = True
+            self.heldBox.setX(self.targetX)
+            self.addX = 0
+
+        self.heldBox.setX(self.heldBox.x() + self.addX)
+
+        if self.heldBox.x() == self.targetX or floatingPointErrorSolve:
+            if self.priorState == 1:
+                self.taskParent.advBoxQueue()
+            elif self.priorState == 0:
+                self.taskParent.createNewBox()
+
+            self.priorState = None
+            self.interrupt = False
+
+            self.errorColour = None
+            self.correctColour = None
+            self.taskParent.cleanInterruptValues()
+            self.taskParent.successfulCorrections += 1
+            self.taskParent.error -= 1
+            self.taskParent.bus.publish(EventBus.CORRECTION, "sorting")
+
+            self.setButtonState(True)
+
+    def cleanInterruptState(self):
+        if self.priorState == 1:
+                self.taskParent.advBoxQueue()
+        elif self.priorState == 0:
+                self.taskParent.createNewBox()
+
+        self.priorState = None
+        self.interrupt = False
+
+        self.errorColour = None
+        self.correctColour = None
+        self.taskParent.cleanInterruptValues()
+
+    def correctBox(self, currentBox, newBox):
+        # Probably better way to do this but w/e it's done only once so we can be slightly more inefficient
+        if self.errorColour is None or self.correctedColour is None:
+            self.cleanInterruptState()
+            return
+
+        match currentBox:
+            case "red":
+                # If currentBox already has the actual right colour in it (E.G red box in red box). Stop everything and give warning
+                if currentBox == self.redSBCol:
+                    self.defineLabel("warning", "No Error present in red box. This can occur if the box is in the process of being replaced by a new box")
+                    self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_NO_ERROR_IN_BIN, actualBin=currentBox))
+                    self.cleanInterruptState()
+                    return
+                if newBox != self.redSBCol:
+                    self.defineLabel("warning", "Cannot create an error. This error can also occur if the box is in the process of being replaced by a new box.")
+                    self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_WOULD_CREATE_ERROR, expectedBin=newBox, actualBin=currentBox))
+                    self.cleanInterruptState()
+                    return
+
+                self.heldBox = self.redSB
+                self.redSB = None
+            case "green":
+                if currentBox == self.greenSBCol:
+                    self.defineLabel("warning", "No Error present in green box. This can occur if the box is in the process of being replaced by a new box")
+                    self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_NO_ERROR_IN_BIN, actualBin=currentBox))
+                    self.cleanInterruptState()
+                    return
+                if newBox != self.greenSBCol:
+                    self.defineLabel("warning", "Cannot create an error. This error can also occur if the box is in the process of being replaced by a new box.")
+                    self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_WOULD_CREATE_ERROR, expectedBin=newBox, actualBin=currentBox))
+                    self.cleanInterruptState()
+                    return
+                self.heldBox = self.greenSB
+                self.greenSB = None
+            case "blue":
+                if currentBox == self.blueSBCol:
+                    self.defineLabel("warning", "No Error present in blue box. This can occur if the box is in the process of being replaced by a new box")
+                    self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_NO_ERROR_IN_BIN, actualBin=currentBox))
+                    self.cleanInterruptState()
+                    return
+                if newBox != self.blueSBCol:
+                    self.defineLabel("warning", "Cannot create an error. This error can also occur if the box is in the process of being replaced by a new box.")
+                    self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_WOULD_CREATE_ERROR, expectedBin=newBox, actualBin=currentBox))
+                    self.cleanInterruptState()
+                    return
+                self.heldBox = self.blueSB
+                self.blueSB =  None
+
+        # The box that was in the bin has already been moved out by an earlier correction, nothing to pick up.
+        # After the checks above so everything they caught is logged as before.
+        if self.heldBox is None:
+            self.defineLabel("warning", "No Error present in " + currentBox + " box. This can occur if the box is in the process of being replaced by a new box")
+            self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_NO_ERROR_IN_BIN, actualBin=currentBox))
+            self.cleanInterruptState()
+            return
+
+        match newBox:
+            case "red":
+                self.targetX = self.redX
+                if self.redSB is not None:
+                    self.toDestroyBox = self.redSB
+                    self.toDeleteBinCol = 'red'
+                self.redSB = self.heldBox
+            case "green":
+                self.targetX = self.greenX
+                if self.greenSB is not None:
+                    self.toDestroyBox = self.greenSB
+                    self.toDeleteBinCol = 'green'
+                self.greenSB = self.heldBox
+            case "blue":
+                self.targetX = self.blueX
+                if self.blueSB is not None:
+                    self.toDestroyBox = self.blueSB
+                    self.toDeleteBinCol = 'blue'
+                self.blueSB = self.heldBox
+
+        # If stuff gets here, we have no errors, so we can disable buttons
+        self.setButtonState(False)
+        binIndex = {"red": 0, "green": 1, "blue": 2}[currentBox]
+        self.taskParent.bus.publish(EventBus.TASK_EVENT, "sorting", taskEvent(eventCode.SORT_CORRECTED, expectedBin=newBox, actualBin=currentBox, responseMs=self.taskParent.responseTimer[binIndex]))
+
+        if "blue" == currentBox:
+                self.taskParent.recordResponseTime(self.taskParent.responseTimer[2])
+                if 'blue' in self.errorBins:
+                    self.errorBins.remove('blue')
+
+        if "red" == currentBox:
+                self.taskParent.recordResponseTime(self.taskParent.responseTimer[0])
+                if 'red' in self.errorBins:
+                    self.errorBins.remove('red')
+
+        if "green" == currentBox:
+                self.taskParent.recordResponseTime(self.taskParent.responseTimer[1])
+                if 'green' in self.errorBins:
+                    self.errorBins.remove('green')
+
+        # Mainly placeholder until I can bother to work on proper animations. Animation in this stuff is difficult so Functionality Over Form for now
+        # AddY is 0 since we're moving from a box to box and theyre all on the same Y
+        self.addX = int(((self.targetX - self.heldBox.x())) / (self.speed / 50))
+        self.addY = 0
+
+    def checkSortBox(self, colour, boxRealColour):
+        match(colour):
+            case "blue":
+                self.targetX = self.blueX
+
+                if self.blueSB is not None:
+                    self.toDestroyBox = self.blueSB
+                    self.toDeleteBinCol = "blue"
+                    self.blueSB = None
+
+                self.blueSB = self.boxArray[0]
+                self.blueSBCol = boxRealColour
+
+            case "red":
+                self.targetX = self.redX
+
+                if self.redSB is not None:
+                    self.toDestroyBox = self.redSB
+                    self.toDeleteBinCol = "red"
+                    self.redSB = None
+
+                self.redSB = self.boxArray[0]
+                self.redSBCol = boxRealColour
+
+            case "green":
+                self.targetX = self.greenX
+
+                if self.greenSB is not None:
+                    self.toDestroyBox = self.greenSB
+                    self.toDeleteBinCol = "green"
+                    self.greenSB = None
+
+                self.greenSB = self.boxArray[0]
+                self.greenSBCol = boxRealColour
+
+        if colour != boxRealColour:
+            self.errorBins.append(colour)
+
+            self.recordingResponseTime = True
+
+        self.heldBox = self.boxArray[0]
+        self.addX = int(((self.targetX - int(self.sceneWidth / 2 - self.boxHeight / 2))) / (self.speed / 50))
+        self.addY = int(((self.conveyorTopLocation + self.conveyorHeight / 4) - self.targetY)  / (self.speed / 50))
+
+
+#================================
+# Packaging
+#================================
+class packagingSim(Task):
+    def __init__(self, errorRateVal, speed, itemCount, distractions, resolutionW, resolutionH, dataCollector, clock, rng=None):
+        self._errorRate = errorRateVal
+        self._speed = speed
+        self.clock = clock
+        self.random = rng or random
+
+        self.beeperEnabled = distractions[1]
+        self.flashLightEnabled = distractions[0]
+
+        self.boxList = []
+
+        self.programState = 0
+        self.previousState = 0
+
+        # Sorting Task Specific
+        self.error = 0
+        self.totalError = 0
+        self.fulfilledPackages = 0
+        self.successfulCorrections = 0
+        self.responseTimer = 0
+        self.itemCount = itemCount
+
+        # Everything the task does is published on the data collector's bus
+        self.bus = dataCollector.bus
+        self.bus.publish(EventBus.TASK_STARTED, "packaging")
+
+        self.window = packagingSimWindow(resolutionW, resolutionH, self, self.itemCount, clock)
+        self.window.speed = self._speed
+
+        self.distractionTimer = None
+        if self.flashLightEnabled or self.beeperEnabled:
+            self.distractionTimer = clock.timer()
+            self.distractionTimer.timeout.connect(self.doDistraction)
+
+    # The Qt task plays the beep
+    def playBeep(self):
+        pass
+
+    def createNewBox(self):
+        self.window.animState = 0
+        self.window.renderNewBox()
+
+    def doDistraction(self):
+        if self.random.uniform(0.0,1.0) > 0.75:
+            if self.beeperEnabled:
+                self.playBeep()
+                self.bus.publish(EventBus.DISTRACTION, "packaging", "beep")
+            if self.flashLightEnabled:
+                self.window.distractionFlash()
+                self.bus.publish(EventBus.DISTRACTION, "packaging", "flash")
+                self.clock.singleShot(500, self.window.distractionFlash)
+
+    def returnData(self):
+        return [self.error, self.fulfilledPackages, self.totalError, self.successfulCorrections]
+
+    def recordResponseTime(self):
+        self.bus.publish(EventBus.RESPONSE_TIME, "packaging", self.responseTimer)
+        self.responseTimer = 0
+
+    def advBoxQueue(self):
+        # Checks for an error
+        boxNum = self.itemCount
+        if self.causeError():
+            self.error += 1
+            self.totalError += 1
+            self.bus.publish(EventBus.ERROR_INJECTED, "packaging")
+            self.window.recordingResponseTime = True
+            boxNum = boxNum + self.decideNegative()
+            self.bus.publish(EventBus.TASK_EVENT, "packaging", taskEvent(eventCode.PACK_MISCOUNTED, itemCount=boxNum, expectedCount=self.itemCount))
+        self.boxList.append(boxNum)
+
+        self.window.animState = 1
+
+    def startTask(self):
+
+        for i in range(1):
+            self.createNewBox()
+
+        self.window.startStuff(self._speed)
+        if self.distractionTimer is not None:
+            self.distractionTimer.start(DISTRACTION_MS)
+
+    def decideNegative(self):
+        if self.random.uniform(0.0,1.0) > 0.5:
+            return 1
+        else:
+            return -1
+
+    def popBox(self):
+        self.boxList.pop(0)
+
+    def pause(self):
+        self.window.animTimer.stop()
+        if self.distractionTimer is not None:
+            self.distractionTimer.stop()
+
+    def resume(self):
+        self.window.startStuff(self._speed)
+        if self.distractionTimer is not None:
+            self.distractionTimer.start(DISTRACTION_MS)
+
+    def causeError(self):
+        # Does this work? Does this make sense, I'll never tell~
+        error = self._errorRate + self.random.uniform(-0.05, 0.05) >= self.random.uniform(0.0,1.0)
+        if error:
+            return True
+        else:
+            return False
+
+
+class packagingSimWindow(_conveyorGeometry):
+    def __init__(self, minWidth, minHeight, taskParent, itemCount, clock, view=None):
+        super().__init__(minWidth, minHeight)
+        self.taskParent = taskParent
+        self.view = view or nullView()
+
+        # Move to Box varaibles
+        # Target is the target x/y for comparison
+        # add x/y is the same as distToHalfway
+        self.targetX = 0
+        self.targetY = self.conveyorHeight + int(self.boxHeight * 1.15) / 15
+        self.addX = 0
+        self.addY = 0
+
+        # Anim State:
+            # 0 = Move box along line
+            # 1 = Move Arm to box position
+            # 2 = Move Arm to appropriate box
+            # 3 = General interrupt if needed
+        self.animState = 0
+        self.animTimer = clock.timer()
+        self.animTimer.timeout.connect(self.doAnimationStep)
+
+        self.filledArray = []
+        self.unfilledArray = []
+
+        self.distToHalfway = 0
+        self.priorState = None
+        self.interrupt = False
+        self.speed = None
+        self.spawnTimer = 0
+
+        self.recordingResponseTime = False
+        self.lightOn = False
+
+    def startStuff(self, speed):
+        self.animTimer.start(TICK_MS)
+
+        # Calculates the dist per step required to get to the halfway point for the arm
+            # (Width / 2 ) / ( Total Steps )
+                # (Width / 2) / (speed / timestep [50])
+        self.distToHalfway = (self.sceneWidth /2 - self.boxHeight/2)  / (speed / 50)
+        self.speed = speed
+
+    def distractionFlash(self):
+        self.lightOn = not self.lightOn
+        self.view.distractionFlash(self.lightOn)
+
+    def renderNewBox(self):
+        tempItem = simItem(self.boxHeight, self.boxHeight, PACKAGE_COLOUR)
+        tempItem.setY(self.conveyorTopLocation + self.conveyorHeight / 4)
+        self.unfilledArray.append(tempItem)
+        self.view.itemAdded(tempItem)
+
+    def moveBox(self, disToMovePerMil):
+
+        if self.taskParent.random.uniform(0.0,1.0) > 0.4 + self.taskParent.random.uniform(-0.1,0.1) and self.spawnTimer >= self.speed / 2:
+            self.spawnTimer = 0
+            self.taskParent.createNewBox()
+        else:
+            self.spawnTimer += 50
+
+        for box in self.unfilledArray:
+            box.setX(box.x() + disToMovePerMil)
+
+        for box in self.filledArray:
+            box.setX(box.x() + disToMovePerMil)
+            if box.x() > self.sceneWidth:
+                box.removed = True
+                self.view.itemRemoved(box)
+                self.filledArray.pop(0)
+                self.taskParent.boxList.pop(0)
+
+                # Check if box is error and disable response time, too late bucko
+                index = len(self.taskParent.boxList) - 1
+                if self.taskParent.boxList[index] < self.taskParent.itemCount or self.taskParent.boxList[index] > self.taskParent.itemCount:
+                    self.recordingResponseTime = False
+                    self.taskParent.responseTimer = 0
+
+                self.taskParent.fulfilledPackages += 1
+                self.taskParent.bus.publish(EventBus.BOX_PROCESSED, "packaging")
+
+        # Panic create new box
+        if len(self.unfilledArray) <= 0:
+            self.taskParent.createNewBox()
+
+        # Changes state once the box at the front of the conveyor reaches the halfway point
+        if(self.unfilledArray[0].x() >= self.sceneWidth /2):
+
+            if not self.interrupt:
+                self.taskParent.advBoxQueue()
+            else:
+                self.animState = 2
+                self.priorState = 1
+
+    def removeItem(self, item):
+        item.count -= 1
+        self.view.itemChanged(item)
+
+    def addItem(self, item):
+        self.addBox(item, item.count)
+
+    def correctBox(self, action):
+        index = 0
+        errorFound = False
+        for b in self.filledArray:
+            if action == "plus" and self.taskParent.boxList[index] < self.taskParent.itemCount:
+                event = taskEvent(eventCode.PACK_CORRECTED, itemCount=self.taskParent.boxList[index], expectedCount=self.taskParent.itemCount, responseMs=self.taskParent.responseTimer)
+                self.addItem(b)
+                self.taskParent.error -= 1
+                self.taskParent.successfulCorrections += 1
+                self.taskParent.bus.publish(EventBus.CORRECTION, "packaging")
+                self.taskParent.boxList[index] += 1
+                self.recordingResponseTime = False
+                self.taskParent.recordResponseTime()
+                self.taskParent.bus.publish(EventBus.TASK_EVENT, "packaging", event)
+                errorFound = True
+                break
+            elif action == "minus" and self.taskParent.boxList[index] > self.taskParent.itemCount:
+                event = taskEvent(eventCode.PACK_CORRECTED, itemCount=self.taskParent.boxList[index], expectedCount=self.taskParent.itemCount, responseMs=self.taskParent.responseTimer)
+                self.removeItem(b)
+                self.taskParent.error -= 1
+                self.taskParent.successfulCorrections += 1
+                self.taskParent.bus.publish(EventBus.CORRECTION, "packaging")
+                self.taskParent.boxList[index] -= 1
+                self.recordingResponseTime = False
+                self.taskParent.recordResponseTime()
+                self.taskParent.bus.publish(EventBus.TASK_EVENT, "packaging", event)
+                errorFound = True
+                break
+
+            index += 1
+        if not errorFound:
+            self.taskParent.bus.publish(EventBus.TASK_EVENT, "packaging", taskEvent(eventCode.PACK_NO_ERROR, actualBin=action, expectedCount=self.taskParent.itemCount))
+
+    def doAnimationStep(self):
+        if self.recordingResponseTime:
+            self.taskParent.responseTimer += 50
+
+        match self.animState:
+            case 0:
+                self.moveBox(self.distToHalfway)
+            case 1:
+                self.fillBox()
+
+    # One more item in the box, 'position' is where it goes in the 3 x n grid (the renderer draws it there)
+    def addBox(self, item, position):
+        item.count += 1
+        self.view.itemChanged(item)
+
+    def fillBox(self):
+        if self.unfilledArray[0].count == self.taskParent.boxList[len(self.taskParent.boxList) - 1]:
+            self.filledArray.append(self.unfilledArray[0])
+            self.unfilledArray.pop(0)
+
+            self.animState = 0
+        else:
+            self.addBox(self.unfilledArray[0], self.unfilledArray[0].count)
+
+
+#================================
+# Inspection
+#================================
+class inspectionSim(Task):
+    def __init__(self, errorRateVal, speed, acceptedRange, distractions, resolutionW, resolutionH, dataCollector, clock, rng=None):
+        self._errorRate = errorRateVal
+        self._speed = speed
+        self._acceptedRange = acceptedRange
+        self.clock = clock
+        self.random = rng or random
+
+        self.itemList = []
+
+        self.beeperEnabled = distractions[0]
+        self.flashLightEnabled = distractions[1]
+
+        self.defectsMissed = 0
+        self.totalInspected = 0
+        self.totalError = 0
+        self.successfulCorrections = 0
+
+        self.responseTimer = 0
+
+        self.programState = 0
+        self.previousState = 0
+
+        # Everything the task does is published on the data collector's bus
+        self.bus = dataCollector.bus
+        self.window = inspectionSimWindow(resolutionW, resolutionH, self, clock)
+        self.bus.publish(EventBus.TASK_STARTED, "inspection")
+
+        self.distractionTimer = None
+        if self.flashLightEnabled or self.beeperEnabled:
+            self.distractionTimer = clock.timer()
+            self.distractionTimer.timeout.connect(self.doDistraction)
+
+    # -------------------------------
+    # Properties
+    # -------------------------------
+    @property
+    def speed(self):
+        return self._speed
+
+    @speed.setter
+    def speed(self, value):
+        self._speed = value
+
+    @property
+    def errorRate(self):
+        return self._errorRate
+
+    @errorRate.setter
+    def errorRate(self, value):
+        self._errorRate = value
+
+    #--------------------------------
+    # Data Return
+    #--------------------------------
+    def returnData(self):
+        return [self.defectsMissed, self.totalInspected, self.totalError, self.successfulCorrections]
+
+    def giveResponseTime(self):
+        self.bus.publish(EventBus.RESPONSE_TIME, "inspection", self.responseTimer)
+        self.responseTimer = 0
+        return
+
+    #--------------------------------
+    # Distraction Logic
+    #--------------------------------
+    # The Qt task plays the beep
+    def playBeep(self):
+        pass
+
+    def doDistraction(self):
+        if self.random.uniform(0.0,1.0) > 0.75:
+            if self.beeperEnabled:
+                self.playBeep()
+                self.bus.publish(EventBus.DISTRACTION, "inspection", "beep")
+            if self.flashLightEnabled:
+                self.window.distractionFlash()
+                self.bus.publish(EventBus.DISTRACTION, "inspection", "flash")
+                self.clock.singleShot(500, self.window.distractionFlash)
+
+    # -------------------------------
+    # Core Logic
+    # -------------------------------
+    def createNewBox(self):
+        self.createNewItem()
+
+    def advBoxQueue(self):
+        pass
+
+    def createNewItem(self):
+        size = self.random.uniform(6.0, 14.0)
+        self.itemList.append(size)
+        self.window.renderNewItem(size)
+
+    def evaluateItem(self, size):
+        return 8.0 <= size <= self._acceptedRange
+
+    def pause(self):
+        self.window.animTimer.stop()
+        if self.distractionTimer is not None:
+            self.distractionTimer.stop()
+
+    def resume(self):
+        self.window.startStuff(self._speed)
+        if self.distractionTimer is not None:
+            self.distractionTimer.start(DISTRACTION_MS)
+
+    def performInspection(self):
+        if not self.itemList:
+            return
+
+        # Evaluate the first item
+        actual_size = self.itemList[0]
+        true_result = self.evaluateItem(actual_size)
+
+        # Determine if a random error occurred
+        error_happened = self.causeError()
+
+        # Simulate measured result
+        if error_happened:
+            measured_result = not true_result
+            self.bus.publish(EventBus.TASK_EVENT, "inspection", taskEvent(eventCode.INSPECT_MISJUDGED, size=actual_size,
+                expectedBin="accepted" if true_result else "rejected",
+                actualBin="accepted" if measured_result else "rejected"))
+        else:
+            measured_result = true_result
+
+        # Update metrics
+        self.totalInspected += 1
+        self.bus.publish(EventBus.BOX_PROCESSED, "inspection")
+
+        # Increment whenever a defect is missed.
+        if error_happened:
+            self.defectsMissed += 1
+            self.totalError += 1
+            self.bus.publish(EventBus.ERROR_INJECTED, "inspection")
+
+        # Update UI
+        self.window.displayInspectionResult(true_result, measured_result)
+
+        # Remove inspected item from queue
+        self.popItem()
+
+    def startTask(self):
+        # Create first item and start the conveyor
+        self.createNewItem()
+        self.window.startStuff(self._speed)
+        if self.distractionTimer is not None:
+            self.distractionTimer.start(DISTRACTION_MS)
+
+    def popItem(self):
+        if self.itemList:
+            self.itemList.pop(0)
+
+    def causeError(self):
+        error = self._errorRate + self.random.uniform(-0.05, 0.05) >= self.random.uniform(0.0, 1.0)
+        return error
+
+    def overrideResult(self, item):
+        # Called when the user clicks a box to manually flip its pass/fail result.
+        # Green = pass, Red = fail
+        if item.colour == PASS_COLOUR:
+            # Flip to fail
+            item.colour = FAIL_COLOUR
+            self.defectsMissed += 1
+
+        elif item.colour == FAIL_COLOUR:
+            # Flip to pass
+            item.colour = PASS_COLOUR
+
+            # Update metrics
+            if self.defectsMissed > 0:
+                self.defectsMissed -= 1
+        self.window.view.itemChanged(item)
+
+        # Remove the item from the scene after 0.5 seconds
+        self.clock.singleShot(500, lambda: self.window.removeItemFromScene(item))
+
+
+class inspectionSimWindow(_conveyorGeometry):
+    def __init__(self, minWidth, minHeight, taskParent, clock, view=None):
+        super().__init__(minWidth, minHeight)
+        self.taskParent = taskParent
+        self.view = view or nullView()
+
+        # Animation setup
+        self.conveyorItems = []     # Items moving along conveyor
+        self.animatedItems = []     # Items moving to bins
+        self.animTimer = clock.timer()
+        self.animTimer.timeout.connect(self.doAnimationStep)
+        self.animState = 0
+        self.priorState = 0
+
+        # Pass/fail bin locations
+        self.passBinX, self.passBinY = 50, 50
+        self.failBinX, self.failBinY = self.sceneWidth - 150, 50
+
+        # Box location
+        self.rejectedBox = []
+        self.acceptedBox = []
+        self.correctingBox = None
+
+        # Box Spawning
+        self.spawnTimer = 0
+
+        # Animation parameters
+        self.speed = 0  # default, will be updated by task speed
+        self.pixelPerFrame = 2
+        self.currentItem = None
+
+        # Record Response Time on Anim Step timer
+        self.recordingResponseTime = False
+        self.lightOn = False
+
+    def distractionFlash(self):
+        self.lightOn = not self.lightOn
+        self.view.distractionFlash(self.lightOn)
+
+    def startStuff(self, speed):
+        self.speed = speed
+        self.pixelPerFrame = int(((self.sceneWidth/2))  / (speed / 50))
+        self.animTimer.start(TICK_MS)
+
+    def renderNewItem(self, size):
+        # Compute box size
+        boxWidth = int((size / 15.0) * 100) + 20
+        y = self.conveyorTopLocation + self.conveyorHeight / 4
+
+        item = simItem(boxWidth, 30, ITEM_COLOUR)
+        item.size = size
+        item.setPos(0, y)
+
+        # Add to conveyor
+        self.conveyorItems.append(item)
+        self.view.itemAdded(item)
+
+    def moveConveyorItems(self):
+        """Move all items along the conveyor and inspect if they reach middle"""
+        items_to_inspect = []
+
+        if self.taskParent.random.uniform(0.0, 1.0) > 0.4 + self.taskParent.random.uniform(-0.5, 0.5) and self.spawnTimer >= self.speed / 2:
+            self.taskParent.createNewItem()
+            self.spawnTimer = 0
+        else:
+            self.spawnTimer += 50
+
+        for item in self.conveyorItems:
+            item.setX(item.x() + self.pixelPerFrame)
+
+            if item.x() >= self.sceneWidth / 2:
+                items_to_inspect.append(item)
+                self.animState = 1
+
+        for item in items_to_inspect:
+            self.conveyorItems.remove(item)
+            self.currentItem = item
+            self.taskParent.performInspection()  # sets color and target
+
+    def displayInspectionResult(self, intendedResult, result):
+        """Color-code inspected item and set target bin for animation"""
+        if self.currentItem is None:
+            return
+
+        self.currentItem.colour = PASS_COLOUR if intendedResult else FAIL_COLOUR
+        self.view.itemChanged(self.currentItem)
+
+        if result:
+            targetX, targetY = self.passBinX, self.passBinY
+        else:
+            targetX, targetY = self.failBinX, self.failBinY
+
+        # Animate to bin
+        steps = self.speed / 100 # slower speed = more steps
+
+        self.animatedItems.append({
+            "item": self.currentItem,
+            "error": not (intendedResult == result),
+            "result": result,
+            "targetX": targetX,
+            "targetY": targetY,
+            "steps": steps,
+            "currentStep": 0
+        })
+
+        self.currentItem = None  # reset for next item
+
+    def correctItem(self, incorrectBox):
+        if incorrectBox == "accepted":
+            if len(self.acceptedBox) <= 0:
+                return
+
+            box = self.acceptedBox[0]
+            targetX, targetY = self.failBinX, self.failBinY
+        else:
+            if len(self.rejectedBox)  <= 0:
+                return
+            box = self.rejectedBox[0]
+            targetX, targetY = self.passBinX, self.passBinY
+
+        refBox = box["item"]
+
+        if not box["error"]:
+            self.taskParent.bus.publish(EventBus.TASK_EVENT, "inspection", taskEvent(eventCode.INSPECT_NO_ERROR, actualBin=incorrectBox))
+            return
+
+        steps = self.speed / 100
+        self.taskParent.bus.publish(EventBus.TASK_EVENT, "inspection", taskEvent(eventCode.INSPECT_CORRECTED, actualBin=incorrectBox,
+            expectedBin="rejected" if incorrectBox == "accepted" else "accepted", responseMs=self.taskParent.responseTimer))
+
+        self.correctingBox = {
+            "item": refBox,
+            "error": False,
+            "result": False,
+            "targetX": targetX,
+            "targetY": targetY,
+            "steps": steps,
+            "currentStep": 0
+        }
+        self.priorState = self.animState
+        self.animState = 2
+        self.recordingResponseTime = False
+        self.taskParent.giveResponseTime()
+
+    def moveToTarget(self, box, mode):
+        # Animate items moving to bins
+        data = box
+
+        item = data["item"]
+        steps = data["steps"]
+        data["currentStep"] += 1
+
+        if data["currentStep"] >= steps:
+            # Finalize position at bin
+            item.setX(data["targetX"])
+            item.setY(data["targetY"])
+            if mode == "inspect":
+                self.animatedItems.remove(data)
+                self.animState = 0
+                if data["error"]:
+                    self.recordingResponseTime = True
+            elif mode == "correct":
+                self.taskParent.defectsMissed -= 1
+                self.taskParent.successfulCorrections += 1
+                self.taskParent.bus.publish(EventBus.CORRECTION, "inspection")
+                self.animState = self.priorState
+
+            # Adds box to the appropriate pile, and removes the box beneath it
+            if data["result"]:
+                self.acceptedBox.append({
+                    "item":item,
+                    "error": data["error"]
+                })
+
+                if len(self.acceptedBox) > 1:
+                    oldItem = self.acceptedBox[0]
+
+                    if oldItem["error"]:
+                        self.recordingResponseTime = False
+                        self.taskParent.responseTimer = 0
+
+                    self.removeItemFromScene(oldItem["item"])
+                    self.acceptedBox.pop(0)
+
+            else:
+                self.rejectedBox.append({
+                    "item":item,
+                    "error": data["error"]
+                })
+                if len(self.rejectedBox) > 1:
+                    oldItem = self.rejectedBox[0]
+
+                    # If prior item was an error, erase the recording response timer stuff so we can start over.
+                    if oldItem["error"]:
+                        self.recordingResponseTime = False
+                        self.taskParent.responseTimer = 0
+
+                    self.removeItemFromScene(oldItem["item"])
+                    self.rejectedBox.pop(0)
+
+        else:
+            dx = (data["targetX"] - item.x()) / (steps - data["currentStep"] + 1)
+            dy = (data["targetY"] - item.y()) / (steps - data["currentStep"] + 1)
+            item.setX(item.x() + dx)
+            item.setY(item.y() + dy)
+
+    def doAnimationStep(self):
+        """Move conveyor and animate items toward bins"""
+        # Move conveyor items
+        if self.recordingResponseTime:
+            self.taskParent.responseTimer += 50
+
+        match self.animState:
+            case 0:
+                self.moveConveyorItems()
+            case 1:
+                self.moveToTarget(self.animatedItems[0], "inspect")
+            case 2:
+                self.moveToTarget(self.correctingBox, "correct")
+
+    def removeItemFromScene(self, item):
+        """Safely remove an item from the scene."""
+        if not item.removed:
+            item.removed = True
+            self.view.itemRemoved(item)
+
+
+#--------------------------------
+# Headless sessions
+#--------------------------------
+# windowRender.calculateTaskSize, the size each task window gets
+def taskResolution(resolution, activeTasks):
+    taskWidth = (resolution[0] - (24 + (activeTasks - 1) * 10)) // activeTasks
+    return [taskWidth, resolution[1]]
+
+
+# Tasks for settings shaped like ErrorCalibration.scenarioSettings(), created and started in the order the
+# OCS does it (sorting, inspection, packaging). Returns {"sorting": sim, ...}.
+def createTasks(settings, dataCollector, clock, rng=None, resolution=RESOLUTION):
+    active = [name for name in ("sortingTask", "inspectionTask", "packagingTask") if settings.get(name, {}).get("active")]
+    if not active:
+        return {}
+    width, height = taskResolution(resolution, len(active))
+    tasks = {}
+    for name in active:
+        s = settings[name]
+        if name == "sortingTask":
+            tasks["sorting"] = sortingSim(s["errorRate"], s["speed"], s["numColours"], s["distractions"], width, height, dataCollector, clock, rng)
+        elif name == "inspectionTask":
+            tasks["inspection"] = inspectionSim(s["errorRate"], s["speed"], s["sizeRange"], s["distractions"], width, height, dataCollector, clock, rng)
+        else:
+            tasks["packaging"] = packagingSim(s["errorRate"], s["speed"], s["packageNum"], s["distractions"], width, height, dataCollector, clock, rng)
+    return tasks
+
+
+# One whole session on a virtual clock: 'duration' seconds of tasks written to resultsDir like a live session
+# (Start, the collection timer every collectionMs, Stop). rate=None runs as fast as it can.
+# 'operator' puts a SyntheticOperator on the tasks (a profile, or {"sorting": profile, ...}), None leaves them alone.
+# collectionOptions go to dataCollection, e.g. {"sharded": True} to write the session to its own shard.
+def runSession(settings, duration, resultsDir=None, seed=None, rate=None, resolution=RESOLUTION, collectionMs=COLLECTION_INTERVAL_MS, operator=None, collectionOptions=None):
+    from DataCollection import dataCollection
+    from SyntheticOperator import attachOperators
+
+    clock = virtualClock()
+    Timebase.useClock(clock.stamp)
+    dataManager = None
+    try:
+        dataManager = dataCollection(resultsDir, **(collectionOptions or {}))
+        tasks = createTasks(settings, dataManager, clock, random.Random(seed), resolution)
+        if not tasks:
+            print("[Simulation] No active tasks in the settings")
+            return None
+        # Its own random stream, so the operator's draws don't shift the tasks'
+        operators = attachOperators(tasks, operator, random.Random(None if seed is None else "operator-" + str(seed))) if operator is not None else {}
+
+        def collect():
+            dataManager.retrieveMetrics()
+            # Threaded subscribers get to catch up, simulated time can go much faster than they write
+            dataManager.bus.flush()
+
+        # Play: the session and the collection timer start before the tasks
+        dataManager.startSession()
+        collector = clock.timer()
+        collector.timeout.connect(collect)
+        collector.start(collectionMs)
+        for task in tasks.values():
+            task.startTask()
+        for op in operators.values():
+            op.start()
+
+        clock.run(duration, rate)
+
+        # Stop: the tasks are disposed, then the session is finished
+        for op in operators.values():
+            op.stop()
+        for name, task in tasks.items():
+            task.pause()
+            dataManager.bus.publish(EventBus.TASK_STOPPED, name)
+        collector.stop()
+        dataManager.pauseSession()
+        dataManager.finishSession()
+        dataManager.flushWrites()
+        sessionID = dataManager.currentSessionID
+        participantID = dataManager.currentParticipantID
+        dataManager.archiveSession(sessionID)
+        dataManager.endSession()
+        return {
+            "session_id": sessionID,
+            "participant_id": participantID,
+            "summary": dataManager.lastSummary,
+            "tasks": {name: task.returnData() for name, task in tasks.items()},
+            "operators": {name: op.summary() for name, op in operators.items()},
+        }
+    finally:
+        if dataManager is not None:
+            dataManager.close()
+        Timebase.useClock()
+
+
+if __name__ == "__main__":
+    from ErrorCalibration import scenarioSettings
+
+    parser = argparse.ArgumentParser(description="Run a scenario headless on a virtual clock")
+    parser.add_argument("--scenario", required=True, help="scenario file")
+    parser.add_argument("--duration", type=float, default=600.0, help="simulated seconds")
+    parser.add_argument("--rate", type=float, help="times real time (default: as fast as possible)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--results", help="results folder (default: Results)")
+    parser.add_argument("--raw", action="store_true", help="use the file's values as they are, not through the OCS limits")
+    parser.add_argument("--operator", help="synthetic operator profile for every task (SyntheticOperator.PROFILES name or JSON file)")
+    args = parser.parse_args()
+
+    with open(args.scenario, "r", encoding="utf8") as f:
+        settings = scenarioSettings(json.load(f), not args.raw)
+    start = time.perf_counter()
+    result = runSession(settings, args.duration, args.results, args.seed, args.rate, operator=args.operator)
+    elapsed = time.perf_counter() - start
+    if result is not None:
+        print("Session " + result["session_id"] + " (" + result["participant_id"] + "): " + str(args.duration) + " s simulated in " + str(round(elapsed, 2)) + " s")
+        for row in result["summary"]:
+            print("  " + row["task_type"] + ": " + str(row["boxes_processed"]) + " boxes, " + str(row["injected_errors"]) + " errors, " + str(row["corrections"]) + " corrected")
+        for name, stats in result["operators"].items():
+            print("  operator on " + name + ": " + ", ".join(key[len("operator_"):] + " " + str(value if not isinstance(value, float) else round(value)) for key, value in stats.items()))
@@ -0,0 +1,123 @@
+import math
+
+
+# Constant-memory statistics for a stream of values (response times).
+# Count/mean/variance use Welford's update, quantiles use the P-squared estimator
+# (Jain & Chlamtac, 1985) which keeps five markers per quantile instead of every value.
+
+class p2Quantile:
+    def __init__(self, p):
+        self.p = p
+        self.initial = []
+        self.q = []
+        self.n = [0, 1, 2, 3, 4]
+        self.np = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.dn = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        # Until we have five values just keep them, the estimate is exact
+        if len(self.initial) < 5:
+            self.initial.append(x)
+            if len(self.initial) == 5:
+                self.q = sorted(self.initial)
+            return
+
+        q = self.q
+        n = self.n
+
+        # Find the cell the value lands in, stretching the extremes if needed
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        # Nudge the three middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q = self.q
+        n = self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self):
+        if len(self.initial) < 5:
+            if not self.initial:
+                return 0.0
+            values = sorted(self.initial)
+            # Nearest rank on the few values we have
+            return values[min(len(values) - 1, max(0, math.ceil(self.p * len(values)) - 1))]
+        return self.q[2]
+
+
+class streamingStats:
+    def __init__(self, quantiles=(0.5, 0.9, 0.99)):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.quantiles = {p: p2Quantile(p) for p in quantiles}
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+        for estimator in self.quantiles.values():
+            estimator.add(x)
+
+    @property
+    def variance(self):
+        # Sample variance
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, p):
+        return self.quantiles[p].value()
+
+    def summary(self, scale=1.0):
+        # scale converts units on the way out, e.g. 1/1000 for ms -> s
+        out = {
+            "count": self.count,
+            "mean": self.mean * scale,
+            "std": self.std * scale,
+            "min": (self.min or 0.0) * scale,
+            "max": (self.max or 0.0) * scale,
+        }
+        for p, estimator in self.quantiles.items():
+            out["p" + str(round(p * 100))] = estimator.value() * scale
+        return out
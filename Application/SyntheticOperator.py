@@ -0,0 +1,253 @@
+import math, json, random, weakref
+
+from SimulationCore import TICK_MS, BOX_COLOURS, PASS_COLOUR, FAIL_COLOUR
+
+
+# A stand-in participant. It looks at what a task window shows (the SimulationCore items) and clicks the same
+# controls a person would: defineErrorBox/defineCorrectionBox for sorting, correctBox("plus"/"minus") for packaging
+# and correctItem("accepted"/"rejected") for inspection. It runs on the task's own clock, so it works headless
+# (SimulationCore.runSession(..., operator="average")) and on the live Qt windows (SYNTHETIC_OPERATOR in DataCollection.py).
+#
+# A profile says how it behaves:
+#   latency   ms from an item showing up to the click, drawn from a distribution (see drawMs)
+#   missRate  chance an error is never noticed
+#   falseRate chance an item without an error gets "corrected" anyway
+# corrections / falseCorrections are clicks that did / did not correct an error according to the task's own count.
+#   recheck   ms before trying again when the controls are busy (sorting buttons disabled, a correction running)
+
+POLL_MS = 100
+TASK_NAMES = ("sorting", "packaging", "inspection")
+COLOUR_NAMES = {value: name for name, value in BOX_COLOURS.items()}
+
+PROFILES = {
+    # Sees everything, a fixed 300 ms, never wrong. The most load the correction path gets.
+    "perfect": {"latency": {"dist": "fixed", "ms": 300}, "missRate": 0.0, "falseRate": 0.0},
+    "attentive": {"latency": {"dist": "lognormal", "median": 900, "sigma": 0.3, "min": 250}, "missRate": 0.05, "falseRate": 0.01},
+    "average": {"latency": {"dist": "lognormal", "median": 1500, "sigma": 0.45, "min": 300}, "missRate": 0.15, "falseRate": 0.03},
+    "distracted": {"latency": {"dist": "lognormal", "median": 2500, "sigma": 0.6, "min": 400}, "missRate": 0.35, "falseRate": 0.08},
+}
+
+DEFAULT_PROFILE = {"latency": {"dist": "fixed", "ms": 1000}, "missRate": 0.0, "falseRate": 0.0, "recheck": TICK_MS}
+
+
+# A profile name from PROFILES, a path to a JSON file with one, or a dict. Missing keys come from DEFAULT_PROFILE.
+def operatorProfile(profile):
+    if isinstance(profile, str):
+        if profile in PROFILES:
+            profile = PROFILES[profile]
+        else:
+            with open(profile, "r", encoding="utf8") as f:
+                profile = json.load(f)
+    resolved = dict(DEFAULT_PROFILE)
+    resolved.update(profile or {})
+    return resolved
+
+
+# One draw in ms from a distribution spec, never below its "min" (0 if not given)
+#   {"dist": "fixed", "ms": 800}
+#   {"dist": "uniform", "low": 500, "high": 1500}
+#   {"dist": "normal", "mean": 1000, "sd": 200}
+#   {"dist": "lognormal", "median": 1000, "sigma": 0.4}
+#   {"dist": "gamma", "shape": 4, "scale": 250}
+def drawMs(spec, rng=random):
+    match spec.get("dist", "fixed"):
+        case "fixed":
+            value = spec["ms"]
+        case "uniform":
+            value = rng.uniform(spec["low"], spec["high"])
+        case "normal":
+            value = rng.gauss(spec["mean"], spec["sd"])
+        case "lognormal":
+            value = rng.lognormvariate(math.log(spec["median"]), spec["sigma"])
+        case "gamma":
+            value = rng.gammavariate(spec["shape"], spec["scale"])
+        case other:
+            raise ValueError("Unknown latency distribution: " + str(other))
+    return max(value, spec.get("min", 0))
+
+
+class syntheticOperator:
+    def __init__(self, name, task, profile="average", rng=None, pollMs=POLL_MS):
+        self.name = name
+        self.task = task
+        self.profile = operatorProfile(profile)
+        self.random = rng or random
+        self.clock = task.clock
+        # What the buttons call: the task for sorting, the window for the others (the Qt window if there is one,
+        # it hands the click to the core)
+        self.controls = task if name == "sorting" else getattr(task, "renderWindow", None) or task.window
+
+        # Items already looked at, so each one is judged once
+        self.seen = weakref.WeakSet()
+        self.running = False
+
+        self.errorsSeen = 0
+        self.missed = 0
+        self.corrections = 0
+        self.falseCorrections = 0
+        # Still wanted to click, but the item was gone by then
+        self.late = 0
+        self.latencies = []
+
+        self.pollTimer = self.clock.timer()
+        self.pollTimer.timeout.connect(self.poll)
+        self.pollMs = pollMs
+
+    def start(self):
+        self.running = True
+        self.pollTimer.start(self.pollMs)
+
+    # Clicks that are already on their way are dropped too
+    def stop(self):
+        self.running = False
+        self.pollTimer.stop()
+
+    def summary(self):
+        return {
+            "operator_errors_seen": self.errorsSeen,
+            "operator_missed": self.missed,
+            "operator_corrections": self.corrections,
+            "operator_false_corrections": self.falseCorrections,
+            "operator_late": self.late,
+            "operator_mean_latency_ms": sum(self.latencies) / len(self.latencies) if self.latencies else None,
+        }
+
+    #--------------------------------
+    # Looking
+    #--------------------------------
+    def poll(self):
+        # Paused task, nothing moves
+        if not self.task.window.animTimer.isActive():
+            return
+        for item, isError, respond in self.visibleItems():
+            if item in self.seen:
+                continue
+            self.seen.add(item)
+            if isError:
+                self.errorsSeen += 1
+                if self.random.random() < self.profile["missRate"]:
+                    self.missed += 1
+                    continue
+            elif self.random.random() >= self.profile["falseRate"]:
+                continue
+            # Whole ms, QTimer.singleShot takes an int
+            latency = int(round(drawMs(self.profile["latency"], self.random)))
+            self.clock.singleShot(latency, lambda item=item, isError=isError, respond=respond, latency=latency: self.click(item, isError, respond, latency))
+
+    # (item, is it an error, how to respond) for everything the task shows where a correction can be made
+    def visibleItems(self):
+        window = self.task.window
+        match self.name:
+            case "sorting":
+                found = []
+                for colour in ("red", "blue", "green"):
+                    item = getattr(window, colour + "SB", None)
+                    if item is not None and not item.removed:
+                        found.append((item, item.colour != BOX_COLOURS[colour], self.sortingResponse(colour, item)))
+                return found
+            case "packaging":
+                expected = self.task.itemCount
+                return [(item, item.count != expected, self.packagingResponse(item, expected)) for item in window.filledArray if not item.removed]
+            case "inspection":
+                found = []
+                for pile, shown, wrong in ((window.acceptedBox, "accepted", FAIL_COLOUR), (window.rejectedBox, "rejected", PASS_COLOUR)):
+                    if pile and not pile[0]["item"].removed:
+                        item = pile[0]["item"]
+                        found.append((item, item.colour == wrong, self.inspectionResponse(shown, item)))
+                return found
+        return []
+
+    #--------------------------------
+    # Clicking
+    #--------------------------------
+    # respond() returns None if the item can't be corrected any more, False if the controls are busy, True once clicked
+    def click(self, item, isError, respond, latency):
+        if not self.running:
+            return
+        before = self.task.successfulCorrections
+        done = respond()
+        if done is None:
+            self.late += 1
+        elif not done:
+            self.clock.singleShot(self.profile["recheck"], lambda: self.click(item, isError, respond, latency + self.profile["recheck"]))
+        else:
+            self.latencies.append(latency)
+            self.settle(before)
+
+    # What the click did is what the task counted, not what the operator thought it saw: the controls act on
+    # whatever is there by then (packaging corrects the first wrong box, not necessarily this one). Sorting and
+    # inspection finish a correction once its animation is done, and take no other click until then.
+    def settle(self, before):
+        if not self.running:
+            return
+        if self.correcting():
+            self.clock.singleShot(self.profile["recheck"], lambda: self.settle(before))
+        elif self.task.successfulCorrections > before:
+            self.corrections += 1
+        else:
+            self.falseCorrections += 1
+
+    def correcting(self):
+        window = self.task.window
+        match self.name:
+            case "sorting":
+                return window.interrupt
+            case "inspection":
+                return window.animState == 2
+        return False
+
+    def sortingResponse(self, colour, item):
+        def respond():
+            window = self.task.window
+            if getattr(window, colour + "SB") is not item:
+                return None
+            if not window.buttonsEnabled or window.interrupt:
+                return False
+            # The box's own colour is where it goes, a wrong guess when there is no error
+            target = COLOUR_NAMES[item.colour]
+            if target == colour:
+                others = ["red", "blue", "green"][:self.task.numColours]
+                others.remove(colour)
+                target = self.random.choice(others)
+            self.controls.defineErrorBox(colour)
+            self.controls.defineCorrectionBox(target)
+            return True
+        return respond
+
+    def packagingResponse(self, item, expected):
+        def respond():
+            if item.removed:
+                return None
+            if item.count < expected:
+                action = "plus"
+            elif item.count > expected:
+                action = "minus"
+            else:
+                action = self.random.choice(("plus", "minus"))
+            self.controls.correctBox(action)
+            return True
+        return respond
+
+    def inspectionResponse(self, shown, item):
+        def respond():
+            window = self.task.window
+            pile = window.acceptedBox if shown == "accepted" else window.rejectedBox
+            if item.removed or not pile or pile[0]["item"] is not item:
+                return None
+            if window.animState == 2:
+                return False
+            self.controls.correctItem(shown)
+            return True
+        return respond
+
+
+# An operator for every task in 'tasks' ({"sorting": task, ...}). 'profile' is one profile for all of them or
+# {"sorting": profile, ...}, tasks not in it get none.
+def attachOperators(tasks, profile, rng=None):
+    operators = {}
+    for name, task in tasks.items():
+        p = profile.get(name) if isinstance(profile, dict) and set(profile) & set(TASK_NAMES) else profile
+        if p is None:
+            continue
+        operators[name] = syntheticOperator(name, task, p, rng)
+    return operators
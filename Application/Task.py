@@ -1,8 +1,6 @@
 import random
 from abc import ABC, abstractmethod
 
-from PyQt5.QtWidgets import QGraphicsItem
-
 
 class Task(ABC):
 
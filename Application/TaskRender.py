@@ -0,0 +1,86 @@
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import QFrame, QGraphicsRectItem
+
+
+# Qt side of SimulationCore. The task logic runs on a qtClock (real QTimers) and the task windows only draw
+# what the core has: every item the core adds gets a QGraphicsRectItem, and after each animation step the
+# window moves them to where the core put the items.
+
+# 'context' is the task's render window once it has one. Single shots are timers owned by it, so the ones still
+# pending when the window is deleted (Stop) go with it, like the QFrame-bound shots the task windows used before,
+# instead of calling into a dead window.
+class qtClock:
+    def __init__(self, context=None):
+        self.context = context
+
+    def timer(self):
+        return QTimer()
+
+    def singleShot(self, msec, callback):
+        if self.context is None:
+            QTimer.singleShot(msec, callback)
+            return
+        timer = QTimer(self.context)
+        timer.setSingleShot(True)
+        timer.timeout.connect(callback)
+        timer.timeout.connect(timer.deleteLater)
+        timer.start(msec)
+
+
+# Base for the task windows, it is the core window's view (SimulationCore.nullView)
+class taskRenderWindow(QFrame):
+    def __init__(self, core):
+        super().__init__()
+        self.core = core
+        # simItem -> QGraphicsRectItem
+        self.graphics = {}
+        core.view = self
+        clock = core.taskParent.clock
+        if isinstance(clock, qtClock):
+            clock.context = self
+        # Connected after the core's own step, so it draws the positions of that step
+        core.animTimer.timeout.connect(self.sync)
+
+    @property
+    def animState(self):
+        return self.core.animState
+
+    @property
+    def animTimer(self):
+        return self.core.animTimer
+
+    def sync(self):
+        for item, graphic in self.graphics.items():
+            graphic.setPos(item.x(), item.y())
+
+    #--------------------------------
+    # View hooks
+    #--------------------------------
+    def itemAdded(self, item):
+        graphic = QGraphicsRectItem(0, 0, item.width, item.height)
+        graphic.setPos(item.x(), item.y())
+        graphic.setBrush(QBrush(QColor.fromRgba(item.colour)))
+        graphic.setZValue(500)
+        self.scene.addItem(graphic)
+        self.graphics[item] = graphic
+        return graphic
+
+    def itemRemoved(self, item):
+        graphic = self.graphics.pop(item, None)
+        if graphic is not None and graphic.scene() is not None:
+            self.scene.removeItem(graphic)
+
+    def itemChanged(self, item):
+        graphic = self.graphics.get(item)
+        if graphic is not None:
+            graphic.setBrush(QBrush(QColor.fromRgba(item.colour)))
+
+    def defineLabel(self, label, text, newColour=None):
+        pass
+
+    def setButtonState(self, enabled):
+        pass
+
+    def distractionFlash(self, visible):
+        self.lightFlash.setVisible(visible)
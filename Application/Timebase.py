@@ -0,0 +1,45 @@
+import time, datetime
+import pandas as pd
+
+
+# Timestamps for everything the app records.
+# Rows are stamped where they happen with stamp(), the monotonic nanosecond counter: one integer, no datetime,
+# and it never jumps when the system clock is adjusted (NTP, DST). A timeAnchor pairs that counter with the
+# wall clock once, when a session starts, and the stamps are only turned into wall time when rows are
+# written out (on the writer thread) or exported.
+# A headless simulation (SimulationCore.py) swaps the counter for its virtual clock with useClock(), so
+# everything it records is on simulated time.
+
+_clock = time.perf_counter_ns
+
+
+def stamp():
+    return _clock()
+
+
+# clock: function returning nanoseconds, None goes back to the monotonic counter
+def useClock(clock=None):
+    global _clock
+    _clock = clock if clock is not None else time.perf_counter_ns
+
+
+class timeAnchor:
+    def __init__(self):
+        # Taken back to back so the pair is as close as the two clocks can be read
+        self.wall = datetime.datetime.now()
+        self.mono_ns = stamp()
+
+    # Stamp -> datetime. Anything that isn't a stamp (already a datetime, text, None) is returned as is.
+    def toWall(self, ns):
+        if type(ns) is not int:
+            return ns
+        return self.wall + datetime.timedelta(microseconds=(ns - self.mono_ns) / 1000)
+
+    # Vectorised version for exports, stamps -> datetime64 Series
+    def toWallSeries(self, ns):
+        return pd.Timestamp(self.wall) + pd.to_timedelta(pd.Series(ns, dtype="int64") - self.mono_ns, unit="ns")
+
+    # Seconds between two stamps
+    @staticmethod
+    def seconds(start_ns, end_ns):
+        return (end_ns - start_ns) / 1e9
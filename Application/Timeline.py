@@ -0,0 +1,167 @@
+import os, sys, argparse
+import numpy as np
+import pandas as pd
+
+from analyze import loadTable, EVENT_DTYPES
+
+
+# Every task's events on one timeline per session, for questions across tasks in dual/triple task scenarios,
+# e.g. "response times for packaging corrections within 5 s of a flash":
+#   timeline = loadTimeline()
+#   corrections = select(timeline, task="packaging", event="CORRECTED")
+#   flashes = select(timeline, event="DISTRACTION", kind="flash")
+#   near = within(corrections, flashes, before=5)
+# Each row has the session, its time t (ns), task (sorting/packaging/inspection/session), event (the event_code
+# without the task, e.g. CORRECTED, MISSORTED, DISTRACTION, RESPONSE) and kind (actual_bin, "flash"/"beep" for
+# distractions). Distractions and the per box activity rows are logged with ACTIVITY_LOG_ENABLED in DataCollection.py.
+#
+# The queries work on whole studies at once: windowCounts/within do one searchsorted over all sessions, asofJoin
+# is a pandas merge_asof by session. No loops over sessions or events.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+TIMELINE_COLUMNS = ["Timestamp", "session_id", "participant_id", "event_type", "event_code", "expected_bin", "actual_bin", "response_ms"]
+
+# event_code prefix -> task
+TASK_PREFIXES = {"SORT": "sorting", "PACK": "packaging", "INSPECT": "inspection", "SESSION": "session"}
+
+
+#--------------------------------
+# Loading
+#--------------------------------
+def loadTimeline(eventFile=None, sessions=None, participants=None, chunksize=500000):
+    eventFile = eventFile or os.path.join(RESULTS_DIR, "events.csv")
+    events = loadTable(eventFile, EVENT_DTYPES, chunksize, sessions, participants, usecols=TIMELINE_COLUMNS)
+    return buildTimeline(events)
+
+
+# Timeline from already loaded event rows (Timestamp parsed), sorted by session and time
+def buildTimeline(events):
+    events = events.dropna(subset=["Timestamp"])
+    codes = events["event_code"].astype("category")
+    # Split the code categories once instead of every row, the rows just get the category numbers
+    names = pd.Series(codes.cat.categories.astype(str))
+    tasks = names.str.split("_", n=1).str[0].map(TASK_PREFIXES)
+    eventNames = names.where(tasks.isna(), names.str.split("_", n=1).str[1])
+    tasks = pd.Categorical(tasks.fillna("other"))
+    eventNames = pd.Categorical(eventNames)
+    rowCodes = codes.cat.codes.to_numpy()
+
+    timeline = pd.DataFrame({
+        "t": events["Timestamp"].to_numpy(dtype="datetime64[ns]").astype("int64"),
+        "Timestamp": events["Timestamp"].to_numpy(),
+        "session_id": events["session_id"].astype("category"),
+        "participant_id": events["participant_id"].astype("category"),
+        "task": pd.Categorical.from_codes(tasks.codes[rowCodes], tasks.categories),
+        "event": pd.Categorical.from_codes(eventNames.codes[rowCodes], eventNames.categories),
+        "kind": events["actual_bin"].astype("category"),
+        "expected_bin": events["expected_bin"].astype("category"),
+        "response_ms": events["response_ms"].to_numpy(dtype="float64"),
+    })
+    order = np.lexsort((timeline["t"].to_numpy(), timeline["session_id"].cat.codes.to_numpy()))
+    return timeline.iloc[order].reset_index(drop=True)
+
+
+# Rows of one task/event/kind, each can be a name or a list of names
+def select(timeline, task=None, event=None, kind=None):
+    mask = np.ones(len(timeline), dtype=bool)
+    for column, value in (("task", task), ("event", event), ("kind", kind)):
+        if value is None:
+            continue
+        values = [value] if isinstance(value, str) else list(value)
+        mask &= timeline[column].isin(values).to_numpy()
+    return timeline[mask]
+
+
+#--------------------------------
+# Queries
+#--------------------------------
+# (session, t) packed into one sortable int64: t relative to the session's first row, plus the session number
+# times a span longer than any session. Sessions are done in batches if the study doesn't fit one int64.
+def _sessionBatches(targets, anchors, margin):
+    categories = targets["session_id"].cat.categories.union(anchors["session_id"].cat.categories)
+    targetCodes = pd.Categorical(targets["session_id"], categories=categories).codes.astype("int64")
+    anchorCodes = pd.Categorical(anchors["session_id"], categories=categories).codes.astype("int64")
+    targetT = targets["t"].to_numpy()
+    anchorT = anchors["t"].to_numpy()
+
+    starts = np.full(len(categories), np.iinfo("int64").max)
+    np.minimum.at(starts, targetCodes, targetT)
+    np.minimum.at(starts, anchorCodes, anchorT)
+    starts -= margin
+    targetRel = targetT - starts[targetCodes]
+    anchorRel = anchorT - starts[anchorCodes]
+    span = int(max(targetRel.max(initial=0), anchorRel.max(initial=0))) + margin + 1
+
+    perBatch = max(1, (2 ** 62) // span)
+    for first in range(0, len(categories), perBatch):
+        targetRows = np.flatnonzero((targetCodes >= first) & (targetCodes < first + perBatch))
+        anchorRows = np.flatnonzero((anchorCodes >= first) & (anchorCodes < first + perBatch))
+        yield (targetRows, (targetCodes[targetRows] - first) * span + targetRel[targetRows],
+               (anchorCodes[anchorRows] - first) * span + anchorRel[anchorRows])
+
+
+# For every target row, how many anchor rows of the same session are between 'before' seconds before
+# and 'after' seconds after it (both ends included)
+def windowCounts(targets, anchors, before=0.0, after=0.0):
+    counts = np.zeros(len(targets), dtype="int64")
+    if len(targets) == 0 or len(anchors) == 0:
+        return counts
+    before = int(before * 1e9)
+    after = int(after * 1e9)
+    for rows, targetKeys, anchorKeys in _sessionBatches(targets, anchors, max(before, after)):
+        anchorKeys = np.sort(anchorKeys)
+        counts[rows] = (np.searchsorted(anchorKeys, targetKeys + after, side="right")
+                        - np.searchsorted(anchorKeys, targetKeys - before, side="left"))
+    return counts
+
+
+# Target rows with at least one anchor in the window, e.g. within(corrections, flashes, before=5)
+def within(targets, anchors, before=0.0, after=0.0):
+    return targets[windowCounts(targets, anchors, before, after) > 0]
+
+
+# For every target row the nearest anchor row of the same session ("backward": at or before it, "forward": at
+# or after it, "nearest"), within 'tolerance' seconds if given. Adds the anchor's columns with the suffix and
+# lag_s, the seconds from the anchor to the target (negative for anchors after it). Keeps the target order.
+def asofJoin(targets, anchors, direction="backward", tolerance=None, suffix="_anchor", allowExact=True):
+    columns = ["t", "task", "event", "kind"]
+    left = targets.assign(_row=np.arange(len(targets)), session_id=targets["session_id"].astype(str)).sort_values("t", kind="stable")
+    right = anchors[["session_id"] + columns].assign(session_id=anchors["session_id"].astype(str)).sort_values("t", kind="stable")
+    right = right.rename(columns={column: column + suffix for column in columns})
+    right["t"] = right["t" + suffix]
+    joined = pd.merge_asof(left, right, on="t", by="session_id", direction=direction, allow_exact_matches=allowExact,
+                           tolerance=None if tolerance is None else int(tolerance * 1e9))
+    joined["lag_s"] = (joined["t"] - joined["t" + suffix]) / 1e9
+    joined = joined.sort_values("_row").drop(columns="_row").reset_index(drop=True)
+    joined["session_id"] = pd.Categorical(joined["session_id"], categories=targets["session_id"].cat.categories)
+    return joined
+
+
+# A value of the target rows (response_ms by default) inside and outside the window, per target task
+def compare(targets, anchors, before=0.0, after=0.0, value="response_ms"):
+    inside = windowCounts(targets, anchors, before, after) > 0
+    table = targets.assign(window=np.where(inside, "inside", "outside"))
+    table = table.groupby(["task", "window"], observed=True)[value].agg(rows="size", count="count", mean="mean", median="median", std="std")
+    return table.reset_index()
+
+
+if __name__ == "__main__":
+    # python Timeline.py --target CORRECTED --anchor DISTRACTION --anchor-kind flash --before 5
+    parser = argparse.ArgumentParser(description="Response times of one kind of event near another, across tasks")
+    parser.add_argument("--events", default=os.path.join(RESULTS_DIR, "events.csv"))
+    parser.add_argument("--session", action="append", help="only these sessions (repeatable)")
+    parser.add_argument("--participant", action="append", help="only these participants (repeatable)")
+    parser.add_argument("--target", action="append", required=True, help="target event, e.g. CORRECTED or RESPONSE (repeatable)")
+    parser.add_argument("--target-task", action="append", help="sorting / packaging / inspection (repeatable)")
+    parser.add_argument("--anchor", action="append", required=True, help="anchor event, e.g. DISTRACTION or MISSORTED (repeatable)")
+    parser.add_argument("--anchor-task", action="append")
+    parser.add_argument("--anchor-kind", action="append", help="e.g. flash / beep for distractions")
+    parser.add_argument("--before", type=float, default=5.0, help="seconds an anchor can be before the target")
+    parser.add_argument("--after", type=float, default=0.0, help="seconds an anchor can be after the target")
+    args = parser.parse_args()
+
+    timeline = loadTimeline(args.events, args.session, args.participant)
+    targets = select(timeline, task=args.target_task, event=args.target)
+    anchors = select(timeline, task=args.anchor_task, event=args.anchor, kind=args.anchor_kind)
+    print(str(len(targets)) + " target rows, " + str(len(anchors)) + " anchor rows, " + str(timeline["session_id"].nunique()) + " sessions")
+    print(compare(targets, anchors, args.before, args.after).to_string(index=False))
@@ -0,0 +1,319 @@
+import os, json, queue, struct, threading, time
+import numpy as np
+import pandas as pd
+
+from Timebase import stamp
+
+
+# Per tick trace of everything that moves on screen, to see exactly what a participant saw when an error happened.
+# The recorder hangs off each task's animTimer (after the step has moved its items) and copies the position,
+# colour and state of every item of the task's core (SimulationCore) into a preallocated NumPy chunk, so a
+# headless run can be traced the same way. Full chunks go to a background
+# thread that appends them to Results/traces/<session>.trace, so the GUI thread never touches the disk.
+#
+# File layout: MAGIC, 4 byte header length, JSON header (columns, task/group codes, session, time anchor),
+# then fixed size TRACE_DTYPE records. A file cut short by a crash just loses its last partial record.
+# A resumed session carries on in the same file: it is cut back to its last whole record and an anchor record
+# (task ANCHOR_TASK) with the new process's time anchor starts the records stamped on that process's clock.
+
+MAGIC = b"KTRACE\x00\x01"
+TRACE_VERSION = 1
+
+TRACE_DTYPE = np.dtype([
+    ("t", "<i8"),         # Timebase stamp of the tick (monotonic ns)
+    ("tick", "<u4"),      # Tick number of that task window
+    ("task", "u1"),
+    ("group", "u1"),      # Which list on the core window the item was in
+    ("state", "u1"),      # Window animState
+    ("flags", "u1"),      # FLAG_ERROR for inspection items going to the wrong bin
+    ("item", "<u4"),      # Item number, the same for as long as the item exists
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("count", "<i2"),     # Items in a package (packaging), -1 otherwise
+    ("colour", "<u4"),    # Brush colour, 0xAARRGGBB
+])
+
+TASKS = {"sorting": 0, "packaging": 1, "inspection": 2}
+# Named after the core window attributes they come from
+GROUPS = {
+    "boxArray": 0, "heldBox": 1,
+    "unfilledArray": 2, "filledArray": 3,
+    "conveyorItems": 4, "animatedItems": 5, "correctingBox": 6,
+}
+FLAG_ERROR = 1
+# Anchor record: t is anchor_mono_ns, item and colour the low and high half of anchor_wall in ns
+ANCHOR_TASK = 255
+
+CHUNK_ROWS = 8192
+SPARE_CHUNKS = 4
+
+
+class traceRecorder:
+    def __init__(self, chunkRows=CHUNK_ROWS):
+        self.chunkRows = chunkRows
+        self.location = None
+        self.file = None
+
+        # Chunks the writer has finished with, reused so recording doesn't allocate
+        self._spare = queue.Queue()
+        for _ in range(SPARE_CHUNKS):
+            self._spare.put(np.empty(chunkRows, dtype=TRACE_DTYPE))
+        self._chunk = self._spare.get()
+        self._rows = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+        self._nextItem = 0
+        self._ticks = dict.fromkeys(TASKS, 0)
+
+        self.rowsRecorded = 0
+        self.chunksWritten = 0
+        self.chunksAllocated = SPARE_CHUNKS
+        self.writeFailures = 0
+        self.tickCount = 0
+        self.tickTime = 0.0
+        self.maxTickTime = 0.0
+
+    def isOpen(self):
+        return self.file is not None
+
+    # Starts (or, after a resume, carries on) the trace of a session. header: session_id, participant_id, anchor...
+    def open(self, location, header):
+        self.close()
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        carryOn = os.path.exists(location) and os.path.getsize(location) > 0
+        if carryOn:
+            carryOn = self._cutToWholeRecords(location)
+        self.file = open(location, "ab")
+        if carryOn:
+            self.file.write(anchorRecord(header).tobytes())
+        else:
+            header = dict(header, version=TRACE_VERSION, columns=TRACE_DTYPE.descr, tasks=TASKS, groups=GROUPS)
+            data = json.dumps(header, default=str).encode("utf8")
+            self.file.write(MAGIC + struct.pack("<I", len(data)) + data)
+        self.file.flush()
+        self.location = location
+        self._thread = threading.Thread(target=self._run, name="traceWriter", daemon=True)
+        self._thread.start()
+
+    # Drops the partial record a crash left at the end. False if the file isn't a trace, it is started again.
+    def _cutToWholeRecords(self, location):
+        try:
+            with open(location, "r+b") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError("not a trace file")
+                length = struct.unpack("<I", f.read(4))[0]
+                headerEnd = len(MAGIC) + 4 + length
+                size = os.path.getsize(location)
+                if size < headerEnd:
+                    raise ValueError("header cut short")
+                f.truncate(headerEnd + (size - headerEnd) // TRACE_DTYPE.itemsize * TRACE_DTYPE.itemsize)
+            return True
+        except (ValueError, struct.error) as e:
+            print("[Trace Recorder] Starting " + location + " again, " + str(e))
+            open(location, "wb").close()
+            return False
+
+    # Samples a task's core window (SimulationCore) after every animation step
+    def attach(self, task, window):
+        sample = {"sorting": self.sampleSorting, "packaging": self.samplePackaging, "inspection": self.sampleInspection}[task]
+        window.animTimer.timeout.connect(lambda: sample(window))
+
+    #--------------------------------
+    # Sampling (GUI thread)
+    #--------------------------------
+    def sampleSorting(self, window):
+        if self.file is None:
+            return
+        start = time.perf_counter()
+        rows, t, tick, state = self._begin("sorting", window)
+        task = TASKS["sorting"]
+        group = GROUPS["boxArray"]
+        for box in window.boxArray:
+            rows.append((t, tick, task, group, state, 0, self._itemID(box), box.x(), box.y(), -1, box.colour))
+        box = window.heldBox
+        if box is not None:
+            rows.append((t, tick, task, GROUPS["heldBox"], state, 0, self._itemID(box), box.x(), box.y(), -1, box.colour))
+        self._append(rows, start)
+
+    def samplePackaging(self, window):
+        if self.file is None:
+            return
+        start = time.perf_counter()
+        rows, t, tick, state = self._begin("packaging", window)
+        task = TASKS["packaging"]
+        for name in ("unfilledArray", "filledArray"):
+            group = GROUPS[name]
+            for box in getattr(window, name):
+                rows.append((t, tick, task, group, state, 0, self._itemID(box), box.x(), box.y(), box.count, box.colour))
+        self._append(rows, start)
+
+    def sampleInspection(self, window):
+        if self.file is None:
+            return
+        start = time.perf_counter()
+        rows, t, tick, state = self._begin("inspection", window)
+        task = TASKS["inspection"]
+        group = GROUPS["conveyorItems"]
+        for item in window.conveyorItems:
+            rows.append((t, tick, task, group, state, 0, self._itemID(item), item.x(), item.y(), -1, item.colour))
+        group = GROUPS["animatedItems"]
+        for data in window.animatedItems:
+            item = data["item"]
+            rows.append((t, tick, task, group, state, FLAG_ERROR if data["error"] else 0, self._itemID(item), item.x(), item.y(), -1, item.colour))
+        # Only on screen while a correction is being animated
+        data = getattr(window, "correctingBox", None)
+        if state == 2 and data is not None:
+            item = data["item"]
+            rows.append((t, tick, task, GROUPS["correctingBox"], state, 0, self._itemID(item), item.x(), item.y(), -1, item.colour))
+        self._append(rows, start)
+
+    def _begin(self, task, window):
+        self._ticks[task] += 1
+        return [], stamp(), self._ticks[task], window.animState
+
+    # Items keep their number for as long as they exist, stored on the item itself
+    def _itemID(self, item):
+        try:
+            return item.traceID
+        except AttributeError:
+            self._nextItem += 1
+            item.traceID = self._nextItem
+            return self._nextItem
+
+    def _append(self, rows, start):
+        position = 0
+        while position < len(rows):
+            take = min(len(rows) - position, self.chunkRows - self._rows)
+            self._chunk[self._rows:self._rows + take] = rows[position:position + take]
+            self._rows += take
+            position += take
+            if self._rows == self.chunkRows:
+                self._handOver()
+        self.rowsRecorded += len(rows)
+
+        elapsed = time.perf_counter() - start
+        self.tickCount += 1
+        self.tickTime += elapsed
+        if elapsed > self.maxTickTime:
+            self.maxTickTime = elapsed
+
+    # Passes the current chunk to the writer and carries on in a spare one
+    def _handOver(self):
+        if self._rows == 0:
+            return
+        self._queue.put((self._chunk, self._rows))
+        try:
+            self._chunk = self._spare.get_nowait()
+        except queue.Empty:
+            # Writer is behind, better a new chunk than a stalled tick
+            self._chunk = np.empty(self.chunkRows, dtype=TRACE_DTYPE)
+            self.chunksAllocated += 1
+        self._rows = 0
+
+    #--------------------------------
+    # Writer thread
+    #--------------------------------
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            if isinstance(message, threading.Event):
+                message.set()
+                continue
+            chunk, rows = message
+            try:
+                self.file.write(chunk[:rows].tobytes())
+                self.file.flush()
+                self.chunksWritten += 1
+            except Exception as e:
+                self.writeFailures += 1
+                print("[Trace Recorder] Failed to write " + str(rows) + " rows: " + str(e))
+            self._spare.put(chunk)
+
+    # Blocks until everything recorded so far is in the file
+    def flush(self, timeout=5.0):
+        if self.file is None:
+            return
+        self._handOver()
+        done = threading.Event()
+        self._queue.put(done)
+        if not done.wait(timeout):
+            print("[Trace Recorder] Flush timed out")
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(5.0)
+        self.file.close()
+        self.file = None
+        self._thread = None
+        self._ticks = dict.fromkeys(TASKS, 0)
+
+    def stats(self):
+        return {
+            "rowsRecorded": self.rowsRecorded,
+            "chunksWritten": self.chunksWritten,
+            "chunksAllocated": self.chunksAllocated,
+            "writeFailures": self.writeFailures,
+            "meanTickTime": self.tickTime / self.tickCount if self.tickCount else 0.0,
+            "maxTickTime": self.maxTickTime,
+        }
+
+
+def anchorRecord(header):
+    wall = pd.Timestamp(header["anchor_wall"]).value
+    record = np.zeros(1, dtype=TRACE_DTYPE)
+    record[0] = (int(header["anchor_mono_ns"]), 0, ANCHOR_TASK, 0, 0, 0, wall & 0xFFFFFFFF, 0, 0, 0, wall >> 32)
+    return record
+
+
+#--------------------------------
+# Reading traces back
+#--------------------------------
+# Header and the raw records, anchor records included
+def readTrace(location):
+    with open(location, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(location + " is not a trace file")
+        length = struct.unpack("<I", f.read(4))[0]
+        header = json.loads(f.read(length).decode("utf8"))
+    offset = len(MAGIC) + 4 + length
+    count = (os.path.getsize(location) - offset) // TRACE_DTYPE.itemsize
+    return header, np.fromfile(location, dtype=TRACE_DTYPE, count=count, offset=offset)
+
+
+# Trace as a DataFrame, with task/group names and the wall clock Timestamp the results files use.
+# Every record is converted with the anchor before it (the header's, or a resume's anchor record).
+def loadTrace(location):
+    header, records = readTrace(location)
+    isAnchor = records["task"] == ANCHOR_TASK
+    anchors = records[isAnchor]
+    monoNs = np.concatenate(([int(header["anchor_mono_ns"])], anchors["t"]))
+    wallNs = np.concatenate(([pd.Timestamp(header["anchor_wall"]).value],
+                             (anchors["colour"].astype(np.int64) << 32) | anchors["item"].astype(np.int64)))
+    segment = np.cumsum(isAnchor)[~isAnchor]
+
+    df = pd.DataFrame(records[~isAnchor])
+    for column, codes in (("task", header["tasks"]), ("group", header["groups"])):
+        names = {code: name for name, code in codes.items()}
+        df[column] = pd.Categorical(df[column].map(names), categories=list(codes))
+    df.insert(0, "Timestamp", pd.to_datetime(wallNs[segment] + (df["t"].to_numpy() - monoNs[segment]), unit="ns"))
+    return df
+
+
+# Everything on one task's screen at the last tick before 'at' (a Timebase stamp, or a datetime such as the
+# Timestamp of an event row)
+def sceneAt(trace, task, at):
+    trace = trace[trace["task"] == task]
+    if isinstance(at, (int, np.integer)):
+        before = trace[trace["t"] <= at]
+    else:
+        before = trace[trace["Timestamp"] <= pd.Timestamp(at)]
+    if before.empty:
+        return before
+    # All rows of a tick share its stamp
+    return trace[trace["t"] == before["t"].iloc[-1]]
@@ -0,0 +1,307 @@
+import os, sys, io, csv, argparse
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    from AnalysisCache import analysisCache
+except ImportError:
+    # python -m Application.analyze from the repository root
+    from Application.AnalysisCache import analysisCache
+
+
+# Offline analysis of the results files.
+# The CSVs are read in chunks with explicit dtypes: the repeated text columns as categoricals, values as float32,
+# Timestamp parsed. The summary tables are built from per chunk groupby aggregates, so memory stays at about one
+# chunk however large the study gets.
+#   python analyze.py (or python -m Application.analyze) [--session S001 ...] [--participant P001 ...] [--out folder]
+# prints (or writes) one table per session and task and one per participant and task.
+# The aggregates are cached in <results>/cache (see AnalysisCache.py), so a rerun only parses the rows appended
+# since the last one. --no-cache reads everything.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Results")
+CHUNKSIZE = 500000
+
+METRIC_DTYPES = {
+    "session_id": "category", "participant_id": "category", "metric_type": "category",
+    "task_type": "category", "value": "float32", "unit": "category",
+}
+EVENT_DTYPES = {
+    "session_id": "category", "participant_id": "category", "event_type": "category", "task_type": "category",
+    "event_code": "category", "expected_bin": "category", "actual_bin": "category",
+    "item_count": "float32", "expected_count": "float32", "size": "float32", "response_ms": "float32",
+}
+
+# Events use a different task_type spelling to the metrics, these are put on the metric one
+EVENT_TASK_TYPES = {"sorting_task": "Sorting Task", "packaging_task": "Packaging Task", "inspection_task": "Inspection Task"}
+
+KEYS = ["participant_id", "session_id", "task_type"]
+# Cumulative metrics, so the last row of a session is the value for the whole session
+SESSION_METRICS = [
+    "Throughput", "Actual Error Rate", "User Accuracy", "Corrections",
+    "Average Response Time", "Response Time P50", "Response Time P90", "Response Time P99",
+]
+
+
+#--------------------------------
+# Loading
+#--------------------------------
+# Typed chunks of a results file, optionally only some sessions/participants.
+# start/end (byte offsets, end at a line boundary) parse only those rows, e.g. the ones appended since last time.
+def readChunks(location, dtypes, chunksize=CHUNKSIZE, sessions=None, participants=None, usecols=None, start=None, end=None):
+    options = {}
+    source = location
+    if start is not None and end is not None and end <= start:
+        return
+    if start is not None:
+        with open(location, "rb") as f:
+            columns = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        source = io.BufferedReader(_byteRange(location, start, end))
+        options = {"header": None, "names": columns}
+    try:
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype=dtypes, usecols=usecols, **options):
+            if sessions is not None:
+                chunk = chunk[chunk["session_id"].isin(sessions)]
+            if participants is not None:
+                chunk = chunk[chunk["participant_id"].isin(participants)]
+            if chunk.empty:
+                continue
+            if "Timestamp" in chunk.columns:
+                # Rows written at a whole second have no fraction, so the format is not the same on every row
+                chunk["Timestamp"] = pd.to_datetime(chunk["Timestamp"], format="ISO8601", errors="coerce")
+            yield chunk
+    finally:
+        if source is not location:
+            source.close()
+
+
+# Bytes start..end of a file as a stream pandas can read from
+class _byteRange(io.RawIOBase):
+    def __init__(self, location, start, end=None):
+        self.file = open(location, "rb")
+        self.file.seek(start)
+        self.remaining = (end - start) if end is not None else None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer) if self.remaining is None else min(len(buffer), self.remaining)
+        data = self.file.read(size)
+        buffer[:len(data)] = data
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+# Whole (filtered) file as one typed frame. Categories are unified first so the columns stay categorical.
+def loadTable(location, dtypes, chunksize=CHUNKSIZE, sessions=None, participants=None, usecols=None):
+    chunks = list(readChunks(location, dtypes, chunksize, sessions, participants, usecols))
+    if not chunks:
+        return pd.DataFrame(columns=usecols or list(pd.read_csv(location, nrows=0).columns))
+    for column in chunks[0].columns:
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([chunk[column] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[column] = chunk[column].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def loadMetrics(location=None, chunksize=CHUNKSIZE, sessions=None, participants=None):
+    return loadTable(location or os.path.join(RESULTS_DIR, "metrics.csv"), METRIC_DTYPES, chunksize, sessions, participants)
+
+
+def loadEvents(location=None, chunksize=CHUNKSIZE, sessions=None, participants=None):
+    return loadTable(location or os.path.join(RESULTS_DIR, "events.csv"), EVENT_DTYPES, chunksize, sessions, participants)
+
+
+#--------------------------------
+# Aggregation
+#--------------------------------
+# Per chunk aggregates of the metric rows, per (participant, session, task, metric): rows, value total/min/max,
+# first/last time and the value of the latest row. Partials of different chunks (or a cached run and the rows
+# appended since) are combined with reduceMetricPartials, metricStats turns them into the final stats.
+def metricPartials(chunks):
+    keys = KEYS + ["metric_type"]
+    partials = []
+    for chunk in chunks:
+        grouped = chunk.groupby(keys, observed=True)
+        partial = grouped.agg(rows=("value", "size"), total=("value", "sum"), low=("value", "min"), high=("value", "max"),
+                              first=("Timestamp", "min"), last=("Timestamp", "max"))
+        # Value of the latest row in each group
+        latest = chunk.loc[grouped["Timestamp"].idxmax().dropna(), keys + ["value"]].set_index(keys)["value"]
+        partial["lastValue"] = latest
+        partials.append(partial.reset_index())
+    return reduceMetricPartials(partials)
+
+
+def reduceMetricPartials(partials):
+    keys = KEYS + ["metric_type"]
+    partials = [partial for partial in partials if len(partial)]
+    if not partials:
+        return pd.DataFrame(columns=keys + ["rows", "total", "low", "high", "first", "last", "lastValue"])
+    partials = pd.concat(partials, ignore_index=True)
+    for column in keys:
+        partials[column] = partials[column].astype(str)
+    grouped = partials.groupby(keys, sort=True)
+    reduced = grouped.agg(rows=("rows", "sum"), total=("total", "sum"), low=("low", "min"), high=("high", "max"),
+                          first=("first", "min"), last=("last", "max"))
+    reduced["lastValue"] = partials.sort_values("last", kind="stable").groupby(keys)["lastValue"].last()
+    return reduced.reset_index()
+
+
+# Per (participant, session, task, metric): rows, first/last time, last value, mean, min, max.
+# The mean is over the rows in the file, with delta encoding on that is only the rows that were written.
+def metricStats(location=None, chunksize=CHUNKSIZE, sessions=None, participants=None, partials=None):
+    keys = KEYS + ["metric_type"]
+    if partials is None:
+        partials = metricPartials(readChunks(location, METRIC_DTYPES, chunksize, sessions, participants,
+                                             usecols=["Timestamp"] + keys + ["value"]))
+    partials = _select(partials, sessions, participants)
+    columns = keys + ["rows", "min", "max", "first", "last", "last_value", "mean"]
+    if partials.empty:
+        return pd.DataFrame(columns=columns)
+    stats = partials.rename(columns={"low": "min", "high": "max", "lastValue": "last_value"})
+    stats["mean"] = stats["total"] / stats["rows"]
+    return stats[columns].reset_index(drop=True)
+
+
+# Per (participant, session, task, event_code): event count and response time sum/count.
+# Only task errors and user input, the activity/session rows are what EventReplay.py works from.
+def eventPartials(chunks):
+    keys = KEYS + ["event_code"]
+    partials = []
+    for chunk in chunks:
+        chunk = chunk[chunk["event_type"].isin(("task_error", "user_input"))]
+        if chunk.empty:
+            continue
+        chunk["task_type"] = chunk["task_type"].cat.rename_categories(lambda name: EVENT_TASK_TYPES.get(name, name))
+        partial = chunk.groupby(keys, observed=True).agg(events=("response_ms", "size"), responseTotal=("response_ms", "sum"),
+                                                         responses=("response_ms", "count"))
+        partials.append(partial.reset_index())
+    return reduceEventPartials(partials)
+
+
+def reduceEventPartials(partials):
+    keys = KEYS + ["event_code"]
+    partials = [partial for partial in partials if len(partial)]
+    if not partials:
+        return pd.DataFrame(columns=keys + ["events", "responseTotal", "responses"])
+    partials = pd.concat(partials, ignore_index=True)
+    for column in keys:
+        partials[column] = partials[column].astype(str)
+    return partials.groupby(keys, sort=True).sum().reset_index()
+
+
+def eventStats(location=None, chunksize=CHUNKSIZE, sessions=None, participants=None, partials=None):
+    if partials is None:
+        partials = eventPartials(readChunks(location, EVENT_DTYPES, chunksize, sessions, participants,
+                                            usecols=KEYS + ["event_code", "event_type", "response_ms"]))
+    return _select(partials, sessions, participants).reset_index(drop=True)
+
+
+def _select(partials, sessions=None, participants=None):
+    if sessions is not None:
+        partials = partials[partials["session_id"].isin(sessions)]
+    if participants is not None:
+        partials = partials[partials["participant_id"].isin(participants)]
+    return partials
+
+
+# One row per session and task
+def sessionTable(metrics, events):
+    if metrics.empty:
+        return pd.DataFrame(columns=KEYS + ["start", "duration_s"])
+    table = metrics[metrics["metric_type"].isin(SESSION_METRICS)].pivot_table(
+        index=KEYS, columns="metric_type", values="last_value", aggfunc="last")
+    table = table.reindex(columns=[m for m in SESSION_METRICS if m in table.columns])
+    table.columns = [column.lower().replace(" ", "_") for column in table.columns]
+
+    times = metrics.groupby(KEYS).agg(first=("first", "min"), last=("last", "max"))
+    table.insert(0, "duration_s", (times["last"] - times["first"]).dt.total_seconds())
+    table.insert(0, "start", times["first"])
+    if "Throughput" in set(metrics["metric_type"]):
+        table["throughput_mean"] = metrics[metrics["metric_type"] == "Throughput"].set_index(KEYS)["mean"]
+
+    if len(events):
+        codes = events["event_code"].astype(str)
+        counts = events.assign(
+            errors=codes.str.endswith(("MISSORTED", "MISCOUNTED", "MISJUDGED")) * events["events"],
+            corrected=codes.str.endswith("CORRECTED") * events["events"],
+            false_alarms=codes.str.contains("NO_ERROR|WOULD_CREATE") * events["events"],
+        ).groupby(KEYS)[["events", "errors", "corrected", "false_alarms", "responseTotal", "responses"]].sum()
+        counts["event_response_ms"] = counts["responseTotal"] / counts["responses"].where(counts["responses"] > 0)
+        table = table.join(counts.drop(columns=["responseTotal", "responses"]), how="outer")
+        # Sessions without events have none of each
+        table[["events", "errors", "corrected", "false_alarms"]] = table[["events", "errors", "corrected", "false_alarms"]].fillna(0).astype("int64")
+    return table.reset_index()
+
+
+# One row per participant and task, from the session table
+def participantTable(sessions):
+    if sessions.empty:
+        return pd.DataFrame(columns=["participant_id", "task_type", "sessions"])
+    numeric = sessions.drop(columns=["session_id", "start"]).select_dtypes("number").columns
+    counts = [c for c in ("events", "errors", "corrected", "false_alarms") if c in numeric]
+    means = [c for c in numeric if c not in counts]
+    grouped = sessions.groupby(["participant_id", "task_type"])
+    table = grouped[means].mean().add_prefix("mean_")
+    table.insert(0, "sessions", grouped["session_id"].nunique())
+    if counts:
+        table = table.join(grouped[counts].sum())
+    return table.reset_index()
+
+
+# Partials of a whole results file through the cache, parsing only the rows it hasn't seen
+def cachedMetricPartials(cache, location, chunksize=CHUNKSIZE):
+    usecols = ["Timestamp"] + KEYS + ["metric_type", "value"]
+    return cache.update(location, "metrics", lambda start, end: metricPartials(
+        readChunks(location, METRIC_DTYPES, chunksize, usecols=usecols, start=start, end=end)), reduceMetricPartials)
+
+
+def cachedEventPartials(cache, location, chunksize=CHUNKSIZE):
+    usecols = KEYS + ["event_code", "event_type", "response_ms"]
+    return cache.update(location, "events", lambda start, end: eventPartials(
+        readChunks(location, EVENT_DTYPES, chunksize, usecols=usecols, start=start, end=end)), reduceEventPartials)
+
+
+def analyze(metricFile=None, eventFile=None, chunksize=CHUNKSIZE, sessions=None, participants=None, cache=None):
+    metricFile = metricFile or os.path.join(RESULTS_DIR, "metrics.csv")
+    eventFile = eventFile or os.path.join(RESULTS_DIR, "events.csv")
+    if cache is not None:
+        metrics = metricStats(sessions=sessions, participants=participants, partials=cachedMetricPartials(cache, metricFile, chunksize))
+        events = eventStats(sessions=sessions, participants=participants,
+                            partials=cachedEventPartials(cache, eventFile, chunksize)) if os.path.exists(eventFile) else pd.DataFrame()
+    else:
+        metrics = metricStats(metricFile, chunksize, sessions, participants)
+        events = eventStats(eventFile, chunksize, sessions, participants) if os.path.exists(eventFile) else pd.DataFrame()
+    bySession = sessionTable(metrics, events)
+    return bySession, participantTable(bySession)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per session and per participant summary tables from the results files")
+    parser.add_argument("--results", default=RESULTS_DIR)
+    parser.add_argument("--session", action="append", help="only these sessions (repeatable)")
+    parser.add_argument("--participant", action="append", help="only these participants (repeatable)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--out", help="write sessions.csv and participants.csv here instead of printing them")
+    parser.add_argument("--no-cache", action="store_true", help="read the whole files, without <results>/cache")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else analysisCache(os.path.join(args.results, "cache"))
+    bySession, byParticipant = analyze(os.path.join(args.results, "metrics.csv"), os.path.join(args.results, "events.csv"),
+                                       args.chunksize, args.session, args.participant, cache)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        bySession.to_csv(os.path.join(args.out, "sessions.csv"), index=False)
+        byParticipant.to_csv(os.path.join(args.out, "participants.csv"), index=False)
+        print("Wrote " + str(len(bySession)) + " session rows and " + str(len(byParticipant)) + " participant rows to " + args.out)
+    else:
+        with pd.option_context("display.max_columns", None, "display.width", 200):
+            print(bySession.to_string(index=False))
+            print()
+            print(byParticipant.to_string(index=False))
@@ -45,6 +45,8 @@ DISTRACTION_OPTIONS = {
 }
 SORTING_COLOURS = [("2 Colours", 2), ("3 Colours", 3)]
 PACKAGING_SIZES = [("High (6 Items)", 6), ("Medium (5 Items)", 5), ("Low (4 Items)", 4)]
+# How often metrics are sampled and written, the OCS spin box starts here
+COLLECTION_INTERVAL_MS = 1000
 RESOLUTIONS = [("2560x1440", [2560,1300]), ("1920x1080", [1920,980]), ("1366x768", [1366,668]),("1280x720", [1280,680])]
 
 def combo_from_pairs(pairs):
@@ -242,6 +244,7 @@ class OCSWindow(QMainWindow):
     playClicked  = pyqtSignal()
     pauseClicked = pyqtSignal()
     stopClicked  = pyqtSignal()
+    resumeClicked = pyqtSignal()
     settingsChanged = pyqtSignal(dict)
 
     screenResolution = pyqtSignal()
@@ -270,7 +273,9 @@ class OCSWindow(QMainWindow):
         self.start_btn = QPushButton("Start")
         self.pause_btn = QPushButton("Pause")
         self.stop_btn  = QPushButton("Stop")
-        for b in (self.start_btn, self.pause_btn, self.stop_btn):
+        # Carries on the session from the last checkpoint after a crash
+        self.resume_btn = QPushButton("Resume Session")
+        for b in (self.start_btn, self.pause_btn, self.stop_btn, self.resume_btn):
             b.setCursor(Qt.PointingHandCursor)
 
         # Screen Size Dropdown
@@ -288,9 +293,18 @@ class OCSWindow(QMainWindow):
         self.start_btn.clicked.connect(self._on_start_clicked)
         self.pause_btn.clicked.connect(lambda: self.pauseClicked.emit())
         self.stop_btn.clicked.connect(lambda: self.stopClicked.emit())
+        self.resume_btn.clicked.connect(lambda: self.resumeClicked.emit())
 
         self.getParNum = QSpinBox(self)
 
+        # Metric sampling interval
+        self.sampleInterval = QSpinBox(self)
+        self.sampleInterval.setRange(100, 10000)
+        self.sampleInterval.setSingleStep(100)
+        self.sampleInterval.setSuffix(" ms")
+        self.sampleInterval.setValue(COLLECTION_INTERVAL_MS)
+        self.sampleInterval.valueChanged.connect(self._on_sample_interval_changed)
+
 
         # Left rail layout
         rail = QVBoxLayout()
@@ -309,10 +323,13 @@ class OCSWindow(QMainWindow):
         rail.addWidget(self.start_btn)
         rail.addWidget(self.pause_btn)
         rail.addWidget(self.stop_btn)
+        rail.addWidget(self.resume_btn)
         rail.addWidget(self.resolutionDrop)
         rail.addSpacing(10)
         rail.addWidget(QLabel("Participant Number:"))
         rail.addWidget(self.getParNum)
+        rail.addWidget(QLabel("Metric Sample Interval:"))
+        rail.addWidget(self.sampleInterval)
 
         rail.addStretch(1)
         rail_w = QWidget(); rail_w.setLayout(rail)
@@ -343,6 +360,8 @@ class OCSWindow(QMainWindow):
         iForm.addRow("Throughput (Box/s)", self.iThroughput)
         self.iCorrections = QLabel("—")
         iForm.addRow("Corrections", self.iCorrections)
+        self.iRespPercentiles = QLabel("—")
+        iForm.addRow("Resp. P50 / P90 / P99 (s)", self.iRespPercentiles)
         iGb.setLayout(iForm)
 
         sGb = QGroupBox('SORTING')
@@ -353,6 +372,8 @@ class OCSWindow(QMainWindow):
         sForm.addRow("Throughput (Box/s)", self.sThroughput)
         self.sCorrections = QLabel("—")
         sForm.addRow("Corrections", self.sCorrections)
+        self.sRespPercentiles = QLabel("—")
+        sForm.addRow("Resp. P50 / P90 / P99 (s)", self.sRespPercentiles)
         sGb.setLayout(sForm)
 
         pGb = QGroupBox('SORTING')
@@ -363,6 +384,8 @@ class OCSWindow(QMainWindow):
         pForm.addRow("Throughput (Box/s)", self.pThroughput)
         self.pCorrections = QLabel("—")
         pForm.addRow("Corrections", self.pCorrections)
+        self.pRespPercentiles = QLabel("—")
+        pForm.addRow("Resp. P50 / P90 / P99 (s)", self.pRespPercentiles)
         pGb.setLayout(pForm)
         
         stats_grid.addWidget(sGb, 0, 0)
@@ -445,6 +468,7 @@ class OCSWindow(QMainWindow):
             self.sErrorRate.setText(str(round(sMetrics[1],2)))
             self.sThroughput.setText(str(round(sMetrics[0],2)))
             self.sCorrections.setText(str(round(sMetrics[3],2)))
+            self.sRespPercentiles.setText(" / ".join(str(round(v,2)) for v in sMetrics[5:8]))
             if not self.yAccS[-1] == round(sMetrics[2],2):
                 self.updatePlot("sAcc", round(sMetrics[2],2))
             if not self.yRespS[-1] == round(sMetrics[4],2):
@@ -454,6 +478,7 @@ class OCSWindow(QMainWindow):
             self.pErrorRate.setText(str(round(pMetrics[1],2)))
             self.pThroughput.setText(str(round(pMetrics[0],2)))
             self.pCorrections.setText(str(round(pMetrics[3],2)))
+            self.pRespPercentiles.setText(" / ".join(str(round(v,2)) for v in pMetrics[5:8]))
             if not self.yAccP[-1] == round(pMetrics[2],2):
                 self.updatePlot("pAcc", round(pMetrics[2],2))
             if not self.yRespP[-1] == round(pMetrics[4],2):
@@ -463,6 +488,7 @@ class OCSWindow(QMainWindow):
             self.iErrorRate.setText(str(round(iMetrics[1],2)))
             self.iThroughput.setText(str(round(iMetrics[0],2)))
             self.iCorrections.setText(str(round(iMetrics[3],2)))
+            self.iRespPercentiles.setText(" / ".join(str(round(v,2)) for v in iMetrics[5:8]))
             if not self.yAccI[-1] == round(iMetrics[2],2):
                 self.updatePlot("iAcc", round(iMetrics[2],2))
             if not self.yRespI[-1] == round(iMetrics[4],2):
@@ -541,15 +567,30 @@ class OCSWindow(QMainWindow):
                 self.sRespCanvas.draw()
 
     def startCollectionTimer(self):
-        self.collectionTimer.start(1000)
-        
+        self.dataManager.startSession()
+        self.collectionTimer.start(self.sampleInterval.value())
+
+    def _on_sample_interval_changed(self, value):
+        # Takes effect straight away if we are already collecting
+        if self.collectionTimer.isActive():
+            self.collectionTimer.start(value)
 
     def stopCollectionTimer(self, pause):
-        if not pause:
+        self.collectionTimer.stop()
+        self.dataManager.pauseSession()
+        if pause == "stop":
+            self.dataManager.finishSession()
+
+        # Make sure everything from this session is on disk before anything reads the files back
+        self.dataManager.flushWrites()
+
+        if pause == "stop":
+            summary = ", ".join(row["task_type"] + " " + str(row["boxes_processed"]) + " boxes" for row in self.dataManager.lastSummary)
+            self._info("Session " + self.dataManager.currentSessionID + " summarised" + (": " + summary if summary else ""))
+            self.dataManager.archiveSession(self.dataManager.currentSessionID)
+            self.dataManager.endSession()
             # Set Session once Task Stopped
             self.dataManager.getPreviousIDs()
-        
-        self.collectionTimer.stop()
 
     # ---------- save / load ----------
     def save_json(self):
@@ -582,15 +623,29 @@ class OCSWindow(QMainWindow):
         try:
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
-            self.sorting.from_dict(data.get("sortingTask", {}))
-            self.packaging.from_dict(data.get("packagingTask", {}))
-            self.inspection.from_dict(data.get("inspectionTask", {}))
+            self.applyScenario(data)
             self._info(f"Loaded: {os.path.basename(path)}")
             # also push settings to main when a file is loaded (Week-12)
             self._emit_settings()
         except Exception as e:
             self._error(f"Failed to load: {e}")
 
+    # Column settings (same shape as the scenario files) plus the resolution, used by checkpoints
+    def scenario(self):
+        return {
+            "sortingTask": self.sorting.to_dict(),
+            "packagingTask": self.packaging.to_dict(),
+            "inspectionTask": self.inspection.to_dict(),
+            "resolution": self.resolutionDrop.currentData(),
+        }
+
+    def applyScenario(self, data):
+        self.sorting.from_dict(data.get("sortingTask", {}))
+        self.packaging.from_dict(data.get("packagingTask", {}))
+        self.inspection.from_dict(data.get("inspectionTask", {}))
+        if data.get("resolution") is not None:
+            _set_combo_by_data(self.resolutionDrop, data["resolution"])
+
     # ---------- signal helpers ----------
     def _on_start_clicked(self):
         # emit settings first so main creates/updates task, then play
@@ -599,7 +654,9 @@ class OCSWindow(QMainWindow):
         self.dataManager.setNewParticipantID(self.getParNum.value())
 
     def _emit_settings(self):
+        self.settingsChanged.emit(self.currentSettings())
 
+    def currentSettings(self):
         d = self.sorting.to_dict()
         dPack = self.packaging.to_dict()
         dInsp = self.inspection.to_dict()
@@ -631,7 +688,7 @@ class OCSWindow(QMainWindow):
             },
             "resolution": self.resolutionDrop.currentData()
         }
-        self.settingsChanged.emit(settings)
+        return settings
 
     # ---------- messaging ----------
     def _error(self, msg):
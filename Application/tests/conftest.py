@@ -0,0 +1,4 @@
+import os, sys
+
+# The application modules import each other by name (from Timebase import stamp), like windowRender.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,32 @@
+import random
+
+import Checkpoint
+from SimulationCore import virtualClock, sortingSim, packagingSim, inspectionSim
+from DataCollection import dataCollection
+
+
+# A resumed task has empty conveyors and bins, so none of the errors that were in them can still be corrected
+def test_resume_starts_with_no_errors_left_to_correct(tmp_path):
+    dataManager = dataCollection(str(tmp_path))
+    try:
+        clock = virtualClock()
+        build = {
+            "sorting": lambda: sortingSim(0.1, 1000, 3, [], 800, 1300, dataManager, clock, random.Random(1)),
+            "packaging": lambda: packagingSim(0.1, 1000, 5, [False, False], 800, 1300, dataManager, clock, random.Random(1)),
+            "inspection": lambda: inspectionSim(0.1, 1000, 9, [False, False], 800, 1300, dataManager, clock, random.Random(1)),
+        }
+        for name, create in build.items():
+            task = create()
+            task.totalError, task.successfulCorrections = 5, 2
+            outstanding = "defectsMissed" if name == "inspection" else "error"
+            setattr(task, outstanding, 3)
+            task.responseTimer = [1500, 0, 250] if name == "sorting" else 1500
+            state = Checkpoint.taskState(task, name)
+
+            resumed = create()
+            Checkpoint.restoreTask(resumed, name, state)
+            assert (resumed.totalError, resumed.successfulCorrections) == (5, 2)
+            assert getattr(resumed, outstanding) == 0
+            assert resumed.responseTimer in ([0, 0, 0], 0)
+    finally:
+        dataManager.close()
@@ -0,0 +1,43 @@
+import socket, time
+
+import DataCollection
+from ClockSync import clockSync, recorderServer
+from DataCollection import dataCollection
+
+
+def test_final_burst_runs_on_the_sync_thread():
+    server = recorderServer(("127.0.0.1", 0))
+    server.start()
+    sync = clockSync(server.address)
+    try:
+        sync.start(interval=60)
+        deadline = time.time() + 5
+        while not sync.points and time.time() < deadline:
+            time.sleep(0.01)
+        sync.stop(finalBurst=True, timeout=5)
+        assert len(sync.points) == 2
+    finally:
+        sync.close()
+        server.stop()
+
+
+# A recorder that went away mid-session: every probe times out, Stop must not wait for a burst of them
+def test_stop_does_not_wait_on_a_silent_recorder(tmp_path, monkeypatch):
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+    monkeypatch.setattr(DataCollection, "CLOCK_SYNC_ADDRESS", silent.getsockname())
+    dataManager = dataCollection(str(tmp_path), clockSync=True)
+    try:
+        sync = dataManager.clockSync
+        sync.start(interval=0.01)
+        deadline = time.time() + 5
+        while sync.lost < sync.burstSize and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+
+        start = time.perf_counter()
+        assert dataManager.writeClockSync() is None
+        assert time.perf_counter() - start < DataCollection.CLOCK_SYNC_FINAL_WAIT_S + 0.2
+    finally:
+        dataManager.close()
+        silent.close()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from DeltaEncoding import metricDeltaFilter, expandMetricSeries, loadExpandedMetrics
+
+COLUMNS = ["Timestamp", "session_id", "participant_id", "metric_type", "task_type", "value", "unit"]
+START = pd.Timestamp("2026-01-01 10:00:00")
+
+
+# One row per second per series, like the collection timer writes them. Values hold still for a while, then jump,
+# plus some jitter below epsilon.
+def fullSeries(seconds=600, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for task in ("Sorting Task", "Packaging Task"):
+        for metric, unit in (("Throughput", "box/s"), ("Error Rate", "%")):
+            level = 0.0
+            for t in range(seconds):
+                if rng.random() < 0.05:
+                    level = round(float(rng.uniform(0, 50)), 3)
+                jitter = float(rng.uniform(-0.004, 0.004))
+                rows.append([START + pd.Timedelta(seconds=t), "S001", "P001", metric, task, level + jitter, unit])
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+# What DataCollection writes with the filter on: the rows it lets through, then the closing keyframes at the stop
+def encode(full, deltaFilter):
+    kept = []
+    for row in full.itertuples(index=False):
+        now = (row.Timestamp - START).total_seconds()
+        if deltaFilter.shouldEmit(row.task_type, row.metric_type, row.value, row.unit, now=now):
+            kept.append(list(row))
+    end = full["Timestamp"].max()
+    for task, metric, value, unit in deltaFilter.closingKeyframes():
+        kept.append([end, "S001", "P001", metric, task, value, unit])
+    return pd.DataFrame(kept, columns=COLUMNS)
+
+
+def aligned(expanded, full):
+    keys = ["Timestamp", "task_type", "metric_type"]
+    return full.merge(expanded, on=keys, suffixes=("", "_decoded"), how="left")
+
+
+def test_round_trip_within_epsilon(tmp_path):
+    full = fullSeries()
+    deltaFilter = metricDeltaFilter(epsilon=0.01, keyframeInterval=30.0)
+    encoded = encode(full, deltaFilter)
+    assert len(encoded) < len(full) / 3
+    assert deltaFilter.rowsSeen == len(full)
+    assert deltaFilter.rowsSeen - deltaFilter.rowsSuppressed + 4 == len(encoded)
+
+    # Through the file, like a reader gets it
+    path = tmp_path / "metrics.csv"
+    encoded.to_csv(path, index=False)
+    expanded = loadExpandedMetrics(str(path), "1s", session_id="S001")
+
+    merged = aligned(expanded, full)
+    assert len(expanded) == len(full)
+    assert merged["value_decoded"].notna().all()
+    assert (merged["value"] - merged["value_decoded"]).abs().max() <= 0.01 + 1e-9
+
+
+def test_epsilon_zero_is_lossless():
+    full = fullSeries(seconds=200, seed=4)
+    expanded = expandMetricSeries(encode(full, metricDeltaFilter(epsilon=0.0)), "1s")
+    merged = aligned(expanded, full)
+    assert np.array_equal(merged["value"].to_numpy(), merged["value_decoded"].to_numpy())
+
+
+def test_keyframes_bound_the_gaps():
+    full = fullSeries(seconds=400, seed=2)
+    encoded = encode(full, metricDeltaFilter(epsilon=100.0, keyframeInterval=30.0))
+    for _, series in encoded.groupby(["task_type", "metric_type"]):
+        gaps = series["Timestamp"].sort_values().diff().dropna().dt.total_seconds()
+        assert gaps.max() <= 30
+
+
+def test_per_metric_epsilon():
+    deltaFilter = metricDeltaFilter(epsilon=0.0, epsilons={"Throughput": 1.0})
+    assert deltaFilter.shouldEmit("Sorting Task", "Throughput", 5.0, now=0)
+    assert not deltaFilter.shouldEmit("Sorting Task", "Throughput", 5.5, now=1)
+    assert deltaFilter.shouldEmit("Sorting Task", "Throughput", 6.5, now=2)
+    assert deltaFilter.shouldEmit("Sorting Task", "Error Rate", 5.0, now=0)
+    assert deltaFilter.shouldEmit("Sorting Task", "Error Rate", 5.001, now=1)
+
+    deltaFilter.reset()
+    assert deltaFilter.shouldEmit("Sorting Task", "Throughput", 5.5, now=3)
+    assert deltaFilter.closingKeyframes() == [("Sorting Task", "Throughput", 5.5, None)]
+
+
+def test_expand_empty_frame():
+    empty = pd.DataFrame(columns=COLUMNS)
+    assert expandMetricSeries(empty).empty
@@ -0,0 +1,16 @@
+import EventBus
+from DataCollection import dataCollection
+
+
+# The GUI only pumps the metrics every collection interval, a burst bigger than any bounded queue must still count
+def test_metrics_keep_every_message_until_pumped(tmp_path):
+    dataManager = dataCollection(str(tmp_path))
+    try:
+        dataManager.bus.publish(EventBus.TASK_STARTED, "sorting")
+        for _ in range(25000):
+            dataManager.bus.publish(EventBus.BOX_PROCESSED, "sorting")
+        dataManager.bus.pump("metrics")
+        assert dataManager.metricsEngine.snapshot("sorting")["processed"] == 25000
+        assert dataManager.bus.subscribers["metrics"].dropped == 0
+    finally:
+        dataManager.close()
@@ -0,0 +1,139 @@
+import os, json, random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import Timebase, EventBus
+from SimulationCore import virtualClock, createTasks, COLLECTION_INTERVAL_MS
+from DataCollection import dataCollection
+from ErrorCalibration import scenarioSettings
+from SyntheticOperator import attachOperators
+from EventReplay import loadActivity, replaySession, expandingQuantiles, streamingQuantiles
+
+SCENARIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Scenarios", "Stress_Test_Alll_Tasks.json")
+PREFIXES = {"SORT": "Sorting Task", "PACK": "Packaging Task", "INSPECT": "Inspection Task"}
+RESPONSE_METRICS = ("Average Response Time", "Response Time P50", "Response Time P90", "Response Time P99")
+
+
+# Headless session like SimulationCore.runSession, with a pause and the sorting task started again part way,
+# the way the OCS does when a task window is closed and opened within a session
+def recordSession(resultsDir, seed=3):
+    with open(SCENARIO, "r", encoding="utf8") as f:
+        settings = scenarioSettings(json.load(f), True)
+    clock = virtualClock()
+    Timebase.useClock(clock.stamp)
+    dataManager = dataCollection(resultsDir)
+    try:
+        tasks = createTasks(settings, dataManager, clock, random.Random(seed))
+        operators = attachOperators(tasks, "average", random.Random(seed))
+
+        def collect():
+            dataManager.retrieveMetrics()
+            dataManager.bus.flush()
+
+        dataManager.startSession()
+        collector = clock.timer()
+        collector.timeout.connect(collect)
+        collector.start(COLLECTION_INTERVAL_MS)
+        for task in tasks.values():
+            task.startTask()
+        for op in operators.values():
+            op.start()
+        clock.run(50.0)
+
+        dataManager.pauseSession()
+        for task in tasks.values():
+            task.pause()
+        clock.run(5.0)
+        dataManager.startSession()
+        for task in tasks.values():
+            task.resume()
+        # Off the collection grid so the restart doesn't land on a sample
+        clock.run(40.5)
+
+        operators["sorting"].stop()
+        tasks["sorting"].pause()
+        dataManager.bus.publish(EventBus.TASK_STOPPED, "sorting")
+        only = dict(settings)
+        for name in ("inspectionTask", "packagingTask"):
+            only[name] = dict(settings[name], active=False)
+        tasks["sorting"] = createTasks(only, dataManager, clock, random.Random(seed + 1))["sorting"]
+        tasks["sorting"].startTask()
+        operators["sorting"] = attachOperators({"sorting": tasks["sorting"]}, "average", random.Random(seed + 1))["sorting"]
+        operators["sorting"].start()
+        clock.run(80.0)
+
+        for op in operators.values():
+            op.stop()
+        for name, task in tasks.items():
+            task.pause()
+            dataManager.bus.publish(EventBus.TASK_STOPPED, name)
+        collector.stop()
+        dataManager.pauseSession()
+        dataManager.finishSession()
+        dataManager.flushWrites()
+        dataManager.endSession()
+    finally:
+        dataManager.close()
+        Timebase.useClock()
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory):
+    resultsDir = str(tmp_path_factory.mktemp("replay"))
+    recordSession(resultsDir)
+    recorded = pd.read_csv(os.path.join(resultsDir, "metrics.csv"))
+    recorded["Timestamp"] = pd.to_datetime(recorded["Timestamp"], format="ISO8601")
+    events = loadActivity(os.path.join(resultsDir, "events.csv"))
+    return recorded, events
+
+
+def test_replay_matches_recorded_metrics(session):
+    recorded, events = session
+    codes = events["event_code"]
+    assert (codes == "SORT_TASK_STARTED").sum() == 2
+    assert (codes == "SESSION_PAUSED").sum() == 2
+
+    replayed = replaySession(events, at=recorded["Timestamp"].drop_duplicates().sort_values())
+    both = recorded.merge(replayed, on=["Timestamp", "metric_type", "task_type"], suffixes=("", "_replayed"), how="left")
+    assert both["value_replayed"].notna().all()
+
+    # A sample at the very ns of one of the task's events can't tell from the log whether the app counted it yet
+    # (the virtual clock makes those ties common). Response time rows are written at their event, so always tie.
+    taskTypes = codes.str.split("_").str[0].map(PREFIXES)
+    ties = set(zip(events["Timestamp"], taskTypes))
+    tied = pd.Series([key in ties for key in zip(both["Timestamp"], both["task_type"])], index=both.index)
+    compared = both[~tied | both["metric_type"].isin(RESPONSE_METRICS)]
+
+    np.testing.assert_allclose(compared["value_replayed"], compared["value"], rtol=1e-9, atol=1e-9)
+    # Enough of the sorting task after its restart is checked
+    restart = events.loc[codes == "SORT_TASK_STARTED", "Timestamp"].iloc[-1]
+    after = compared[(compared["task_type"] == "Sorting Task") & (compared["Timestamp"] > restart) & (compared["metric_type"] == "Corrections")]
+    assert len(after) > 30
+    assert (after["value"] < compared.loc[compared["metric_type"] == "Corrections", "value"].max()).any()
+
+
+def test_counts_start_again_at_task_restart(session):
+    _, events = session
+    restart = events.loc[events["event_code"] == "SORT_TASK_STARTED", "Timestamp"].iloc[-1]
+    replayed = replaySession(events, at=[restart + pd.Timedelta(milliseconds=1)])
+    corrections = replayed[(replayed["metric_type"] == "Corrections") & (replayed["task_type"] == "Sorting Task")]
+    assert corrections["value"].tolist() == [0.0]
+
+
+def test_quantiles():
+    values = np.random.default_rng(5).lognormal(7, 0.5, 400)
+    exact = expandingQuantiles(values, (0.5, 0.9))
+    for n in (1, 2, 7, 100, 400):
+        for q in (0.5, 0.9):
+            assert exact[q][n] == pytest.approx(np.quantile(values[:n], q))
+
+    # Fed one at a time like the app, the same estimator gives the same values
+    from StreamingStats import p2Quantile
+    streaming = streamingQuantiles(values, (0.5,))
+    estimator = p2Quantile(0.5)
+    for n, value in enumerate(values, 1):
+        estimator.add(value)
+        assert streaming[0.5][n] == estimator.value()
+    assert streaming[0.5][0] == 0.0
@@ -0,0 +1,99 @@
+import os, sys, csv, json, time, subprocess
+
+import pytest
+
+from IDLedger import idLedger, fileLock, idNumber, readLastRow
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def writeEvents(path, rows, columns=("Timestamp", "session_id", "participant_id", "details")):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def test_idNumber():
+    assert idNumber("S012") == 12
+    assert idNumber("P7") == 7
+    assert idNumber(None) == 0
+    assert idNumber("") == 0
+    assert idNumber("none") == 0
+
+
+def test_allocates_in_sequence(tmp_path):
+    ledger = idLedger(str(tmp_path / "ids.json"), str(tmp_path / "events.csv"))
+    assert ledger.allocateSession() == ("S001", "P001")
+    ledger.setParticipant("P004")
+    assert ledger.allocateSession() == ("S002", "P004")
+    assert ledger.allocateSession() == ("S003", "P004")
+    with open(tmp_path / "ids.json") as f:
+        assert json.load(f) == {"lastSessionID": "S003", "lastParticipantID": "P004"}
+
+
+def test_recovers_from_event_log_when_ledger_missing_or_behind(tmp_path):
+    events = str(tmp_path / "events.csv")
+    writeEvents(events, [["t", "S001", "P001", "a"], ["t", "S041", "P009", "b"]])
+    ledger = idLedger(str(tmp_path / "ids.json"), events)
+    assert ledger.allocateSession() == ("S042", "P009")
+
+    # A ledger restored from an older copy loses against the event log
+    with open(tmp_path / "ids.json", "w") as f:
+        json.dump({"lastSessionID": "S010", "lastParticipantID": "P002"}, f)
+    assert ledger.allocateSession() == ("S042", "P009")
+
+
+def test_corrupt_ledger_and_shard_sessions(tmp_path):
+    (tmp_path / "ids.json").write_text("{not json")
+    ledger = idLedger(str(tmp_path / "ids.json"), str(tmp_path / "events.csv"), lambda: "S077")
+    assert ledger.allocateSession() == ("S078", "P001")
+
+
+def test_readLastRow_long_and_quoted_rows(tmp_path):
+    events = str(tmp_path / "events.csv")
+    # Last row longer than one read block, with commas and newlines inside quotes in the row before it
+    writeEvents(events, [["t", "S001", "P001", 'a, "quoted"\nvalue'], ["t", "S002", "P003", "x" * 10000]])
+    row = readLastRow(events, blockSize=512)
+    assert row["session_id"] == "S002" and row["participant_id"] == "P003" and row["details"] == "x" * 10000
+
+    writeEvents(events, [])
+    assert readLastRow(events) is None
+    assert readLastRow(str(tmp_path / "missing.csv")) is None
+
+
+def test_lock_is_exclusive_and_times_out(tmp_path):
+    path = str(tmp_path / "ids.json.lock")
+    with fileLock(path):
+        assert os.path.exists(path)
+        with pytest.raises(TimeoutError):
+            with fileLock(path, timeout=0.1):
+                pass
+    assert not os.path.exists(path)
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    path = str(tmp_path / "ids.json.lock")
+    with open(path, "w") as f:
+        f.write("crashed 1")
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    with fileLock(path, timeout=0.5, staleAfter=30):
+        pass
+    assert not os.path.exists(path)
+
+
+def test_processes_never_get_the_same_id(tmp_path):
+    script = ("import sys; sys.path.insert(0, sys.argv[1]); from IDLedger import idLedger\n"
+              "l = idLedger(sys.argv[2], sys.argv[3])\n"
+              "print(' '.join(l.allocateSession()[0] for _ in range(25)))")
+    args = [sys.executable, "-c", script, APP_DIR, str(tmp_path / "ids.json"), str(tmp_path / "events.csv")]
+    workers = [subprocess.Popen(args, stdout=subprocess.PIPE, text=True) for _ in range(6)]
+    ids = []
+    for worker in workers:
+        out, _ = worker.communicate(timeout=60)
+        assert worker.returncode == 0
+        ids += [i for i in out.split() if i.startswith("S")]
+
+    assert len(ids) == 150
+    assert sorted(ids, key=idNumber) == ["S" + str(n).zfill(3) for n in range(1, 151)]
@@ -0,0 +1,143 @@
+import os
+
+import pandas as pd
+import pytest
+
+from ResultsWriter import resultsWriter
+from SessionIndex import sessionIndex, load_session, load_participant, splitRuns, INDEX_SUFFIX
+
+COLUMNS = ["Timestamp", "session_id", "participant_id", "metric_type", "value"]
+
+
+def rows(session, participant, count, start=0):
+    # Quoted commas so a naive line split would go wrong
+    return [("2026-01-01 10:00:%02d" % ((start + i) % 60), session, participant, "Throughput, windowed", float(start + i))
+            for i in range(count)]
+
+
+def newFile(path):
+    pd.DataFrame(columns=COLUMNS).to_csv(path, index=False)
+
+
+def appendExternally(path, newRows):
+    pd.DataFrame(newRows, columns=COLUMNS, dtype=object).to_csv(path, mode="a", header=False, index=False)
+
+
+def expected(path, session=None, participant=None):
+    df = pd.read_csv(path)
+    if session is not None:
+        df = df[df["session_id"] == session]
+    if participant is not None:
+        df = df[df["participant_id"] == participant]
+    return df.reset_index(drop=True)
+
+
+def assertIndexCoversFile(path):
+    entries = sessionIndex(path).load()
+    header = len(open(path, "rb").readline())
+    assert entries[0][2] == header
+    for previous, entry in zip(entries, entries[1:]):
+        assert previous[3] == entry[2]
+    assert entries[-1][3] == os.path.getsize(path)
+
+
+@pytest.fixture
+def writer():
+    w = resultsWriter(batchSize=50, flushInterval=60)
+    yield w
+    w.close()
+
+
+def test_writer_index_matches_full_read(tmp_path, writer):
+    path = str(tmp_path / "metrics.csv")
+    newFile(path)
+    writer.registerFile(path, COLUMNS, indexed=True)
+    for session, participant in (("S001", "P001"), ("S002", "P001"), ("S001", "P001"), ("S003", "P002")):
+        for row in rows(session, participant, 120):
+            writer.write(path, row)
+        writer.flush()
+
+    for session in ("S001", "S002", "S003"):
+        pd.testing.assert_frame_equal(load_session(path, session), expected(path, session))
+    pd.testing.assert_frame_equal(load_participant(path, "P002"), expected(path, participant="P002"))
+    assertIndexCoversFile(path)
+
+
+def test_rows_appended_by_someone_else_between_batches(tmp_path, writer):
+    path = str(tmp_path / "metrics.csv")
+    newFile(path)
+    writer.registerFile(path, COLUMNS, indexed=True)
+
+    for row in rows("S001", "P001", 60):
+        writer.write(path, row)
+    writer.flush()
+    # A shard merge or a second process appends while the writer keeps the file open
+    appendExternally(path, rows("S007", "P003", 40) + rows("S001", "P001", 5, start=100))
+    for row in rows("S002", "P001", 60):
+        writer.write(path, row)
+    writer.flush()
+
+    # The writer's own index file (not just a reader's catch up) has the external rows
+    persisted = sessionIndex(path)._read()[0]
+    assert any(entry[0] == "S007" for entry in persisted)
+    assertIndexCoversFile(path)
+    for session in ("S001", "S002", "S007"):
+        pd.testing.assert_frame_equal(load_session(path, session), expected(path, session))
+    assert len(load_session(path, "S001")) == 65
+
+
+def test_reader_catches_up_without_writer(tmp_path, writer):
+    path = str(tmp_path / "metrics.csv")
+    newFile(path)
+    writer.registerFile(path, COLUMNS, indexed=True)
+    for row in rows("S001", "P001", 30):
+        writer.write(path, row)
+    writer.flush()
+
+    appendExternally(path, rows("S002", "P001", 10))
+    pd.testing.assert_frame_equal(load_session(path, "S002"), expected(path, "S002"))
+
+
+def test_rebuilds_after_header_rewrite_and_truncation(tmp_path, writer):
+    from DataCollection import upgradeHeader
+
+    path = str(tmp_path / "metrics.csv")
+    newFile(path)
+    writer.registerFile(path, COLUMNS, indexed=True)
+    for row in rows("S001", "P001", 30) + rows("S002", "P001", 30):
+        writer.write(path, row)
+    writer.flush()
+
+    # Header grows, every offset moves
+    upgradeHeader(path, COLUMNS + ["unit"])
+    writer.registerFile(path, COLUMNS + ["unit"], indexed=True)
+    for row in rows("S003", "P001", 30):
+        writer.write(path, row + ("box / s",))
+    writer.flush()
+    assertIndexCoversFile(path)
+    # Sessions from before the upgrade have an empty unit, read alone that column comes back as float
+    for session in ("S001", "S002", "S003"):
+        pd.testing.assert_frame_equal(load_session(path, session), expected(path, session), check_dtype=False)
+
+    # File replaced by a shorter one, the stale index must not be trusted
+    df = pd.read_csv(path)
+    df[df["session_id"] == "S003"].to_csv(path, index=False)
+    pd.testing.assert_frame_equal(load_session(path, "S003"), expected(path, "S003"))
+    assert load_session(path, "S001").empty
+
+
+def test_half_written_index_line_is_ignored(tmp_path):
+    path = str(tmp_path / "metrics.csv")
+    newFile(path)
+    appendExternally(path, rows("S001", "P001", 10))
+    index = sessionIndex(path)
+    index.prepare()
+    with open(path + INDEX_SUFFIX, "a") as f:
+        f.write("S009,P001,12")
+    pd.testing.assert_frame_equal(load_session(path, "S001"), expected(path, "S001"))
+
+
+def test_splitRuns():
+    data = rows("S001", "P001", 2) + rows("S002", "P001", 1) + rows("S001", "P001", 1)
+    runs = splitRuns(data, COLUMNS)
+    assert [(s, p, len(r)) for s, p, r in runs] == [("S001", "P001", 2), ("S002", "P001", 1), ("S001", "P001", 1)]
@@ -0,0 +1,97 @@
+import csv
+
+import pandas as pd
+import pytest
+
+from MetricsEngine import metricsEngine, correctedShare, legacyAccuracy
+from SessionSummary import SUMMARY_COLUMNS, summaryRow, loadSummaries, normalizeAccuracy
+from ResultsStore import resultsStore
+
+RESPONSE = {"count": 0, "mean": 0.0, "std": 0.0, "min": 0.0, "max": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0}
+OLD_COLUMNS = SUMMARY_COLUMNS[:SUMMARY_COLUMNS.index("legacy_accuracy")]
+
+
+def snapshotWith(processed, injected, corrected):
+    engine = metricsEngine()
+    engine.clock.start()
+    for _ in range(processed):
+        engine.recordProcessed("sorting")
+    for _ in range(injected):
+        engine.recordError("sorting")
+    for _ in range(corrected):
+        engine.recordCorrection("sorting")
+    return engine.snapshot("sorting")
+
+
+@pytest.mark.parametrize("injected, corrected", [(0, 0), (5, 0), (6, 5), (5, 5), (3, 4)])
+def test_summary_accuracy_is_bounded(injected, corrected):
+    snap = snapshotWith(20, injected, corrected)
+    row = dict(zip(SUMMARY_COLUMNS, summaryRow("S001", "P001", "Sorting Task", snap, RESPONSE, "t")))
+
+    assert 0 <= row["accuracy"] <= 100
+    assert row["accuracy"] == (100 if injected == 0 else min(100, corrected / injected * 100))
+    assert row["legacy_accuracy"] == legacyAccuracy(injected - corrected, corrected)
+
+
+def test_correctedShare_matches_window_accuracy():
+    snap = snapshotWith(20, 6, 5)
+    for values in snap["windows"].values():
+        assert values["accuracy"] == correctedShare(6, 5)
+
+
+def writeRows(path, columns, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def oldRow(session, injected, corrected, accuracy):
+    row = dict.fromkeys(OLD_COLUMNS, 0)
+    row.update({"Timestamp": "2026-01-01 10:00:00", "session_id": session, "participant_id": "P001", "task_type": "Sorting Task",
+                "injected_errors": injected, "corrections": corrected, "accuracy": accuracy})
+    return [row[c] for c in OLD_COLUMNS]
+
+
+def test_old_rows_are_normalized(tmp_path):
+    # Written before legacy_accuracy: 5 of 6 corrected was stored as 500
+    path = tmp_path / "summary.csv"
+    writeRows(path, OLD_COLUMNS, [oldRow("S001", 6, 5, 500.0), oldRow("S002", 0, 0, 100.0), oldRow("S003", 4, 0, 0.0)])
+    df = loadSummaries(str(path))
+    assert list(df["accuracy"]) == pytest.approx([500 / 6, 100.0, 0.0])
+    assert list(df["legacy_accuracy"]) == [500.0, 100.0, 0.0]
+
+
+def test_upgraded_file_mixes_old_and_new_rows(tmp_path):
+    from DataCollection import upgradeHeader
+
+    path = tmp_path / "summary.csv"
+    writeRows(path, OLD_COLUMNS, [oldRow("S001", 6, 5, 500.0)])
+    upgradeHeader(str(path), SUMMARY_COLUMNS)
+    new = summaryRow("S002", "P001", "Sorting Task", snapshotWith(10, 6, 5), RESPONSE, "2026-01-01 11:00:00")
+    with open(path, "a", newline="") as f:
+        csv.writer(f).writerow(new)
+
+    df = loadSummaries(str(path))
+    assert list(df["session_id"]) == ["S001", "S002"]
+    assert list(df["accuracy"]) == pytest.approx([500 / 6, 500 / 6])
+    assert list(df["legacy_accuracy"]) == pytest.approx([500.0, 500.0])
+
+
+def test_store_summaries_are_normalized(tmp_path):
+    path = tmp_path / "summary.csv"
+    writeRows(path, OLD_COLUMNS, [oldRow("S001", 6, 5, 500.0)])
+    store = resultsStore(str(tmp_path / "results.db"))
+    try:
+        store.importCSV(summaryFile=str(path))
+        df = store.summaries()
+    finally:
+        store.close()
+    assert df["accuracy"].iloc[0] == pytest.approx(500 / 6)
+    assert df["legacy_accuracy"].iloc[0] == 500.0
+
+
+def test_normalize_leaves_new_rows_alone():
+    df = pd.DataFrame({"injected_errors": [6], "corrections": [5], "accuracy": [83.3], "legacy_accuracy": [500.0]})
+    out = normalizeAccuracy(df)
+    assert out["accuracy"].iloc[0] == 83.3 and out["legacy_accuracy"].iloc[0] == 500.0
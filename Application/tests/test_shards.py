@@ -0,0 +1,95 @@
+import os, types
+import pandas as pd
+
+import DataCollection
+import ParquetArchive
+import Shards
+from DataCollection import dataCollection
+
+
+# A thread that only runs when run() is called, so the test decides when the archive thread gets going
+class deferredThread:
+    started = []
+
+    def __init__(self, target, name=None, daemon=None):
+        self.target = target
+
+    def start(self):
+        self.started.append(self)
+
+
+def test_archive_reads_the_finished_sessions_shard(tmp_path, monkeypatch):
+    monkeypatch.setattr(DataCollection, "PARQUET_ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(ParquetArchive, "parquetAvailable", lambda: True)
+    exported = []
+    monkeypatch.setattr(ParquetArchive, "exportResults", lambda metricFile, eventFile, archiveDir, sessions=None, clockFile=None:
+                        exported.append((metricFile, eventFile, clockFile, sessions)))
+    monkeypatch.setattr(DataCollection, "threading", types.SimpleNamespace(Thread=deferredThread))
+    deferredThread.started = []
+
+    dataManager = dataCollection(str(tmp_path), sharded=True)
+    try:
+        finished = dataManager.currentSessionID
+        files = (dataManager.metricFile, dataManager.eventFile, dataManager.clockFile)
+        dataManager.archiveSession(finished)
+        # Stop, and the next session starts before the archive thread has run (ocs_ui, SimulationCore.runSession)
+        dataManager.endSession()
+        dataManager.getPreviousIDs()
+        assert dataManager.metricFile != files[0]
+        for thread in deferredThread.started:
+            thread.target()
+    finally:
+        dataManager.close()
+
+    assert exported == [files + ([finished],)]
+
+
+COLUMNS = ["session_id", "value"]
+
+
+def writeShard(resultsDir, name, rows):
+    shardDir = os.path.join(resultsDir, Shards.SHARD_DIR, name)
+    os.makedirs(shardDir)
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(os.path.join(shardDir, "metrics.csv"), index=False)
+    Shards.markComplete(shardDir)
+    return shardDir
+
+
+def test_merge_killed_half_way_is_done_again_without_duplicates(tmp_path, monkeypatch):
+    resultsDir = str(tmp_path)
+    pd.DataFrame([["S0001", "a"]], columns=COLUMNS).to_csv(tmp_path / "metrics.csv", index=False)
+    writeShard(resultsDir, "host_1_S0002", [["S0002", str(i)] for i in range(5)])
+
+    # Dies after the first chunk is in
+    readCsv = pd.read_csv
+    def dyingReadCsv(*args, **kwargs):
+        for number, chunk in enumerate(readCsv(*args, **kwargs)):
+            if number == 1:
+                raise KeyboardInterrupt
+            yield chunk
+    monkeypatch.setattr(Shards.pd, "read_csv", dyingReadCsv)
+    try:
+        Shards.mergeShards(resultsDir, {"metrics.csv": COLUMNS}, chunksize=2)
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.setattr(Shards.pd, "read_csv", readCsv)
+    assert len(pd.read_csv(tmp_path / "metrics.csv")) == 3
+
+    result = Shards.mergeShards(resultsDir, {"metrics.csv": COLUMNS}, chunksize=2)
+    assert result["shards"] == ["host_1_S0002"]
+    merged = pd.read_csv(tmp_path / "metrics.csv", dtype=str)
+    assert merged.values.tolist() == [["S0001", "a"]] + [["S0002", str(i)] for i in range(5)]
+    assert Shards.listShards(resultsDir) == []
+
+
+def test_merged_shard_that_was_not_removed_is_not_merged_again(tmp_path, monkeypatch):
+    resultsDir = str(tmp_path)
+    writeShard(resultsDir, "host_1_S0002", [["S0002", "1"]])
+    monkeypatch.setattr(Shards.shutil, "rmtree", lambda path, ignore_errors=False: None)
+    Shards.mergeShards(resultsDir, {"metrics.csv": COLUMNS})
+    monkeypatch.undo()
+
+    result = Shards.mergeShards(resultsDir, {"metrics.csv": COLUMNS})
+    assert result["shards"] == []
+    assert len(pd.read_csv(tmp_path / "metrics.csv")) == 1
+    assert Shards.listShards(resultsDir) == []
@@ -0,0 +1,88 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from StreamingStats import p2Quantile, streamingStats
+
+
+def test_welford_matches_numpy():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(7.0, 0.5, 5000)
+    stats = streamingStats()
+    for v in values:
+        stats.add(float(v))
+
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert stats.variance == pytest.approx(values.var(ddof=1), rel=1e-9)
+    assert stats.std == pytest.approx(values.std(ddof=1), rel=1e-9)
+    assert stats.min == values.min()
+    assert stats.max == values.max()
+
+
+def test_welford_large_offset_stays_stable():
+    # Naive sum of squares loses everything here, Welford doesn't
+    values = [1e9 + v for v in (4.0, 7.0, 13.0, 16.0)]
+    stats = streamingStats()
+    for v in values:
+        stats.add(v)
+    assert stats.variance == pytest.approx(30.0)
+
+
+@pytest.mark.parametrize("p", [0.5, 0.9, 0.99])
+@pytest.mark.parametrize("dist", ["uniform", "lognormal", "exponential"])
+def test_p2_close_to_numpy_quantile(p, dist):
+    rng = np.random.default_rng(7)
+    values = {"uniform": rng.uniform(0, 10000, 20000),
+              "lognormal": rng.lognormal(7.0, 0.6, 20000),
+              "exponential": rng.exponential(1500, 20000)}[dist]
+    estimator = p2Quantile(p)
+    for v in values:
+        estimator.add(float(v))
+
+    exact = np.quantile(values, p)
+    # Relative to the spread of the data around that quantile
+    spread = np.quantile(values, min(p + 0.05, 1.0)) - np.quantile(values, max(p - 0.05, 0.0))
+    assert abs(estimator.value() - exact) <= 0.25 * spread
+
+
+def test_p2_exact_below_five_values():
+    estimator = p2Quantile(0.5)
+    assert estimator.value() == 0.0
+    for v in (30, 10, 20):
+        estimator.add(v)
+    # Nearest rank on what we have
+    assert estimator.value() == 20
+
+
+def test_p2_constant_stream():
+    estimator = p2Quantile(0.9)
+    for _ in range(1000):
+        estimator.add(250.0)
+    assert estimator.value() == 250.0
+
+
+def test_p2_markers_stay_ordered():
+    rng = random.Random(3)
+    estimator = p2Quantile(0.9)
+    for _ in range(5000):
+        # Mostly zeros with a few large values, like response times between errors
+        estimator.add(0.0 if rng.random() < 0.8 else rng.uniform(500, 5000))
+    assert estimator.q == sorted(estimator.q)
+    assert estimator.n == sorted(estimator.n)
+
+
+def test_summary_scale_and_empty():
+    stats = streamingStats()
+    empty = stats.summary()
+    assert empty["count"] == 0 and empty["mean"] == 0.0 and empty["std"] == 0.0 and empty["p50"] == 0.0
+
+    for v in (1000.0, 2000.0, 3000.0):
+        stats.add(v)
+    out = stats.summary(scale=1 / 1000)
+    assert out["mean"] == pytest.approx(2.0)
+    assert out["min"] == pytest.approx(1.0) and out["max"] == pytest.approx(3.0)
+    assert out["p50"] == pytest.approx(2.0)
+    assert math.isclose(out["std"], 1.0)
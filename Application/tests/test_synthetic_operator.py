@@ -0,0 +1,101 @@
+import os, json, random
+
+import pytest
+
+from SimulationCore import runSession, virtualClock, packagingSim, sortingSim
+from ErrorCalibration import scenarioSettings
+from DataCollection import dataCollection
+from SyntheticOperator import syntheticOperator, drawMs, operatorProfile, PROFILES
+import Timebase
+
+SCENARIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Scenarios", "Stress_Test_Alll_Tasks.json")
+
+
+def settings():
+    with open(SCENARIO, "r", encoding="utf8") as f:
+        return scenarioSettings(json.load(f), True)
+
+
+# A careless operator clicks plenty of items without an error, some of them while another box is wrong
+FALSE_CLICKS = {"latency": {"dist": "lognormal", "median": 1200, "sigma": 0.5, "min": 300}, "missRate": 0.1, "falseRate": 0.3}
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("profile", ["average", "perfect", FALSE_CLICKS])
+def test_operator_counts_what_the_task_counted(tmp_path, seed, profile):
+    result = runSession(settings(), 180.0, str(tmp_path), seed, operator=profile)
+    summary = {row["task_type"]: row for row in result["summary"]}
+    for name, taskType in (("sorting", "Sorting Task"), ("packaging", "Packaging Task"), ("inspection", "Inspection Task")):
+        operator = result["operators"][name]
+        # returnData()[3] is the task's successfulCorrections
+        assert operator["operator_corrections"] == result["tasks"][name][3]
+        assert operator["operator_corrections"] == summary[taskType]["corrections"]
+        assert operator["operator_false_corrections"] >= 0
+
+
+@pytest.fixture
+def tasks(tmp_path):
+    clock = virtualClock()
+    Timebase.useClock(clock.stamp)
+    dataManager = dataCollection(str(tmp_path))
+    try:
+        yield clock, {
+            "packaging": packagingSim(0.0, 1000, 5, [False, False], 800, 1300, dataManager, clock, random.Random(1)),
+            "sorting": sortingSim(0.0, 1000, 3, [], 800, 1300, dataManager, clock, random.Random(1)),
+        }
+    finally:
+        dataManager.close()
+        Timebase.useClock()
+
+
+def clicked(task, corrects, busyMs=None):
+    def respond():
+        if busyMs is None:
+            task.successfulCorrections += corrects
+            return True
+        # A sorting correction: the controls are busy until the box has been moved
+        task.window.interrupt = True
+
+        def finished():
+            task.window.interrupt = False
+            task.successfulCorrections += corrects
+        task.clock.singleShot(busyMs, finished)
+        return True
+    return respond
+
+
+def test_click_outcome_comes_from_the_task(tasks):
+    clock, sims = tasks
+    operator = syntheticOperator("packaging", sims["packaging"], "perfect")
+    operator.running = True
+    # Clicked for a right box but the click fixed another one (correctBox takes the first wrong box)
+    operator.click(object(), False, clicked(sims["packaging"], 1), 300)
+    # Clicked for a wrong box that had been fixed by then
+    operator.click(object(), True, clicked(sims["packaging"], 0), 300)
+    assert (operator.corrections, operator.falseCorrections) == (1, 1)
+
+
+def test_click_outcome_waits_for_the_correction(tasks):
+    clock, sims = tasks
+    operator = syntheticOperator("sorting", sims["sorting"], "perfect")
+    operator.running = True
+    operator.click(object(), True, clicked(sims["sorting"], 1, busyMs=500), 300)
+    assert (operator.corrections, operator.falseCorrections) == (0, 0)
+    clock.run(1.0)
+    assert (operator.corrections, operator.falseCorrections) == (1, 0)
+
+    operator.click(object(), True, clicked(sims["sorting"], 0, busyMs=500), 300)
+    clock.run(1.0)
+    assert (operator.corrections, operator.falseCorrections) == (1, 1)
+
+
+def test_drawMs():
+    rng = random.Random(4)
+    assert drawMs({"dist": "fixed", "ms": 800}, rng) == 800
+    assert drawMs({"dist": "normal", "mean": -500, "sd": 1, "min": 250}, rng) == 250
+    values = [drawMs(PROFILES["average"]["latency"], rng) for _ in range(2000)]
+    assert min(values) >= 300
+    assert sorted(values)[1000] == pytest.approx(1500, rel=0.1)
+    with pytest.raises(ValueError):
+        drawMs({"dist": "cauchy"}, rng)
+    assert operatorProfile({"missRate": 0.5})["falseRate"] == 0.0
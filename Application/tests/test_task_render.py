@@ -0,0 +1,78 @@
+import os, sys, subprocess, textwrap
+
+import pytest
+
+APPLICATION = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("PyQt5.QtWidgets")
+pytest.importorskip("pygame")
+
+# A flash turns itself off 500 ms after it went on. Stop disposes the task windows with that shot still pending.
+DISPOSE_WITH_FLASH_PENDING = textwrap.dedent("""
+    import os, sys, random, tempfile
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    sys.path.insert(0, {application!r})
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QCoreApplication, QEvent, QEventLoop, QTimer
+    app = QApplication([])
+    from DataCollection import dataCollection
+    from {module} import {task}
+
+    dataManager = dataCollection(tempfile.mkdtemp())
+    task = {task}(0.1, 1000, {setting}, {distractions}, 800, 1300, dataManager, rng=random.Random(1))
+    task.random.uniform = lambda low, high: 1.0
+    task.doDistraction()
+    task.pause()
+    task.renderWindow.setParent(None)
+    task.renderWindow.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    loop = QEventLoop()
+    QTimer.singleShot(800, loop.quit)
+    loop.exec_()
+    dataManager.close()
+    print("disposed")
+""")
+
+
+@pytest.mark.parametrize("module, task, setting, distractions", [
+    ("SortingTask", "SortingTask", 3, ["light"]),
+    ("PackingTask", "PackagingTask", 5, [True, False]),
+    ("inspectionTask", "inspectionTask", 9, [False, True]),
+])
+def test_dispose_with_flash_pending(module, task, setting, distractions):
+    script = DISPOSE_WITH_FLASH_PENDING.format(application=APPLICATION, module=module, task=task, setting=setting, distractions=distractions)
+    run = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60)
+    assert run.returncode == 0, run.stderr
+    assert "disposed" in run.stdout
+    assert "has been deleted" not in run.stderr
+
+
+# In its own process too, windows other tests left behind must not be around when the event loop runs
+FLASH_TURNS_OFF = textwrap.dedent("""
+    import os, sys, random, tempfile
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    sys.path.insert(0, {application!r})
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QEventLoop, QTimer
+    app = QApplication([])
+    from DataCollection import dataCollection
+    from SortingTask import SortingTask
+
+    dataManager = dataCollection(tempfile.mkdtemp())
+    task = SortingTask(0.1, 1000, 3, ["light"], 800, 1300, dataManager, rng=random.Random(1))
+    task.random.uniform = lambda low, high: 1.0
+    task.doDistraction()
+    print("on" if task.window.lightOn else "off")
+    loop = QEventLoop()
+    QTimer.singleShot(700, loop.quit)
+    loop.exec_()
+    print("on" if task.window.lightOn else "off")
+    task.pause()
+    dataManager.close()
+""")
+
+
+def test_flash_turns_off_while_the_window_is_there():
+    run = subprocess.run([sys.executable, "-c", FLASH_TURNS_OFF.format(application=APPLICATION)], capture_output=True, text=True, timeout=60)
+    assert run.returncode == 0, run.stderr
+    assert run.stdout.split()[-2:] == ["on", "off"]
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Timeline import buildTimeline, select, windowCounts, within, asofJoin
+
+CODES = ["SORT_ERROR_CORRECTED", "PACK_ERROR_CORRECTED", "SORT_DISTRACTION", "PACK_DISTRACTION", "INSPECT_RESPONSE", "SESSION_RUNNING"]
+
+
+# Event rows for a few sessions, on a coarse grid so there are exact ties, sessions overlapping in time
+def makeEvents(seed=1, sessions=4, rows=300, spreadS=120):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for number in range(sessions):
+        codes = rng.choice(CODES, rows)
+        offsets = rng.integers(0, spreadS * 4, rows) * 250_000_000
+        frames.append(pd.DataFrame({
+            "Timestamp": pd.Timestamp("2026-03-01 09:00") + pd.to_timedelta(offsets + number * 30_000_000_000, unit="ns"),
+            "session_id": "S%03d" % (number + 1),
+            "participant_id": "P%03d" % (number // 2 + 1),
+            "event_type": "activity",
+            "event_code": codes,
+            "expected_bin": None,
+            "actual_bin": np.where(np.char.endswith(codes.astype(str), "DISTRACTION"), rng.choice(["flash", "beep"], rows), None),
+            "response_ms": np.where(codes == "INSPECT_RESPONSE", rng.uniform(200, 3000, rows), np.nan),
+        }))
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def bruteCounts(targets, anchors, before, after):
+    counts = []
+    for session, t in zip(targets["session_id"].astype(str), targets["t"]):
+        times = anchors.loc[anchors["session_id"].astype(str) == session, "t"].to_numpy()
+        counts.append(int(((times >= t - int(before * 1e9)) & (times <= t + int(after * 1e9))).sum()))
+    return np.array(counts)
+
+
+def bruteAsof(targets, anchors, direction, tolerance, allowExact):
+    found = []
+    for session, t in zip(targets["session_id"].astype(str), targets["t"]):
+        times = anchors.loc[anchors["session_id"].astype(str) == session, "t"].to_numpy()
+        lags = t - times
+        if direction == "backward":
+            ok = lags >= 0 if allowExact else lags > 0
+        elif direction == "forward":
+            ok = lags <= 0 if allowExact else lags < 0
+        else:
+            ok = np.ones(len(lags), dtype=bool) if allowExact else lags != 0
+        if tolerance is not None:
+            ok &= np.abs(lags) <= tolerance * 1e9
+        found.append(np.abs(lags[ok]).min() if ok.any() else None)
+    return found
+
+
+@pytest.fixture(scope="module")
+def timeline():
+    return buildTimeline(makeEvents())
+
+
+def test_buildTimeline(timeline):
+    assert len(timeline) == 4 * 300
+    assert (np.diff(timeline["t"].to_numpy())[np.diff(timeline["session_id"].cat.codes.to_numpy()) == 0] >= 0).all()
+    assert set(timeline["task"].cat.categories) == {"sorting", "packaging", "inspection", "session"}
+    corrections = select(timeline, task="packaging", event="ERROR_CORRECTED")
+    assert len(corrections) == (makeEvents()["event_code"] == "PACK_ERROR_CORRECTED").sum()
+    flashes = select(timeline, event="DISTRACTION", kind="flash")
+    assert set(flashes["kind"].astype(str)) == {"flash"}
+    assert set(flashes["task"].astype(str)) == {"sorting", "packaging"}
+
+
+@pytest.mark.parametrize("before, after", [(0, 0), (5, 0), (0, 2.5), (3, 3), (1000, 0)])
+def test_windowCounts(timeline, before, after):
+    targets = select(timeline, event="ERROR_CORRECTED")
+    anchors = select(timeline, event="DISTRACTION", kind="flash")
+    counts = windowCounts(targets, anchors, before, after)
+    np.testing.assert_array_equal(counts, bruteCounts(targets, anchors, before, after))
+    assert len(within(targets, anchors, before, after)) == (counts > 0).sum()
+
+
+def test_windowCounts_several_batches():
+    # Sessions long enough that they don't all fit one int64 key
+    events = makeEvents(seed=2, sessions=3, rows=60)
+    late = events["session_id"] == "S002"
+    events.loc[late, "Timestamp"] = events.loc[late, "Timestamp"] + pd.Timedelta(days=365 * 90)
+    timeline = buildTimeline(events)
+    targets = select(timeline, event="ERROR_CORRECTED")
+    anchors = select(timeline, event="DISTRACTION")
+    np.testing.assert_array_equal(windowCounts(targets, anchors, 10, 10), bruteCounts(targets, anchors, 10, 10))
+
+
+def test_windowCounts_empty(timeline):
+    targets = select(timeline, event="ERROR_CORRECTED")
+    assert windowCounts(targets, targets.iloc[:0], 5).tolist() == [0] * len(targets)
+    assert len(windowCounts(targets.iloc[:0], targets, 5)) == 0
+
+
+@pytest.mark.parametrize("direction", ["backward", "forward", "nearest"])
+@pytest.mark.parametrize("tolerance, allowExact", [(None, True), (4, True), (None, False)])
+def test_asofJoin(timeline, direction, tolerance, allowExact):
+    targets = select(timeline, task="inspection", event="RESPONSE")
+    anchors = select(timeline, event="DISTRACTION")
+    joined = asofJoin(targets, anchors, direction, tolerance, allowExact=allowExact)
+
+    assert len(joined) == len(targets)
+    np.testing.assert_array_equal(joined["t"].to_numpy(), targets["t"].to_numpy())
+    expected = bruteAsof(targets, anchors, direction, tolerance, allowExact)
+    lags = joined["lag_s"].to_numpy()
+    for lag, distance in zip(lags, expected):
+        if distance is None:
+            assert np.isnan(lag)
+        else:
+            assert abs(lag) * 1e9 == pytest.approx(distance)
+    matched = joined["t_anchor"].notna()
+    assert (joined.loc[matched, "event_anchor"].astype(str) == "DISTRACTION").all()
+    if direction == "backward":
+        assert (lags[matched] >= 0).all()
+    elif direction == "forward":
+        assert (lags[matched] <= 0).all()
@@ -0,0 +1,51 @@
+import os, types
+
+import pandas as pd
+
+import Timebase
+from SimulationCore import simItem
+from TraceRecorder import traceRecorder, loadTrace, readTrace, TRACE_DTYPE
+
+
+def sortingWindow(x):
+    box = simItem(10, 10, 0xFFFF0000)
+    box.setPos(x, 5)
+    return types.SimpleNamespace(boxArray=[box], heldBox=None, animState=0)
+
+
+def recordTick(location, anchorWall, anchorMonoNs, nowNs, x):
+    Timebase.useClock(lambda: nowNs)
+    recorder = traceRecorder(chunkRows=4)
+    try:
+        recorder.open(location, {"session_id": "S0001", "participant_id": "P0001", "anchor_wall": anchorWall, "anchor_mono_ns": anchorMonoNs})
+        recorder.sampleSorting(sortingWindow(x))
+        recorder.close()
+    finally:
+        Timebase.useClock()
+
+
+# The process that resumes the session has its own monotonic clock and anchor, and the crash left half a record
+def test_resumed_trace_keeps_both_processes_times(tmp_path):
+    location = str(tmp_path / "traces" / "S0001.trace")
+    recordTick(location, "2026-01-01T10:00:00", 0, 1000, 1.0)
+    with open(location, "ab") as f:
+        f.write(b"\x01" * (TRACE_DTYPE.itemsize // 2))
+
+    recordTick(location, "2026-01-01T11:00:00", 3_000_000_000, 5_000_000_000, 2.0)
+
+    header, records = readTrace(location)
+    assert header["anchor_wall"] == "2026-01-01T10:00:00"
+    assert len(records) == 3
+    trace = loadTrace(location)
+    assert trace["Timestamp"].tolist() == [pd.Timestamp("2026-01-01T10:00:00.000001"), pd.Timestamp("2026-01-01T11:00:02")]
+    assert trace["x"].tolist() == [1.0, 2.0]
+    assert trace["task"].tolist() == ["sorting", "sorting"]
+
+
+def test_file_that_is_not_a_trace_is_started_again(tmp_path):
+    location = str(tmp_path / "traces" / "S0001.trace")
+    os.makedirs(os.path.dirname(location))
+    with open(location, "wb") as f:
+        f.write(b"garbage")
+    recordTick(location, "2026-01-01T10:00:00", 0, 1000, 1.0)
+    assert loadTrace(location)["x"].tolist() == [1.0]
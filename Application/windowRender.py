@@ -10,6 +10,11 @@ from SortingTask import SortingTask
 from inspectionTask import inspectionTask
 from PackingTask import PackagingTask
 from ocs_ui import OCSWindow
+import EventBus
+import Checkpoint
+import DataCollection
+from SyntheticOperator import syntheticOperator
+from IDLedger import idNumber
 
 
 # ---------------- Simple grid to host task render widgets ----------------
@@ -81,6 +86,8 @@ class testWindow(QMainWindow):
         self._isPaused = False
         self._isRunning = False          # for Start button gating
         self._last_ocs = {}
+        # SyntheticOperator per task name, when DataCollection.SYNTHETIC_OPERATOR is set
+        self.operators = {}
 
         # --- UI shell ---
         top = QWidget(); top_l = QHBoxLayout(top); top_l.setContentsMargins(8, 8, 8, 8)
@@ -98,6 +105,11 @@ class testWindow(QMainWindow):
         self.OCSWindow = None
         self.showOCSWindow()
 
+        # Crash recovery: snapshot the running session every few seconds
+        self.checkpoints = Checkpoint.checkpointWriter(Checkpoint.checkpointPath(self.OCSWindow.dataManager.resultsDir))
+        self.checkpointTimer = QTimer()
+        self.checkpointTimer.timeout.connect(self.saveCheckpoint)
+
     # ---------------- OCS window wiring ----------------
     def showOCSWindow(self):
         if self.OCSWindow is None:
@@ -107,6 +119,7 @@ class testWindow(QMainWindow):
             self.OCSWindow.playClicked.connect(self.play)
             self.OCSWindow.pauseClicked.connect(self.pause)
             self.OCSWindow.stopClicked.connect(self.stop)
+            self.OCSWindow.resumeClicked.connect(self.resumeSession)
 
             # Live settings sync (whenever a slider/toggle changes)
             if hasattr(self.OCSWindow, "settingsChanged"):
@@ -143,6 +156,23 @@ class testWindow(QMainWindow):
                 return False
         return False
 
+    # Per tick trace of the task's items (its SimulationCore window), if the data manager records one
+    def _attach_trace(self, name, task):
+        tracer = self.OCSWindow.dataManager.tracer
+        window = getattr(task, "window", None)
+        if tracer is not None and window is not None:
+            tracer.attach(name, window)
+
+    # Synthetic participant on the task, it starts looking with the first Start and stops when the task is disposed
+    def _attach_operator(self, name, task):
+        if DataCollection.SYNTHETIC_OPERATOR is not None:
+            self.operators[name] = syntheticOperator(name, task, DataCollection.SYNTHETIC_OPERATOR)
+
+    def _detach_operator(self, name):
+        op = self.operators.pop(name, None)
+        if op is not None:
+            op.stop()
+
     def _set_start_enabled(self, enabled: bool):
         """Disable/enable the Start button in the OCS window (best-effort)."""
         if not self.OCSWindow:
@@ -333,8 +363,9 @@ class testWindow(QMainWindow):
         except Exception:
             pass
 
+        self._detach_operator("sorting")
         self.sTask = None
-        self.OCSWindow.dataManager.setSortingTask(None)
+        self.OCSWindow.dataManager.bus.publish(EventBus.TASK_STOPPED, "sorting")
         if self.pTask is None and self.iTask is None:
             self._taskStartedOnce = False
         self._isPaused = False
@@ -362,8 +393,9 @@ class testWindow(QMainWindow):
         except Exception:
             pass
 
+        self._detach_operator("packaging")
         self.pTask = None
-        self.OCSWindow.dataManager.setPackagingTask(None)
+        self.OCSWindow.dataManager.bus.publish(EventBus.TASK_STOPPED, "packaging")
         if self.sTask is None and self.iTask is None:
             self._taskStartedOnce = False
         self._isPaused = False
@@ -389,8 +421,9 @@ class testWindow(QMainWindow):
         except Exception:
             pass
 
+        self._detach_operator("inspection")
         self.iTask = None
-        self.OCSWindow.dataManager.setInspectionTask(None)
+        self.OCSWindow.dataManager.bus.publish(EventBus.TASK_STOPPED, "inspection")
         if self.pTask is None and self.sTask is None:
             self._taskStartedOnce = False
         self._isPaused = False
@@ -410,9 +443,49 @@ class testWindow(QMainWindow):
             try: rw.update()
             except Exception: pass
 
+    # ---------------- Checkpoints -----------------
+    def _tasks(self):
+        return (("sorting", self.sTask), ("packaging", self.pTask), ("inspection", self.iTask))
+
+    def saveCheckpoint(self):
+        if not self.sTask and not self.iTask and not self.pTask:
+            return
+        self.checkpoints.save({
+            "scenario": self.OCSWindow.scenario(),
+            "tasks": {name: Checkpoint.taskState(task, name) for name, task in self._tasks() if task is not None},
+            "data": self.OCSWindow.dataManager.checkpointState(),
+        })
+
+    def resumeSession(self):
+        print("[testWindow] Resume clicked")
+        if self.sTask or self.iTask or self.pTask:
+            self.OCSWindow._error("Stop the current session before resuming another one.")
+            return
+        state = Checkpoint.loadCheckpoint(self.checkpoints.location)
+        if state is None:
+            self.OCSWindow._error("No session checkpoint to resume.")
+            return
+
+        # Same settings as when the checkpoint was taken, then rebuild the tasks straight away
+        self.OCSWindow.applyScenario(state["scenario"])
+        self._apply_settings_from_ocs(self.OCSWindow.currentSettings(), source="resume")
+
+        # Tasks announce themselves on creation, that has to be handled before the counters go back in
+        dataManager = self.OCSWindow.dataManager
+        dataManager.bus.pump()
+        dataManager.restoreCheckpoint(state["data"])
+        for name, task in self._tasks():
+            if task is not None and name in state["tasks"]:
+                Checkpoint.restoreTask(task, name, state["tasks"][name])
+
+        # Start sets the participant from the spin box, keep the one the session had
+        self.OCSWindow.getParNum.setValue(idNumber(dataManager.currentParticipantID) - 1)
+        self.OCSWindow._info("Resumed session " + dataManager.currentSessionID + ", press Start to carry on.\n"
+                             "Boxes that were on the conveyors or in the bins are not restored, so the tasks start with no errors left to correct.")
+
     # ---------------- Decipher Size for Individual Task -----------------
     def calculateTaskSize(self, maxResolution, activeTasks):
-        taskWidth = (maxResolution[0] - (24 + (activeTasks - 1 * 10))) // activeTasks
+        taskWidth = (maxResolution[0] - (24 + (activeTasks - 1) * 10)) // activeTasks
         taskHeight = maxResolution[1]
 
         return [taskWidth, taskHeight]
@@ -471,6 +544,8 @@ class testWindow(QMainWindow):
                 self.sTask = SortingTask(eff["errorRate"], eff["speed"], eff["numColours"], eff["distractions"],taskResolution[0], taskResolution[1], self.OCSWindow.dataManager)
                 if hasattr(self.sTask, "renderWindow") and self.sTask.renderWindow:
                     self.grid.addTaskWidget(self.sTask.renderWindow)
+                self._attach_trace("sorting", self.sTask)
+                self._attach_operator("sorting", self.sTask)
 
                 # one natural init/update (teammate API)
                 if hasattr(self.sTask, "updateTask"):
@@ -492,6 +567,8 @@ class testWindow(QMainWindow):
                 self.iTask = inspectionTask(effI["errorRate"], effI["speed"], effI["sizeRange"], effI["distractions"], taskResolution[0], taskResolution[1], self.OCSWindow.dataManager)
                 if hasattr(self.iTask, "renderWindow") and self.iTask.renderWindow:
                     self.grid.addTaskWidget(self.iTask.renderWindow)
+                self._attach_trace("inspection", self.iTask)
+                self._attach_operator("inspection", self.iTask)
             except Exception as e: 
                 print("[testWindow] Failed to create Inspection Task", e)
 
@@ -501,6 +578,8 @@ class testWindow(QMainWindow):
                 self.pTask = PackagingTask(effP["errorRate"], effP["speed"], effP["packageNum"], effP["distractions"], taskResolution[0], taskResolution[1], self.OCSWindow.dataManager)
                 if hasattr(self.pTask, "renderWindow") and self.pTask.renderWindow:
                     self.grid.addTaskWidget(self.pTask.renderWindow)
+                self._attach_trace("packaging", self.pTask)
+                self._attach_operator("packaging", self.pTask)
             except Exception as e: 
                 print("[testWindow] Failed to create Packaging Task", e)
 
@@ -527,6 +606,7 @@ class testWindow(QMainWindow):
             return
         
         self.OCSWindow.startCollectionTimer()
+        self.checkpointTimer.start(Checkpoint.CHECKPOINT_INTERVAL_MS)
 
 
         # First start
@@ -582,6 +662,11 @@ class testWindow(QMainWindow):
                     self._set_start_enabled(False)
                     QTimer.singleShot(0, self._nudge_resume)
 
+        # Operators keep running through pauses, they only look while the task moves
+        for op in self.operators.values():
+            if not op.running:
+                op.start()
+
     def pause(self):
         print("[testWindow] Pause clicked")
 
@@ -604,6 +689,9 @@ class testWindow(QMainWindow):
                 print(f"[testWindow] Paused Inspection Task")
 
         self.OCSWindow.stopCollectionTimer("pause")
+        # The machine may well sleep while paused
+        self.checkpointTimer.stop()
+        self.saveCheckpoint()
 
 
 
@@ -617,6 +705,9 @@ class testWindow(QMainWindow):
             self._dispose_packaging_task()
         print("[testWindow] SortingTask fully stopped and removed.")
 
+        # Session ended properly, nothing to resume
+        self.checkpointTimer.stop()
+        self.checkpoints.clear()
         self.OCSWindow.stopCollectionTimer("stop")
 
 
@@ -624,6 +715,8 @@ class testWindow(QMainWindow):
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     w = testWindow()
+    # Last chance to get queued result rows on disk
+    app.aboutToQuit.connect(w.OCSWindow.dataManager.close)
     w.show()
     sys.exit(app.exec())
 